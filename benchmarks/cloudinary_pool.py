@@ -0,0 +1,132 @@
+"""
+Connection reuse of the Cloudinary uploads against a local HTTPS stand-in of the upload API.
+
+Runs the same small uploads through upload_async, as many at once as there are
+upload threads, once with the connection pool the SDK builds on import and once
+with the pool set up by configure_cloudinary, counting the TLS connections the
+server accepted. The server uses a throwaway self-signed certificate (needs the
+openssl binary):
+
+    python -m benchmarks.cloudinary_pool [uploads]
+"""
+
+import asyncio
+import json
+import logging
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.utils
+
+from pyweb_team7_project.services import cloudinary as cloudinary_service
+
+UPLOADS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+class KeepAliveStorage(BaseHTTPRequestHandler):
+    """
+    Stands in for the Cloudinary upload API, keeping connections open between requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, Nagle would hold the body for the delayed ACK
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        with self.lock:
+            KeepAliveStorage.connections += 1
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {"public_id": "pooled", "secure_url": "https://example.com/pooled.jpg"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_certificate(directory: str) -> tuple[str, str]:
+    cert, key = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost"]
+        + ["-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+async def measure(file: bytes, port: int) -> tuple[float, int]:
+    cloudinary.config(
+        upload_prefix=f"https://localhost:{port}",
+        cloud_name="demo",
+        api_key="key",
+        api_secret="secret",
+    )
+    KeepAliveStorage.connections = 0
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(cloudinary_service.upload_async(file) for _ in range(UPLOADS))
+    )
+    return time.perf_counter() - start, KeepAliveStorage.connections
+
+
+async def main():
+    # the import pool drops the connections it has no room for, every drop is logged
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveStorage)
+        server.daemon_threads = True
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        cloudinary.CERT_KWARGS = {"cert_reqs": "CERT_REQUIRED", "ca_certs": cert}
+        file = b"x" * 10_000
+        try:
+            # what cloudinary.uploader does on import
+            cloudinary.uploader._http = cloudinary.utils.get_http_connector(
+                cloudinary.config(), cloudinary.CERT_KWARGS
+            )
+            before, opened_before = await measure(file, server.server_port)
+
+            cloudinary_service.configure_cloudinary()
+            after, opened_after = await measure(file, server.server_port)
+        finally:
+            cloudinary_service.close_cloudinary()
+            server.shutdown()
+            server.server_close()
+
+    threads = cloudinary_service.config.cloudinary_max_uploads
+    print(f"{UPLOADS} uploads of 10 KB over HTTPS, {threads} upload threads")
+    print(
+        f"import pool: {UPLOADS / before:7.1f} uploads/s, {opened_before} TLS connections"
+    )
+    print(
+        f"shared pool: {UPLOADS / after:7.1f} uploads/s, {opened_after} TLS connections "
+        f"({before / after:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
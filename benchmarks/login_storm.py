@@ -0,0 +1,89 @@
+"""
+Benchmark of a login storm.
+
+Fires concurrent password checks at an in-process app while a client pings an
+unrelated endpoint, once with bcrypt on the event loop (the old login) and once
+with Auth.verify_and_update_password in the password thread pool:
+
+    python -m benchmarks.login_storm [logins] [rounds]
+"""
+
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from passlib.context import CryptContext
+
+from pyweb_team7_project.services.auth import auth_service
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+PASSWORD = "11223344"
+PING_INTERVAL = 0.005
+
+auth_service.pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__default_rounds=ROUNDS,
+    bcrypt__min_rounds=ROUNDS,
+    bcrypt__max_rounds=ROUNDS,
+)
+HASHED = auth_service.get_password_hash(PASSWORD)
+
+app = FastAPI()
+
+
+@app.post("/login/inline")
+async def login_inline():
+    return {"ok": auth_service.verify_password(PASSWORD, HASHED)}
+
+
+@app.post("/login/pooled")
+async def login_pooled():
+    verified, _ = await auth_service.verify_and_update_password(PASSWORD, HASHED)
+    return {"ok": verified}
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+async def storm(client: httpx.AsyncClient, url: str) -> tuple[float, float]:
+    latencies = []
+    done = asyncio.Event()
+
+    async def pinger():
+        while not done.is_set():
+            # includes the time the event loop was too busy to wake the pinger up
+            start = time.perf_counter()
+            await asyncio.sleep(PING_INTERVAL)
+            await client.get("/ping")
+            latencies.append(time.perf_counter() - start - PING_INTERVAL)
+
+    ping_task = asyncio.create_task(pinger())
+    start = time.perf_counter()
+    await asyncio.gather(*(client.post(url) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ping_task
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return LOGINS / elapsed, p99 * 1000
+
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        print(f"{LOGINS} concurrent logins, bcrypt cost {ROUNDS}")
+        for name, url in (("inline", "/login/inline"), ("pooled", "/login/pooled")):
+            throughput, p99 = await storm(client, url)
+            print(f"{name:7} {throughput:7.1f} logins/s   /ping p99 {p99:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of the per-request user lookup.
+
+Compares the Python overhead of one user lookup by email written as the legacy
+db.query(...) the routes used before, as the select() the repository uses now
+and as a cached lambda_stmt. All three run on the same Session with the compiled
+cache on, the way the application runs them, against an in-memory SQLite database.
+The async get_user_by_email is measured too, for the cost of the AsyncSession on top.
+Each line is the best of ROUNDS rounds:
+
+    python -m benchmarks.lookup_statements [calls]
+"""
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import create_engine, lambda_stmt, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from pyweb_team7_project.database.models import Base, User
+from pyweb_team7_project.repository.users import get_user_by_email
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+ROUNDS = 5
+EMAIL = "bench@example.com"
+
+
+def query_lookup(email: str, db: Session) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def select_lookup(email: str, db: Session) -> User | None:
+    return db.execute(select(User).where(User.email == email)).scalars().first()
+
+
+def lambda_lookup(email: str, db: Session) -> User | None:
+    statement = lambda_stmt(lambda: select(User)).add_criteria(
+        lambda s: s.where(User.email == email)
+    )
+    return db.execute(statement).scalars().first()
+
+
+def measure(lookup, db: Session) -> float:
+    lookup(EMAIL, db)
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            lookup(EMAIL, db)
+        rounds.append((time.perf_counter() - start) / CALLS * 1e6)
+    return min(rounds)
+
+
+async def measure_async(db) -> float:
+    await get_user_by_email(EMAIL, db)
+    rounds = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            await get_user_by_email(EMAIL, db)
+        rounds.append((time.perf_counter() - start) / CALLS * 1e6)
+    return min(rounds)
+
+
+async def main():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(User(username="bench", email=EMAIL, password="x"))
+        db.commit()
+
+        query = measure(query_lookup, db)
+        built = measure(select_lookup, db)
+        cached = measure(lambda_lookup, db)
+    engine.dispose()
+
+    async_engine = create_async_engine("sqlite+aiosqlite://")
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=async_engine)() as db:
+        db.add(User(username="bench", email=EMAIL, password="x"))
+        await db.commit()
+        repository = await measure_async(db)
+    await async_engine.dispose()
+
+    print(f"{CALLS} lookups of one user")
+    print(f"legacy db.query():        {query:8.1f} us/call")
+    print(f"select():                 {built:8.1f} us/call ({query / built:.2f}x)")
+    print(f"lambda_stmt:              {cached:8.1f} us/call ({query / cached:.2f}x)")
+    print(f"async get_user_by_email:  {repository:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
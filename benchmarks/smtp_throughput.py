@@ -0,0 +1,132 @@
+"""
+Throughput of the confirmation emails against a local aiosmtpd server.
+
+Sends the same number of templated messages once the way send_email did before,
+a FastMail connection per message, and once through the pooled MailSender.
+With --tls the server speaks implicit TLS on a throwaway self-signed certificate
+(needs the openssl binary), like the SMTPS servers the app is configured for:
+
+    python -m benchmarks.smtp_throughput [messages] [--tls]
+"""
+
+import asyncio
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+from pyweb_team7_project.services.email import MailSender, conf
+
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+MESSAGES = int(args[0]) if args else 200
+TLS = "--tls" in sys.argv
+
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_tls_context(directory: str) -> ssl.SSLContext:
+    cert, key = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def make_message(i: int) -> MessageSchema:
+    return MessageSchema(
+        subject="Confirm your email ",
+        recipients=[f"user{i}@example.com"],
+        template_body={
+            "host": "http://localhost/",
+            "username": f"user{i}",
+            "token": "t",
+        },
+        subtype=MessageType.html,
+    )
+
+
+async def per_message(config: ConnectionConfig) -> float:
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        await FastMail(config).send_message(
+            make_message(i), template_name="email_templates.html"
+        )
+    return time.perf_counter() - start
+
+
+async def pooled(config: ConnectionConfig) -> float:
+    sender = MailSender(config, pool_size=2, batch_size=20)
+    await sender.start()
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        await sender.send_message(make_message(i), template_name="email_templates.html")
+    await sender.queue.join()
+    elapsed = time.perf_counter() - start
+    await sender.stop()
+    print(f"pooled sender opened {sender.stats()['connections']} connections")
+    return elapsed
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        sink = Sink()
+        controller = Controller(
+            sink,
+            hostname="127.0.0.1",
+            port=port,
+            ssl_context=server_tls_context(directory) if TLS else None,
+        )
+        controller.start()
+        config = ConnectionConfig(
+            MAIL_USERNAME="",
+            MAIL_PASSWORD="",
+            MAIL_FROM="bench@example.com",
+            MAIL_PORT=port,
+            MAIL_SERVER="127.0.0.1",
+            MAIL_STARTTLS=False,
+            MAIL_SSL_TLS=TLS,
+            USE_CREDENTIALS=False,
+            VALIDATE_CERTS=False,
+            TEMPLATE_FOLDER=conf.TEMPLATE_FOLDER,
+        )
+        try:
+            before = await per_message(config)
+            after = await pooled(config)
+        finally:
+            controller.stop()
+
+    print(f"{MESSAGES} messages over {'implicit TLS' if TLS else 'plain SMTP'}")
+    print(f"connection per message: {MESSAGES / before:8.0f} msg/s")
+    print(
+        f"pooled sender:          {MESSAGES / after:8.0f} msg/s ({before / after:.1f}x)"
+    )
+    print(f"received by the server: {sink.received}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
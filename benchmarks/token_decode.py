@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the auth overhead per request.
+
+Decodes the same access token in a loop of 10k calls, the number of requests a
+worker would see in one second at 10k RPS, once verifying the signature every
+time and once through the verified-payload cache of Auth.decode_token:
+
+    python -m benchmarks.token_decode [calls]
+"""
+
+import asyncio
+import sys
+import time
+
+from jose import jwt
+
+from pyweb_team7_project.services.auth import auth_service
+from pyweb_team7_project.services.cache import token_cache
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+
+def verify_every_time(token: str) -> dict:
+    return jwt.decode(
+        token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM]
+    )
+
+
+def measure(decode, token: str) -> float:
+    decode(token)
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        decode(token)
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+async def main():
+    token = await auth_service.create_access_token(data={"sub": "bench@example.com"})
+    token_cache.clear()
+
+    before = measure(verify_every_time, token)
+    after = measure(auth_service.decode_token, token)
+
+    print(f"{CALLS} decodes of one token")
+    print(f"verify every time: {before:7.2f} us/request")
+    print(f"payload cache:     {after:7.2f} us/request ({before / after:.1f}x)")
+    print(
+        f"cpu per second at {CALLS} RPS: {before * CALLS / 1e3:.0f} ms -> {after * CALLS / 1e3:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
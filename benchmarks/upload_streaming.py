@@ -0,0 +1,165 @@
+"""
+Benchmark of image uploads of 50 MB files, received as a multipart form the way
+POST /api/images/ does, against the raw body streamed by POST /api/images/stream.
+
+Both paths are mounted on a bare app without auth or database and fed through
+httpx's ASGI transport from a generator, so the client holds 1 MB at a time.
+Every scenario runs in its own process, for the local storage and for Cloudinary
+served by a stand-in upload API on localhost, and reports the time of the
+request and how much the peak RSS of the process grew:
+
+    python -m benchmarks.upload_streaming [megabytes]
+"""
+
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MB = 1024 * 1024
+BOUNDARY = "benchmark-boundary"
+
+
+class DiscardingStorage(BaseHTTPRequestHandler):
+    """
+    Stands in for the Cloudinary upload API, reading and dropping every upload.
+    """
+
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, MB)))
+        body = json.dumps(
+            {"public_id": "bench", "secure_url": "https://example.com/bench.jpg"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def file_chunks(size: int, head: bytes = b"", tail: bytes = b""):
+    chunk = os.urandom(MB)
+    yield head
+    for _ in range(size // MB):
+        yield chunk
+    yield tail
+
+
+def scenario(backend: str, path: str, megabytes: int, upload_prefix: str) -> dict:
+    """
+    Runs one upload in this process, the settings are read from the environment on import.
+    """
+    os.environ["UPLOAD_MAX_SIZE"] = str((megabytes + 1) * MB)
+    os.environ["STORAGE_BACKEND"] = backend
+    os.environ["STORAGE_LOCAL_ROOT"] = tempfile.mkdtemp(prefix="bench-storage-")
+
+    import cloudinary
+    import httpx
+    from fastapi import FastAPI, File, Request, UploadFile
+
+    from pyweb_team7_project.conf.config import settings
+    from pyweb_team7_project.services.storage import UploadStream, storage
+
+    cloudinary.config(
+        upload_prefix=upload_prefix, cloud_name="demo", api_key="key", api_secret="s"
+    )
+    app = FastAPI()
+
+    @app.post("/multipart")
+    async def multipart(file: UploadFile = File()):
+        return await storage.upload(file.file, filename=file.filename)
+
+    @app.post("/stream")
+    async def stream(request: Request):
+        upload = UploadStream(
+            request.stream(),
+            settings.upload_max_size,
+            expected_size=int(request.headers["content-length"]),
+        )
+        return await storage.upload_stream(upload, filename="bench.jpg")
+
+    size = megabytes * MB
+    if path == "multipart":
+        head = (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="bench.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+        content_type = f"multipart/form-data; boundary={BOUNDARY}"
+    else:
+        head, tail, content_type = b"", b"", "image/jpeg"
+    headers = {
+        "Content-Type": content_type,
+        "Content-Length": str(len(head) + size + len(tail)),
+    }
+
+    async def upload():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        ) as client:
+            response = await client.post(
+                f"/{path}", content=file_chunks(size, head, tail), headers=headers
+            )
+            response.raise_for_status()
+
+    before = max_rss_mb()
+    start = time.perf_counter()
+    try:
+        asyncio.run(upload())
+    finally:
+        shutil.rmtree(settings.storage_local_root)
+    return {"seconds": time.perf_counter() - start, "rss": max_rss_mb() - before}
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DiscardingStorage)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    upload_prefix = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"one upload of {megabytes} MB")
+    try:
+        for backend in ("local", "cloudinary"):
+            for path in ("multipart", "stream"):
+                output = subprocess.run(
+                    [sys.executable, "-m", __spec__.name, "--scenario"]
+                    + [backend, path, str(megabytes), upload_prefix],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                result = json.loads(output.splitlines()[-1])
+                print(
+                    f"{backend:10} {path:9}: {result['seconds']:6.2f} s, "
+                    f"peak RSS +{result['rss']:6.1f} MB"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--scenario"]:
+        backend, path, megabytes, upload_prefix = sys.argv[2:6]
+        print(json.dumps(scenario(backend, path, int(megabytes), upload_prefix)))
+    else:
+        main()
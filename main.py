@@ -1,19 +1,45 @@
+import asyncio
 import time
 
 import redis.asyncio as redis
 import uvicorn
-from sqlalchemy.orm import Session
-from sqlalchemy import text
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_limiter import FastAPILimiter
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from pyweb_team7_project.routes import auth, images
-from pyweb_team7_project.database.db import get_db
-from pyweb_team7_project.routes import auth, tags, comments, qrcode_generation, users
+from pyweb_team7_project.database.db import (
+    get_async_db,
+    async_engine,
+    async_read_engine,
+    pin_to_primary,
+    pool_status,
+)
+from pyweb_team7_project.routes import (
+    auth,
+    tags,
+    comments,
+    qrcode_generation,
+    users,
+    storage,
+)
+from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.services.cache import (
+    shared_user_cache,
+    token_versions,
+    user_cache,
+)
+from pyweb_team7_project.services.auth import password_slots
+from pyweb_team7_project.services.cloudinary import close_cloudinary, upload_slots
+from pyweb_team7_project.services.pagination import NEXT_CURSOR_HEADER
+from pyweb_team7_project.services.roles import admin
+from pyweb_team7_project.services.throttling import (
+    login_account_limiter,
+    login_ip_limiter,
+)
 
 app = FastAPI()
 
@@ -25,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -37,10 +64,35 @@ async def startup():
     :return: A list of coroutines
     """
     print("------------- STARTUP --------------")
+    password_slots.start()
+    upload_slots.start()
     r = await redis.Redis(
         host="localhost", port=6379, db=0, encoding="utf-8", decode_responses=True
     )
     await FastAPILimiter.init(r)
+    login_account_limiter.connect(r)
+    login_ip_limiter.connect(r)
+    if settings.auth_stateless:
+        token_versions.connect(r)
+    if settings.user_cache_shared:
+        shared_user_cache.connect(r)
+        app.state.user_cache_listener = asyncio.create_task(
+            shared_user_cache.listen(user_cache)
+        )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    The shutdown function is called when the application stops.
+    It stops the listener of the shared user cache invalidations and closes the Cloudinary connections.
+
+    :return: None
+    """
+    listener = getattr(app.state, "user_cache_listener", None)
+    if listener is not None:
+        listener.cancel()
+    close_cloudinary()
 
 
 @app.middleware("http")
@@ -60,6 +112,22 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next):
+    """
+    The pin_writers_to_primary function pins a client to the primary database after a successful write,
+    so the reads that follow it are not served by a replica that has not caught up yet.
+
+    :param request: Request: Access the request object
+    :param call_next: Call the next function in the pipeline
+    :return: A response object
+    """
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        pin_to_primary(response)
+    return response
+
+
 @app.get("/", name="Корень")
 def read_root():
     """
@@ -73,16 +141,16 @@ def read_root():
 
 
 @app.get("/api/healthchecker")
-def healthchecher(db: Session = Depends(get_db)):
+async def healthchecher(db: AsyncSession = Depends(get_async_db)):
     """
     The healthchecher function is used to check the health of the application.
     It returns a message if everything is ok, or an error otherwise.
 
-    :param db: Session: Pass the database connection to the function
+    :param db: AsyncSession: Pass the database connection to the function
     :return: A dict with a message
     """
     try:
-        result = db.execute(text("SELECT 1")).fetchone()
+        result = (await db.execute(text("SELECT 1"))).fetchone()
         print(result)
         if result is None:
             raise HTTPException(
@@ -98,12 +166,39 @@ def healthchecher(db: Session = Depends(get_db)):
         )
 
 
+@app.get("/api/healthchecker/pool", dependencies=[Depends(admin)])
+def pool_metrics():
+    """
+    The pool_metrics function reports the state of the database connection pool.
+    It shows how many connections are checked out, idle and in overflow,
+    and how long requests have waited to get a connection. Only admins can see it.
+
+    :return: A dict with the pool counters
+    """
+    metrics = {"primary": pool_status(async_engine)}
+    if async_read_engine is not async_engine:
+        metrics["replica"] = pool_status(async_read_engine)
+    return metrics
+
+
+@app.get("/api/healthchecker/cache", dependencies=[Depends(admin)])
+def cache_metrics():
+    """
+    The cache_metrics function reports the hits and misses of the in-process and shared user caches.
+    Only admins can see it.
+
+    :return: A dict with the cache counters
+    """
+    return {"users": user_cache.stats(), "shared_users": shared_user_cache.stats()}
+
+
 app.include_router(auth.router, prefix="/api")
 app.include_router(tags.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
 app.include_router(images.router, prefix="/api")
 app.include_router(qrcode_generation.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
+app.include_router(storage.router, prefix="/api")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+"""pad sqlite comment timestamps with microseconds
+
+Revision ID: 0b4d8e2c6a93
+Revises: f3a9c1e7b5d2
+Create Date: 2026-10-19 14:03:27.118402
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0b4d8e2c6a93"
+down_revision: Union[str, None] = "f3a9c1e7b5d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite keeps datetimes as text, CURRENT_TIMESTAMP wrote them without the microseconds
+    # the cursor values are bound with, so they did not compare equal
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            sa.text(
+                "UPDATE comments SET created_at = created_at || '.000000' "
+                "WHERE length(created_at) = 19"
+            )
+        )
+
+
+def downgrade() -> None:
+    # the padded values are read back as the same datetimes
+    pass
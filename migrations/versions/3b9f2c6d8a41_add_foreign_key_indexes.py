@@ -0,0 +1,40 @@
+"""add foreign key indexes
+
+Revision ID: 3b9f2c6d8a41
+Revises: 8eed8553ece8
+Create Date: 2026-10-18 12:05:11.204318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9f2c6d8a41"
+down_revision: Union[str, None] = "8eed8553ece8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_images_user_id", "images", ["user_id"]),
+    ("ix_comments_user_id", "comments", ["user_id"]),
+    ("ix_comments_image_id_created_at", "comments", ["image_id", "created_at"]),
+    ("ix_qr_codes_photo_id", "qr_codes", ["photo_id"]),
+    ("ix_image_tags_tag_id", "image_tags", ["tag_id"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, it keeps the tables writable while the indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,42 @@
+"""add images and comments counters
+
+Revision ID: 5c1d7e9a2f63
+Revises: 3b9f2c6d8a41
+Create Date: 2026-10-18 14:21:47.530126
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1d7e9a2f63"
+down_revision: Union[str, None] = "3b9f2c6d8a41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("images_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "images",
+        sa.Column("comments_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        "UPDATE users SET images_count = "
+        "(SELECT count(*) FROM images WHERE images.user_id = users.id)"
+    )
+    op.execute(
+        "UPDATE images SET comments_count = "
+        "(SELECT count(*) FROM comments WHERE comments.image_id = images.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("images", "comments_count")
+    op.drop_column("users", "images_count")
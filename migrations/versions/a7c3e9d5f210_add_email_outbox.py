@@ -0,0 +1,52 @@
+"""add email outbox
+
+Revision ID: a7c3e9d5f210
+Revises: 8d2e4f6a1b37
+Create Date: 2026-10-18 18:24:51.302117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e9d5f210"
+down_revision: Union[str, None] = "8d2e4f6a1b37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("recipient", sa.String(length=250), nullable=False),
+        sa.Column("subject", sa.String(length=250), nullable=False),
+        sa.Column("template_name", sa.String(length=100), nullable=False),
+        sa.Column("template_body", sa.JSON(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("pending", "sent", "dead", name="emailstatus"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(length=500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_email_outbox_status_next_attempt_at",
+        "email_outbox",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_email_outbox_status_next_attempt_at", table_name="email_outbox")
+    op.drop_table("email_outbox")
+    sa.Enum(name="emailstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,35 @@
+"""add images public_id index
+
+Revision ID: c4e8b2a6d913
+Revises: a7c3e9d5f210
+Create Date: 2026-10-18 19:41:07.556820
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8b2a6d913"
+down_revision: Union[str, None] = "a7c3e9d5f210"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_images_public_id",
+            "images",
+            ["public_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_images_public_id", table_name="images", postgresql_concurrently=True
+        )
@@ -0,0 +1,40 @@
+"""add images content_hash
+
+Revision ID: e2b7d4f9a6c1
+Revises: c4e8b2a6d913
+Create Date: 2026-10-18 21:12:44.281903
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2b7d4f9a6c1"
+down_revision: Union[str, None] = "c4e8b2a6d913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "images", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_images_content_hash",
+            "images",
+            ["content_hash"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_images_content_hash", table_name="images", postgresql_concurrently=True
+        )
+    op.drop_column("images", "content_hash")
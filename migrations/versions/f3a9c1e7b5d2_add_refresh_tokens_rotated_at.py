@@ -0,0 +1,34 @@
+"""add refresh_tokens rotated_at, drop users refresh_token
+
+Revision ID: f3a9c1e7b5d2
+Revises: e2b7d4f9a6c1
+Create Date: 2026-10-19 10:14:52.604117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a9c1e7b5d2"
+down_revision: Union[str, None] = "e2b7d4f9a6c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "refresh_tokens", sa.Column("rotated_at", sa.DateTime(), nullable=True)
+    )
+    # replaced by the refresh_tokens table, emptied by 8d2e4f6a1b37
+    op.drop_column("users", "refresh_token")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("refresh_token", sa.String(length=250), nullable=True),
+    )
+    op.drop_column("refresh_tokens", "rotated_at")
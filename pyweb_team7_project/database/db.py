@@ -1,13 +1,170 @@
+import time
+
+from fastapi import Request, Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue, Queue
 
 from pyweb_team7_project.conf.config import settings
 
+READ_PRIMARY_COOKIE = "read_primary"
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    The to_async_url function swaps the driver of a sync database url for its asyncio counterpart,
+    so one SQLALCHEMY_DATABASE_URL is enough to configure both engines.
+
+    :param url: str: The sync database url, e.g. postgresql+psycopg2://...
+    :return: The same url with an async driver, e.g. postgresql+asyncpg://...
+    """
+    sa_url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(sa_url.get_backend_name(), sa_url.drivername)
+    return sa_url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class PoolWaitStats:
+    """
+    Accumulates how long callers waited for a connection to be handed out by a pool.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "waits": self.count,
+            "wait_time_total": self.total,
+            "wait_time_avg": self.total / self.count if self.count else 0.0,
+            "wait_time_max": self.max,
+        }
+
+
+class MeteredQueueMixin:
+    """
+    Times every get from the queue of idle connections, which is where a caller blocks on an exhausted pool.
+    Opening a new connection happens outside the queue, so it is not counted as waiting.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def get(self, block: bool = True, timeout: float | None = None):
+        start = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class MeteredQueue(MeteredQueueMixin, Queue):
+    pass
+
+
+class MeteredAsyncQueue(MeteredQueueMixin, AsyncAdaptedQueue):
+    pass
+
+
+class MeteredPoolMixin:
+    """
+    Exposes the wait times recorded by the metered queue of the pool.
+    """
+
+    @property
+    def wait_stats(self) -> PoolWaitStats:
+        return self._pool.wait_stats
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    _queue_class = MeteredQueue
+
+
+class MeteredAsyncQueuePool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    _queue_class = MeteredAsyncQueue
+
+
+def pool_options() -> dict:
+    """
+    The pool_options function collects the connection pool settings shared by every engine.
+
+    :return: A dict of keyword arguments for create_engine / create_async_engine
+    """
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def pool_status(bind) -> dict:
+    """
+    The pool_status function reports the current state of an engine's connection pool.
+
+    :param bind: The Engine or AsyncEngine whose pool is inspected
+    :return: A dict with checked-out, idle and overflow counts plus connection wait times
+    """
+    pool = bind.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        status.update(wait_stats.as_dict())
+    return status
+
+
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
+SQLALCHEMY_ASYNC_DATABASE_URL = settings.sqlalchemy_async_database_url or to_async_url(
+    SQLALCHEMY_DATABASE_URL
+)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Sync engine is kept for Alembic, scripts and tests
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, poolclass=MeteredQueuePool, **pool_options()
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=MeteredAsyncQueuePool, **pool_options()
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Read-only queries go to the replica when one is configured, otherwise to the primary
+if settings.sqlalchemy_replica_database_url:
+    async_read_engine = create_async_engine(
+        to_async_url(settings.sqlalchemy_replica_database_url),
+        poolclass=MeteredAsyncQueuePool,
+        **pool_options(),
+    )
+else:
+    async_read_engine = async_engine
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine, autoflush=False, expire_on_commit=False
+)
+
 
 # Dependecy
 def get_db():
@@ -22,3 +179,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    The get_async_db function is the dependency used by the routes.
+    It yields an AsyncSession, so database round-trips are awaited instead of blocking the event loop.
+
+    :return: An AsyncSession instance
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pin_to_primary(response: Response) -> None:
+    """
+    The pin_to_primary function marks the client so that its next reads go to the primary database.
+    It is set after a write, so the client sees its own changes while the replica catches up.
+
+    :param response: Response: The response that carries the pin cookie
+    :return: None
+    """
+    response.set_cookie(
+        READ_PRIMARY_COOKIE, "1", max_age=settings.db_replica_pin_seconds, httponly=True
+    )
+
+
+async def get_read_db(request: Request):
+    """
+    The get_read_db function is the dependency for read-only routes.
+    It yields a session on the read replica, or on the primary if the client was pinned to it by a recent write.
+
+    :param request: Request: Used to check the pin cookie
+    :return: An AsyncSession instance
+    """
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        session_local = AsyncSessionLocal
+    else:
+        session_local = AsyncReadSessionLocal
+    async with session_local() as db:
+        yield db
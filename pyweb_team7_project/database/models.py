@@ -1,6 +1,17 @@
 import enum
-
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, func, Enum
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    func,
+    Enum,
+    Index,
+    JSON,
+)
 from sqlalchemy.orm import declarative_base, relationship, Mapped
 from sqlalchemy.sql.sqltypes import DateTime
 
@@ -22,9 +33,10 @@ class User(Base):
     password = Column(String(250), nullable=False)
     avatar = Column(String(250), nullable=True)
     access_token = Column(String(250), nullable=True)
-    refresh_token = Column(String(250), nullable=True)
     confirmed = Column(Boolean, default=False)
     role: Mapped[Enum] = Column("role", Enum(Role), default=Role.admin)
+    # maintained by the images repository, repaired by repository.counters
+    images_count = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class Image(Base):
@@ -32,13 +44,24 @@ class Image(Base):
 
     id = Column(Integer, primary_key=True)
     file_url = Column(String(250), nullable=True)
-    public_id = Column(String(100), nullable=True)
+    # files of the local storage are shared by images with the same content
+    public_id = Column(String(100), nullable=True, index=True)
+    # SHA-256 of the uploaded file, images with the same content share its public_id
+    content_hash = Column(String(64), nullable=True, index=True)
     description = Column(String(250), nullable=True)
     # qrcode_url = Column(String(250), nullable=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     user = relationship("User", backref="images")
+    # maintained by the comments repository, repaired by repository.counters
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
     tags = relationship("Tag", secondary="image_tags")
     qr_code = relationship("QR_code", secondary="qr_images")
+    # QR codes generated by get_QR reference the image through qr_codes.photo_id
+    qr_codes = relationship("QR_code", viewonly=True, order_by="QR_code.id")
+
+    @property
+    def qr_code_url(self):
+        return self.qr_codes[0].url if self.qr_codes else None
 
 
 class QR_code(Base):
@@ -46,7 +69,7 @@ class QR_code(Base):
 
     id = Column(Integer, primary_key=True)
     url = Column(String(250), nullable=False)
-    photo_id = Column(Integer, ForeignKey("images.id"))
+    photo_id = Column(Integer, ForeignKey("images.id"), index=True)
 
 
 class QRImage(Base):  # связующая таблица между тегами и изображениями
@@ -67,19 +90,67 @@ class ImageTag(Base):  # связующая таблица между тегам
     __tablename__ = "image_tags"
 
     image_id = Column(Integer, ForeignKey("images.id"), primary_key=True)
-    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True, index=True)
 
 
 class Comment(Base):
     __tablename__ = "comments"
+    # image_id filters are served by the composite index, it also keeps comments in creation order
+    __table_args__ = (
+        Index("ix_comments_image_id_created_at", "image_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     content = Column(String(250), nullable=False)
-    created_at = Column(DateTime, nullable=False, default=func.now())
+    # set in Python with microseconds, SQLite's CURRENT_TIMESTAMP has none and would not compare
+    # equal to the created_at of a cursor, comments of the same second could be skipped
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     edited_at = Column(
         DateTime, nullable=False, default=func.now(), onupdate=func.now()
     )
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     user = relationship("User", backref="comments")
     image_id = Column(Integer, ForeignKey("images.id"))
     image = relationship("Image", backref="comments")
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # SHA-256 of the token, the token itself is never stored
+    token_hash = Column(String(64), unique=True, nullable=False)
+    device = Column(String(250), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    # set when the token was exchanged for a new one, presenting it again revokes the user's tokens
+    rotated_at = Column(DateTime, nullable=True)
+
+
+class EmailStatus(enum.Enum):
+    pending: str = "pending"
+    sent: str = "sent"
+    dead: str = "dead"
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # the worker polls for pending emails that are due
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(250), nullable=False)
+    subject = Column(String(250), nullable=False)
+    template_name = Column(String(100), nullable=False)
+    template_body = Column(JSON, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, default=func.now())
+    last_error = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
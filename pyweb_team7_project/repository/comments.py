@@ -1,46 +1,61 @@
+from datetime import datetime
 from typing import List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from pyweb_team7_project.database.models import Comment, User, Image
 from pyweb_team7_project.schemas import CommentResponseModel, CommentRequestModel
+from pyweb_team7_project.services.pagination import decode_cursor
 
 
-async def get_comment_by_id(comment_id: int, db: Session) -> Comment | None:
+async def get_comment_by_id(comment_id: int, db: AsyncSession) -> Comment | None:
     """
     The get_comment_by_id function takes a comment_id and db as parameters.
     It returns the first Comment object in the database that matches the given comment_id.
 
     :param comment_id: int: Specify the id of the comment to be returned
-    :param db: Session: Pass the database session into the function
+    :param db: AsyncSession: Pass the database session into the function
     :return: The comment object with the given id
     """
-    return db.query(Comment).filter(Comment.id == comment_id).first()
+    result = await db.execute(select(Comment).where(Comment.id == comment_id))
+    return result.scalars().first()
+
 
 async def get_all_image_comments(
-    image_id: int, skip: int, limit: int, db: Session
+    image_id: int, skip: int, limit: int, db: AsyncSession, cursor: str | None = None
 ) -> List[Comment]:
     """
-    The get_all_image_comments function returns a list of comments for the image with the given id.
-    The skip and limit parameters are used to paginate through results.
+    The get_all_image_comments function returns a list of comments for the image with the given id,
+    oldest first. A cursor continues right after the (created_at, id) of the last comment of the previous page,
+    otherwise skip and limit are used to paginate through results.
 
     :param image_id: int: Filter the comments by image id
-    :param skip: int: Skip a number of comments
+    :param skip: int: Skip a number of comments, ignored when a cursor is given
     :param limit: int: Limit the number of comments returned
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
+    :param cursor: str | None: The cursor of the previous page
     :return: A list of comments for a given image id
     """
-    return (
-        db.query(Comment)
-        .filter(Comment.image_id == image_id)
-        .offset(skip)
+    stmt = (
+        select(Comment)
+        .where(Comment.image_id == image_id)
+        .order_by(Comment.created_at, Comment.id)
         .limit(limit)
-        .all()
     )
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor, datetime.fromisoformat, int)
+        stmt = stmt.where(
+            tuple_(Comment.created_at, Comment.id) > (created_at, comment_id)
+        )
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt)
+    return result.scalars().all()
 
 
 async def create_comment(
-    body: CommentRequestModel, user: User, image_db: Image, db: Session
+    body: CommentRequestModel, user: User, image_db: Image, db: AsyncSession
 ) -> CommentResponseModel | None:
     """
     The create_comment function creates a new comment in the database.
@@ -51,7 +66,7 @@ async def create_comment(
     :param body: CommentRequestModel: Get the content of the comment
     :param user: User: Get the user who is making the comment
     :param image_db: Image: Get the image that is being commented on
-    :param db: Session: Create a database session
+    :param db: AsyncSession: Create a database session
     :return: A commentresponsemodel
     """
     new_comment = Comment()
@@ -60,43 +75,53 @@ async def create_comment(
     new_comment.user = user
     new_comment.image = image_db
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.execute(
+        update(Image)
+        .where(Image.id == image_db.id)
+        .values(comments_count=Image.comments_count + 1)
+    )
+    await db.commit()
+    await db.refresh(new_comment)
     return new_comment
 
 
 async def update_comment(
-    comment_db: Comment, body: CommentRequestModel, db: Session
+    comment_db: Comment, body: CommentRequestModel, db: AsyncSession
 ) -> Comment | None:
     """
     The update_comment function updates a comment in the database.
         Args:
             comment_db (Comment): The Comment object to be updated.
             body (CommentRequestModel): The new content of the Comment object.
-            db (Session): A Session instance for interacting with the database.
+            db (AsyncSession): A Session instance for interacting with the database.
 
     :param comment_db: Comment: Pass the comment object to the function
     :param body: CommentRequestModel: Get the content of the comment
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: The updated comment
     """
     comment_db.content = body.content
-    db.commit()
-    db.refresh(comment_db)
+    await db.commit()
+    await db.refresh(comment_db)
     return comment_db
 
 
 # todo: видаляти коменти можуnь тільки адміни
-async def remove_comment(comment_db: Comment, db: Session) -> Comment | None:
+async def remove_comment(comment_db: Comment, db: AsyncSession) -> Comment | None:
     """
     The remove_comment function removes a comment from the database.
     Args:
         comment_db (Comment): The Comment object to be removed from the database.
-        db (Session): The Session object used to interact with the database.
+        db (AsyncSession): The Session object used to interact with the database.
     :param comment_db: Comment: The comment object to be deleted.
-    :param db: Session: The database session.
+    :param db: AsyncSession: The database session.
     :return: The comment that was deleted or `None` if the comment does not exist.
     """
-    db.delete(comment_db)
-    db.commit()
+    await db.delete(comment_db)
+    await db.execute(
+        update(Image)
+        .where(Image.id == comment_db.image_id)
+        .values(comments_count=Image.comments_count - 1)
+    )
+    await db.commit()
     return comment_db
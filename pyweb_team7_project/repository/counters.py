@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.database.models import User, Image, Comment
+
+
+async def reconcile_counters(db: AsyncSession) -> dict:
+    """
+    The reconcile_counters function recomputes users.images_count and images.comments_count
+    from the rows they count and fixes the ones that drifted, e.g. after manual edits in the database.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The number of repaired users and images
+    """
+    images_count = (
+        select(func.count(Image.id)).where(Image.user_id == User.id).scalar_subquery()
+    )
+    comments_count = (
+        select(func.count(Comment.id))
+        .where(Comment.image_id == Image.id)
+        .scalar_subquery()
+    )
+    users = await db.execute(
+        update(User)
+        .where(User.images_count != images_count)
+        .values(images_count=images_count)
+        .execution_options(synchronize_session=False)
+    )
+    images = await db.execute(
+        update(Image)
+        .where(Image.comments_count != comments_count)
+        .values(comments_count=comments_count)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return {"users": users.rowcount, "images": images.rowcount}
+
+
+async def main():
+    from pyweb_team7_project.database.db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        repaired = await reconcile_counters(db)
+    print(
+        f"Repaired counters of {repaired['users']} users and {repaired['images']} images"
+    )
+
+
+if __name__ == "__main__":
+    # python -m pyweb_team7_project.repository.counters
+    asyncio.run(main())
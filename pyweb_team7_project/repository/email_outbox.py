@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.database.models import EmailOutbox, EmailStatus
+
+# the last error of an email whose worker never reported back
+LEASE_EXPIRED = "Lease expired without a result"
+
+
+async def enqueue_email(
+    recipient: str,
+    subject: str,
+    template_name: str,
+    template_body: dict,
+    db: AsyncSession,
+) -> EmailOutbox:
+    """
+    The enqueue_email function adds an email to the outbox in the session of the caller, the email worker sends it later.
+    The email is flushed but not committed, so it is stored together with the caller's changes or not at all.
+
+    :param recipient: str: The email address the message goes to
+    :param subject: str: The subject of the message
+    :param template_name: str: The template the message is rendered with
+    :param template_body: dict: The values passed to the template
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The stored email
+    """
+    email = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        template_name=template_name,
+        template_body=template_body,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(email)
+    await db.flush()
+    return email
+
+
+async def claim_emails(
+    limit: int, lease: float, max_attempts: int, db: AsyncSession
+) -> list[EmailOutbox]:
+    """
+    The claim_emails function takes up to limit pending emails that are due and counts an attempt for each.
+    Their next attempt is pushed lease seconds ahead, so an email a crashed worker claimed is retried after that.
+    An email whose lease ran out after its last attempt is dead-lettered instead of claimed again,
+    so an email that keeps crashing the worker is not retried forever.
+    On PostgreSQL the rows are locked with SKIP LOCKED, several workers never claim the same email.
+
+    :param limit: int: The maximum number of emails to claim
+    :param lease: float: Seconds the worker has to send the emails
+    :param max_attempts: int: Attempts before an email is dead-lettered
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The claimed emails
+    """
+    now = datetime.utcnow()
+    due = (
+        EmailOutbox.status == EmailStatus.pending,
+        EmailOutbox.next_attempt_at <= now,
+    )
+    await db.execute(
+        update(EmailOutbox)
+        .where(*due, EmailOutbox.attempts >= max_attempts)
+        .values(status=EmailStatus.dead, last_error=LEASE_EXPIRED)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(
+        select(EmailOutbox)
+        .where(*due)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    emails = result.scalars().all()
+    for email in emails:
+        email.attempts += 1
+        email.next_attempt_at = now + timedelta(seconds=lease)
+    await db.commit()
+    return emails
+
+
+async def mark_sent(email: EmailOutbox, db: AsyncSession) -> None:
+    """
+    The mark_sent function records that the server accepted the email.
+
+    :param email: EmailOutbox: The claimed email
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email.id)
+        .values(status=EmailStatus.sent, sent_at=datetime.utcnow(), last_error=None)
+    )
+    await db.commit()
+
+
+async def mark_failed(
+    email: EmailOutbox,
+    error: str,
+    max_attempts: int,
+    retry_delay: float,
+    db: AsyncSession,
+) -> None:
+    """
+    The mark_failed function schedules the next attempt of an email with exponential backoff,
+    the delay doubles with every attempt. After max_attempts the email is dead-lettered,
+    it stays in the outbox with its last error and is not retried.
+
+    :param email: EmailOutbox: The claimed email
+    :param error: str: Why the attempt failed
+    :param max_attempts: int: Attempts before the email is dead-lettered
+    :param retry_delay: float: Seconds before the first retry
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    if email.attempts >= max_attempts:
+        values = {"status": EmailStatus.dead}
+    else:
+        delay = retry_delay * 2 ** (email.attempts - 1)
+        values = {"next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)}
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email.id)
+        .values(last_error=error[:500], **values)
+    )
+    await db.commit()
@@ -1,29 +1,113 @@
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+import asyncio
+import logging
 
-import cloudinary
-from cloudinary.uploader import upload
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from pyweb_team7_project.database.models import User, Image, Tag, QR_code
-from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.database.models import User, Image, QR_code
+from pyweb_team7_project.repository.tags import resolve_tags
+from pyweb_team7_project.services.cache import invalidate_user
+from pyweb_team7_project.services.storage import file_sha256, storage
+from pyweb_team7_project.services.pagination import decode_cursor
 
 import os
 import qrcode
-import cloudinary
+
+logger = logging.getLogger(__name__)
+
+# Relationships serialized by ImageResponse, loaded up front in one query per relationship
+IMAGE_LOAD_OPTIONS = (selectinload(Image.tags), selectinload(Image.qr_codes))
+
+
+async def count_user_images(db: AsyncSession, user_id: int, delta: int) -> str:
+    """
+    Change users.images_count of the owner of an image by delta, in the transaction of the caller.
+    The cached user carries the counter, the caller invalidates it by the returned email once it committed.
+
+    :param db: The database session used to interact with the database.
+    :param user_id: The ID of the user who owns the image.
+    :param delta: 1 for a created image, -1 for a deleted one.
+    :type db: AsyncSession
+    :type user_id: int
+    :type delta: int
+    :return: The email of the user.
+    :rtype: str
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(images_count=User.images_count + delta)
+        .returning(User.email)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar()
+
+
+async def reload_image(db: AsyncSession, image: Image) -> Image:
+    """
+    Reload an image together with its tags and QR codes after a commit.
+    The object is refreshed in place, the session maps the row back to the same identity.
+
+    :param db: The database session used to interact with the database.
+    :param image: The image object to reload.
+    :type db: AsyncSession
+    :type image: Image
+    :return: The reloaded image object.
+    :rtype: Image
+    """
+    await db.execute(
+        select(Image)
+        .where(Image.id == image.id)
+        .options(*IMAGE_LOAD_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
+    return image
+
+
+async def find_image_by_hash(db: AsyncSession, content_hash: str):
+    """
+    Find an image whose file has the given content, to reuse its file instead of uploading another copy.
+    The row stays locked until the transaction ends, so delete_image can not remove the file
+    before the new image sharing it is committed.
+
+    :param db: The database session used to interact with the database.
+    :param content_hash: The SHA-256 of the file.
+    :type db: AsyncSession
+    :type content_hash: str
+    :return: The image, None if no image has this content.
+    :rtype: Image
+    """
+    result = await db.execute(
+        select(Image)
+        .where(Image.content_hash == content_hash)
+        .order_by(Image.id)
+        .limit(1)
+        .with_for_update()
+    )
+    return result.scalars().first()
+
+
+def _stored_file(image: Image) -> dict:
+    """
+    The upload result for the file of an existing image, its file_url may point to a transformed version.
+    """
+    return {"public_id": image.public_id, "secure_url": storage.url(image.public_id)}
 
 
 async def create_image_and_upload_to_cloudinary(
-    db: Session, file, description: str, user_id: int, tag_names: list = None
+    db: AsyncSession, file, description: str, user_id: int, tag_names: list = None
 ) -> Image:
     """
     Create an image object, upload the image file to Cloudinary, and associate it with a user in the database.
+    When an image with the same content exists its file is reused and nothing is uploaded.
 
     :param db: The database session used to interact with the database.
     :param file: The image file to be uploaded.
     :param description: The description of the image.
     :param user_id: The ID of the user who owns the image.
     :param tag_names: A list of tag names to associate with the image. Defaults to None.
-    :type db: Session
+    :type db: AsyncSession
     :type file: Any
     :type description: str
     :type user_id: int
@@ -31,23 +115,70 @@ async def create_image_and_upload_to_cloudinary(
     :return: The created image object.
     :rtype: Image
     """
-    user = db.query(User).filter_by(id=user_id).first()
+    result = await db.execute(select(User).filter_by(id=user_id))
+    user = result.scalars().first()
 
     if not user:
         raise Exception("User not found")
 
-    image = Image(description=description, user_id=user_id, file_url="cloudinary")
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
+    content_hash = await asyncio.to_thread(file_sha256, file.file)
+    existing = await find_image_by_hash(db, content_hash)
+    if existing is not None:
+        result = _stored_file(existing)
+    else:
+        result = await storage.upload(file.file, filename=file.filename)
+
+    return await create_image_from_upload(
+        db,
+        result,
+        description=description,
+        user_id=user_id,
+        tag_names=tag_names,
+        content_hash=content_hash,
     )
 
-    print(file.file)
 
-    result = upload(file.file)
+async def create_image_from_upload(
+    db: AsyncSession,
+    result: dict,
+    description: str,
+    user_id: int,
+    tag_names: list = None,
+    content_hash: str = None,
+) -> Image:
+    """
+    Create an image object for a file already stored by the storage backend, e.g. a streamed upload.
+    A streamed file is only hashed once it is stored, so when an image with the same content exists
+    the new copy is deleted and the image shares the file of the existing one.
+
+    :param db: The database session used to interact with the database.
+    :param result: The upload result of the storage backend.
+    :param description: The description of the image.
+    :param user_id: The ID of the user who owns the image.
+    :param tag_names: A list of tag names to associate with the image. Defaults to None.
+    :param content_hash: The SHA-256 of the file. Defaults to None.
+    :type db: AsyncSession
+    :type result: dict
+    :type description: str
+    :type user_id: int
+    :type tag_names: list, optional
+    :type content_hash: str, optional
+    :return: The created image object.
+    :rtype: Image
+    """
+    duplicate = None
+    if content_hash:
+        existing = await find_image_by_hash(db, content_hash)
+        if existing is not None and existing.public_id != result.get("public_id"):
+            duplicate = result.get("public_id")
+            result = _stored_file(existing)
+
+    image = Image(
+        description=description,
+        user_id=user_id,
+        file_url="cloudinary",
+        content_hash=content_hash,
+    )
 
     # Отримуємо public ID завантаженого зображення
     image.public_id = result.get("public_id")
@@ -55,20 +186,23 @@ async def create_image_and_upload_to_cloudinary(
     image.file_url = result.get("secure_url")
 
     if tag_names:
-        for tag_name in tag_names:
-            tag = db.query(Tag).filter_by(name=tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-            image.tags.append(tag)
+        image.tags.extend(await resolve_tags(tag_names, db))
 
     db.add(image)
-    db.commit()
-    db.refresh(image)
+    owner_email = await count_user_images(db, user_id, 1)
+    await db.commit()
+    await invalidate_user(owner_email)
 
-    return image
+    if duplicate:
+        try:
+            await storage.delete(duplicate)
+        except Exception as e:
+            logger.warning("Duplicate file %s not deleted: %s", duplicate, e)
 
+    return await reload_image(db, image)
 
-async def get_image_by_id(user: User, db: Session, image_id: int):
+
+async def get_image_by_id(user: User, db: AsyncSession, image_id: int):
     """
     Retrieve an image from the database based on the provided user, database session, and image ID.
 
@@ -76,39 +210,84 @@ async def get_image_by_id(user: User, db: Session, image_id: int):
     :param db: The database session used to interact with the database.
     :param image_id: The ID of the image to retrieve.
     :type user: User
-    :type db: Session
+    :type db: AsyncSession
     :type image_id: int
     :return: The retrieved image object.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(
+    result = await db.execute(
+        select(Image)
+        .where(
             and_(
                 Image.id == image_id,
                 # Image.user_id == user.id
             )
         )
-        .first()
+        .options(*IMAGE_LOAD_OPTIONS)
     )
+    image = result.scalars().first()
     return image
 
 
-async def get_all_images(db: Session):
+def _images_after(cursor: str = None):
+    """
+    Build the select of images ordered by ID, starting after the ID held by the cursor.
+
+    :param cursor: The cursor of the previous page.
+    :type cursor: str, optional
+    :return: The select statement.
+    :rtype: Select
+    """
+    stmt = select(Image).options(*IMAGE_LOAD_OPTIONS).order_by(Image.id)
+    if cursor:
+        (image_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(Image.id > image_id)
+    return stmt
+
+
+async def get_all_images(db: AsyncSession, limit: int = None, cursor: str = None):
     """
-    Retrieve all images from the database.
+    Retrieve images from the database ordered by ID.
 
     :param db: The database session used to interact with the database.
-    :type db: Session
-    :return: A list of all image objects.
+    :param limit: The maximum number of images to retrieve. All images when omitted.
+    :param cursor: The cursor of the previous page, images after its ID are returned.
+    :type db: AsyncSession
+    :type limit: int, optional
+    :type cursor: str, optional
+    :return: A list of image objects.
     :rtype: List[Image]
     """
-    images = db.query(Image).all()
+    stmt = _images_after(cursor)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    images = result.scalars().all()
     return images
 
 
+async def stream_images(db: AsyncSession, cursor: str = None, yield_per: int = 500):
+    """
+    Iterate over images ordered by ID through a server-side cursor.
+    Rows are fetched in batches of yield_per, so memory use doesn't grow with the size of the table.
+
+    :param db: The database session used to interact with the database.
+    :param cursor: The cursor of the previous page, images after its ID are returned.
+    :param yield_per: The number of rows fetched per round-trip.
+    :type db: AsyncSession
+    :type cursor: str, optional
+    :type yield_per: int
+    :return: An async iterator of image objects.
+    :rtype: AsyncIterator[Image]
+    """
+    stmt = _images_after(cursor).execution_options(yield_per=yield_per)
+    result = await db.stream_scalars(stmt)
+    async for image in result:
+        yield image
+
+
 async def update_image_description(
-    user: User, db: Session, image_id: int, new_description: str
+    user: User, db: AsyncSession, image_id: int, new_description: str
 ):
     """
     Update the description of an image in the database.
@@ -118,29 +297,20 @@ async def update_image_description(
     :param image_id: The ID of the image to update.
     :param new_description: The new description for the image.
     :type user: User
-    :type db: Session
+    :type db: AsyncSession
     :type image_id: int
     :type new_description: str
     :return: The updated image object.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(
-            and_(
-                Image.id == image_id,
-                # Image.user_id == user.id
-            )
-        )
-        .first()
-    )
+    image = await get_image_by_id(user, db, image_id)
     if image:
         image.description = new_description
-        db.commit()
+        await db.commit()
     return image
 
 
-async def update_image_qrcode_url(image: Image, db: Session, new_qrcode_url: str):
+async def update_image_qrcode_url(image: Image, db: AsyncSession, new_qrcode_url: str):
     """
     Update the QR code URL of an image in the database.
 
@@ -148,7 +318,7 @@ async def update_image_qrcode_url(image: Image, db: Session, new_qrcode_url: str
     :param db: The database session used to interact with the database.
     :param new_qrcode_url: The new QR code URL for the image.
     :type image: Image
-    :type db: Session
+    :type db: AsyncSession
     :type new_qrcode_url: str
     :return: The updated image object.
     :rtype: Image
@@ -156,56 +326,72 @@ async def update_image_qrcode_url(image: Image, db: Session, new_qrcode_url: str
     if image:
         # image.qrcode_url = new_qrcode_url
         image.file_url = new_qrcode_url
-        db.commit()
-        db.refresh(image)
-        return image
+        await db.commit()
+        return await reload_image(db, image)
 
 
-async def delete_image(user: User, db: Session, image_id: int):
+async def delete_image(user: User, db: AsyncSession, image_id: int):
     """
-    Delete an image from the database.
+    Delete an image from the database and its file from the storage, unless another image shares the file.
 
     :param user: The user object who is deleting the image.
     :param db: The database session used to interact with the database.
     :param image_id: The ID of the image to delete.
     :type user: User
-    :type db: Session
+    :type db: AsyncSession
     :type image_id: int
     :return: The deleted image object.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == user.id))
-        .first()
+    result = await db.execute(
+        select(Image).where(and_(Image.id == image_id, Image.user_id == user.id))
     )
+    image = result.scalars().first()
     if not image:
         return False, {"message": "image not found"}
     if image:
         # Delete corresponding qr_codes rows
-        db.query(QR_code).filter(QR_code.photo_id == image_id).delete()
-        db.delete(image)
-        db.commit()
+        await db.execute(delete(QR_code).where(QR_code.photo_id == image_id))
+        await db.delete(image)
+        owner_email = await count_user_images(db, image.user_id, -1)
+        await db.commit()
+        await invalidate_user(owner_email)
         print("Image deleted")
+        # images with the same content share one file
+        if image.public_id:
+            shared = await db.execute(
+                select(Image.id).where(Image.public_id == image.public_id).limit(1)
+            )
+            if shared.first() is None:
+                try:
+                    await storage.delete(image.public_id)
+                except Exception as e:
+                    logger.warning(
+                        "Orphaned file %s not deleted: %s", image.public_id, e
+                    )
     return image
 
 
-async def get_QR(image_id: int, db: Session):
+async def get_QR(image_id: int, db: AsyncSession):
     """
     Retrieve the QR code URL for an image from the database.
 
     :param image_id: The ID of the image.
     :param db: The database session used to interact with the database.
     :type image_id: int
-    :type db: Session
+    :type db: AsyncSession
     :return: A dictionary containing the QR code URL for the image.
     :rtype: Dict[str, str]
     """
-    image = db.query(Image).filter(and_(Image.id == image_id)).first()
+    result = await db.execute(select(Image).where(and_(Image.id == image_id)))
+    image = result.scalars().first()
     if image is None:
         raise Exception("Image not found")
     else:
-        qr = db.query(QR_code).filter(and_(QR_code.photo_id == image_id)).first()
+        result = await db.execute(
+            select(QR_code).where(and_(QR_code.photo_id == image_id))
+        )
+        qr = result.scalars().first()
         print(qr)
         if qr is None:
             qr = qrcode.QRCode(
@@ -222,25 +408,15 @@ async def get_QR(image_id: int, db: Session):
             qr_code_file_path = "my_qr_code.png"
             img.save(qr_code_file_path)
 
-            cloudinary.config(
-                cloud_name=settings.cloudinary_name,
-                api_key=settings.cloudinary_api_key,
-                api_secret=settings.cloudinary_api_secret,
-                secure=True,
-            )
-
-            upload_result = cloudinary.uploader.upload(
-                qr_code_file_path,
-                public_id=f"Qr_Code/Photo_{image_id}",
-                overwrite=True,
-                invalidate=True,
+            upload_result = await storage.upload(
+                qr_code_file_path, public_id=f"Qr_Code/Photo_{image_id}"
             )
             qr = QR_code(url=upload_result["secure_url"], photo_id=image_id)
 
             try:
                 db.add(qr)
-                db.commit()
-                db.refresh(qr)
+                await db.commit()
+                await db.refresh(qr)
             except Exception as e:
                 await db.rollback()
                 raise e
@@ -248,4 +424,4 @@ async def get_QR(image_id: int, db: Session):
             os.remove(qr_code_file_path)
             return {"qr_code_url": qr.url}
 
-        return {"qr_code_url": qr}
+        return {"qr_code_url": qr.url}
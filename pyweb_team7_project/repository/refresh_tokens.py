@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.database.models import RefreshToken
+
+
+def hash_token(token: str) -> str:
+    """
+    The hash_token function returns the SHA-256 hex digest a refresh token is stored under.
+
+    :param token: str: The refresh token
+    :return: The digest of the token
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def add_refresh_token(
+    user_id: int, token: str, expires_at: datetime, device: str | None, db: AsyncSession
+) -> None:
+    """
+    The add_refresh_token function stores a new refresh token of a user, one entry per login,
+    and drops the expired tokens of that user in the same transaction.
+    Rotated tokens are kept until they expire, so a replayed one is recognized.
+
+    :param user_id: int: The id of the user the token was issued to
+    :param token: str: The refresh token
+    :param expires_at: datetime: When the token expires, in UTC
+    :param device: str | None: A label of the device that logged in, e.g. its user agent
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    await db.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.expires_at <= datetime.utcnow(),
+        )
+    )
+    db.add(
+        RefreshToken(
+            user_id=user_id,
+            token_hash=hash_token(token),
+            device=device[:250] if device else None,
+            expires_at=expires_at,
+        )
+    )
+    await db.commit()
+
+
+async def rotate_refresh_token(
+    old_token: str, new_token: str, expires_at: datetime, db: AsyncSession
+) -> int | None:
+    """
+    The rotate_refresh_token function replaces a valid refresh token with a new one for the same device.
+    The old token is marked rotated in a single UPDATE, so two requests racing with the same token can not both succeed.
+    A rotated token that is presented again was replayed, e.g. after it was stolen,
+    so every token of its user is revoked and all devices have to log in again.
+
+    :param old_token: str: The refresh token presented by the client
+    :param new_token: str: The refresh token issued instead
+    :param expires_at: datetime: When the new token expires, in UTC
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The id of the user the token belongs to, None if it is unknown, used or expired
+    """
+    now = datetime.utcnow()
+    old_hash = hash_token(old_token)
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == old_hash,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.device)
+        .execution_options(synchronize_session=False)
+    )
+    rotated = result.first()
+    if rotated is not None:
+        db.add(
+            RefreshToken(
+                user_id=rotated.user_id,
+                token_hash=hash_token(new_token),
+                device=rotated.device,
+                expires_at=expires_at,
+            )
+        )
+        await db.commit()
+        return rotated.user_id
+
+    replayed_by = await db.scalar(
+        select(RefreshToken.user_id).where(
+            RefreshToken.token_hash == old_hash, RefreshToken.rotated_at.is_not(None)
+        )
+    )
+    if replayed_by is not None:
+        await db.execute(
+            delete(RefreshToken).where(RefreshToken.user_id == replayed_by)
+        )
+    await db.commit()
+    return None
+
+
+async def revoke_refresh_token(token: str, db: AsyncSession) -> None:
+    """
+    The revoke_refresh_token function deletes a refresh token, logging out the device that holds it.
+
+    :param token: str: The refresh token
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    await db.execute(
+        delete(RefreshToken).where(RefreshToken.token_hash == hash_token(token))
+    )
+    await db.commit()
+
+
+async def revoke_user_refresh_tokens(user_id: int, db: AsyncSession) -> None:
+    """
+    The revoke_user_refresh_tokens function deletes the refresh tokens of every device of a user.
+
+    :param user_id: int: The id of the user
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+    await db.commit()
+
+
+async def purge_expired_refresh_tokens(db: AsyncSession) -> int:
+    """
+    The purge_expired_refresh_tokens function deletes the expired refresh tokens of all users,
+    including users that never log in again and so never drop theirs in add_refresh_token.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The number of deleted tokens
+    """
+    result = await db.execute(
+        delete(RefreshToken).where(RefreshToken.expires_at <= datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def main():
+    from pyweb_team7_project.database.db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        purged = await purge_expired_refresh_tokens(db)
+    print(f"Purged {purged} expired refresh tokens")
+
+
+if __name__ == "__main__":
+    # python -m pyweb_team7_project.repository.refresh_tokens
+    asyncio.run(main())
@@ -1,26 +1,44 @@
 from typing import List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from pyweb_team7_project.database.models import Tag
 from pyweb_team7_project.schemas import TagModel, TagResponse
+from pyweb_team7_project.services.pagination import decode_cursor
 
+# Dialects that can skip duplicate names with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
 
-async def get_tags(skip: int, limit: int, db: Session) -> List[Tag]:
+
+async def get_tags(
+    skip: int, limit: int, db: AsyncSession, cursor: str | None = None
+) -> List[Tag]:
     """
-    Get a list of tags from the database.
+    Get a list of tags from the database ordered by ID.
 
-    :param skip: The number of tags to skip.
+    :param skip: The number of tags to skip, ignored when a cursor is given.
     :param limit: The maximum number of tags to retrieve.
     :param db: The database session used to interact with the database.
+    :param cursor: The cursor of the previous page, tags after its ID are returned.
     :return: A list of tag objects.
     """
-    tags = db.query(Tag).offset(skip).limit(limit).all()
+    stmt = select(Tag).order_by(Tag.id).limit(limit)
+    if cursor:
+        (tag_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(Tag.id > tag_id)
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt)
+    tags = result.scalars().all()
     tag_dicts = [{"name": tag.name, "id": tag.id} for tag in tags]
     return tag_dicts
 
 
-async def get_tag(tag_id: int, db: Session) -> Tag:
+async def get_tag(tag_id: int, db: AsyncSession) -> Tag:
     """
     Get a tag from the database by its ID.
 
@@ -28,10 +46,11 @@ async def get_tag(tag_id: int, db: Session) -> Tag:
     :param db: The database session used to interact with the database.
     :return: The retrieved tag object.
     """
-    return db.query(Tag).filter(Tag.id == tag_id).first()
+    result = await db.execute(select(Tag).where(Tag.id == tag_id))
+    return result.scalars().first()
 
 
-async def create_tag(body: TagModel, db: Session) -> TagResponse:
+async def create_tag(body: TagModel, db: AsyncSession) -> TagResponse:
     """
     Create a new tag in the database.
 
@@ -41,12 +60,12 @@ async def create_tag(body: TagModel, db: Session) -> TagResponse:
     """
     tag = Tag(name=body.name)
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
     return TagResponse(id=tag.id, name=tag.name)
 
 
-async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
+async def update_tag(tag_id: int, body: TagModel, db: AsyncSession) -> Tag | None:
     """
     Update an existing tag in the database.
 
@@ -55,14 +74,14 @@ async def update_tag(tag_id: int, body: TagModel, db: Session) -> Tag | None:
     :param db: The database session used to interact with the database.
     :return: The updated tag object if found, else None.
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await get_tag(tag_id, db)
     if tag:
         tag.name = body.name
-        db.commit()
+        await db.commit()
     return tag
 
 
-async def remove_tag(tag_id: int, db: Session) -> Tag | None:
+async def remove_tag(tag_id: int, db: AsyncSession) -> Tag | None:
     """
     Remove a tag from the database.
 
@@ -70,8 +89,55 @@ async def remove_tag(tag_id: int, db: Session) -> Tag | None:
     :param db: The database session used to interact with the database.
     :return: The removed tag object if found, else None.
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await get_tag(tag_id, db)
     if tag:
-        db.delete(tag)
-        db.commit()
+        await db.delete(tag)
+        await db.commit()
     return tag
+
+
+async def _select_tags_by_name(names: List[str], db: AsyncSession) -> dict:
+    result = await db.execute(select(Tag).where(Tag.name.in_(names)))
+    return {tag.name: tag for tag in result.scalars().all()}
+
+
+async def resolve_tags(tag_names: List[str], db: AsyncSession) -> List[Tag]:
+    """
+    Get the tags with the given names, creating the ones that do not exist yet.
+    Existing tags are fetched with one IN query and the missing ones are inserted with
+    ON CONFLICT DO NOTHING, so a tag created meanwhile by a concurrent request is skipped
+    instead of failing on the unique constraint, and then fetched by name.
+
+    :param tag_names: The names of the tags, duplicates are ignored.
+    :param db: The database session used to interact with the database.
+    :return: The tag objects in the order of the first occurrence of their names.
+    """
+    names = list(dict.fromkeys(tag_names))
+    if not names:
+        return []
+
+    tags = await _select_tags_by_name(names, db)
+    missing = [{"name": name} for name in names if name not in tags]
+    if missing:
+        dialect = db.get_bind().dialect
+        upsert_insert = UPSERT_INSERTS.get(dialect.name)
+        if upsert_insert is None:
+            for values in missing:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(Tag), values)
+                except IntegrityError:
+                    pass
+        else:
+            stmt = upsert_insert(Tag).on_conflict_do_nothing(index_elements=["name"])
+            if dialect.insert_returning:
+                result = await db.execute(stmt.returning(Tag), missing)
+                tags.update({tag.name: tag for tag in result.scalars().all()})
+            else:
+                await db.execute(stmt, missing)
+
+        lost = [name for name in names if name not in tags]
+        if lost:
+            tags.update(await _select_tags_by_name(lost, db))
+
+    return [tags[name] for name in names if name in tags]
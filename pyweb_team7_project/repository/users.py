@@ -1,34 +1,96 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from pyweb_team7_project.database.models import User, Role
 from pyweb_team7_project.schemas import UserModel
-from sqlalchemy import func
-
-
-async def get_user_by_email(email: str, db: Session) -> User | None:
+from pyweb_team7_project.services.cache import (
+    invalidate_user,
+    shared_user_cache,
+    token_versions,
+    user_cache,
+)
+from pyweb_team7_project.services.pagination import decode_cursor
+
+# the columns of a user kept by the user caches
+USER_RECORD_FIELDS = (
+    "id",
+    "username",
+    "email",
+    "avatar",
+    "role",
+    "confirmed",
+    "images_count",
+)
+
+
+async def get_user_by_email(email: str, db: AsyncSession) -> User | None:
     """
     The get_user_by_email function takes in an email and a database session,
     then returns the user with that email.
 
     :param email: str: Pass in the email of the user that we want to get
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: The first user found with the email specified
     """
-    return db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
+async def get_cached_user_by_email(email: str, db: AsyncSession) -> User | None:
+    """
+    The get_cached_user_by_email function returns the user with that email like get_user_by_email,
+    but serves repeated lookups from the in-process user cache and then from the shared Redis cache.
+    The caches keep the columns of USER_RECORD_FIELDS only, a new User is built from them and merged
+    into the session on every hit, so requests never share an instance and no query is issued.
+
+    :param email: str: Pass in the email of the user that we want to get
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The user with the email specified or None
+    """
+    record = user_cache.get(email)
+    if record is None:
+        record = await shared_user_cache.get(email)
+        if record is None:
+            user = await get_user_by_email(email, db)
+            if user is not None:
+                record = user_record(user)
+                user_cache.set(email, record)
+                await shared_user_cache.set(email, record)
+            return user
+        user_cache.set(email, record)
+
+    role = Role(record["role"]) if record["role"] else None
+    user = User(**dict(record, role=role))
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+def user_record(user: User) -> dict:
+    """
+    The user_record function serializes a user into a JSON compatible dict kept by the user caches.
+    Only the columns a request needs are kept, the password hash and the tokens never leave the database.
+
+    :param user: User: The user to serialize
+    :return: A dict of column values, the role is stored by its value
+    """
+    record = {key: getattr(user, key) for key in USER_RECORD_FIELDS}
+    record["role"] = user.role.value if user.role else None
+    return record
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     The create_user function creates a new user in the database.
         Args:
             body (UserModel): The UserModel object containing the information to be added to the database.
-            db (Session): The SQLAlchemy Session object used for querying and updating data in the database.
+            db (AsyncSession): The SQLAlchemy Session object used for querying and updating data in the database.
         Returns:
             User: A User object representing a newly created user.
 
     :param body: UserModel: Pass the data from the request body into our create_user function
-    :param db: Session: Create a database session
+    :param db: AsyncSession: Create a database session
     :return: A user object
     """
     avatar = None
@@ -41,60 +103,58 @@ async def create_user(body: UserModel, db: Session) -> User:
     new_user = User(**body.model_dump(), avatar=avatar)
     new_user.role = Role.user
 
-    users_count = db.query(func.count(User.id)).scalar()
+    # the first registered user becomes admin
+    any_user_id = await db.scalar(select(User.id).limit(1))
 
-    if users_count == 0:
+    if any_user_id is None:
         new_user.role = Role.admin
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return new_user
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
-    """
-    The update_token function updates the refresh token for a user.
-
-    :param user: User: Identify the user that is being updated
-    :param token: str | None: Pass the token to the function
-    :param db: Session: Commit the changes to the database
-    :return: None, so the return type should be none
-    """
-    user.refresh_token = token
-    db.commit()
-
-
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     The confirmed_email function sets the confirmed field of a user to True.
 
     :param email: str: Pass the email address of the user to be confirmed
-    :param db: Session: Pass the database session into the function
+    :param db: AsyncSession: Pass the database session into the function
     :return: None
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await invalidate_user(email)
 
 
-async def get_users(skip: int, limit: int, db: Session) -> list[User]:
+async def get_users(
+    skip: int, limit: int, db: AsyncSession, cursor: str | None = None
+) -> list[User]:
     """
-    The get_users function returns a list of all users from the database.
+    The get_users function returns a list of all users from the database ordered by id.
 
-    :param skip: int: Skip the first n records in the database
+    :param skip: int: Skip the first n records in the database, ignored when a cursor is given
     :param limit: int: Limit the number of results returned
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
+    :param cursor: str | None: The cursor of the previous page, users after its id are returned
     :return: A list of all users
     """
-    query = db.query(User).offset(skip).limit(limit).all()
-    return query
+    stmt = select(User).order_by(User.id).limit(limit)
+    if cursor:
+        (user_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(User.id > user_id)
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt)
+    return result.scalars().all()
 
 
-async def make_user_role(email: str, role: Role, db: Session) -> None:
+async def make_user_role(email: str, role: Role, db: AsyncSession) -> None:
     """
     The make_user_role function takes in an email and a role, and then updates the user's role to that new one.
     Args:
@@ -103,14 +163,17 @@ async def make_user_role(email: str, role: Role, db: Session) -> None:
 
     :param email: str: Get the user by email
     :param role: Role: Set the role of the user
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: None
     """
 
     user = await get_user_by_email(email, db)
     user.role = role
     try:
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise e
+    finally:
+        await invalidate_user(email)
+    await token_versions.bump(user.id)
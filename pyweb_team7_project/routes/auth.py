@@ -4,7 +4,6 @@ from fastapi import (
     Depends,
     status,
     Security,
-    BackgroundTasks,
     Request,
 )
 from fastapi.security import (
@@ -13,13 +12,20 @@ from fastapi.security import (
     HTTPBearer,
 )
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db
+from pyweb_team7_project.database.models import User
 from pyweb_team7_project.schemas import UserModel, ResponseUser, TokenModel, EmailSchema
 from pyweb_team7_project.repository import users as repository_users
+from pyweb_team7_project.repository import refresh_tokens as repository_refresh_tokens
 from pyweb_team7_project.services.auth import auth_service
-from pyweb_team7_project.services.email import send_email
+from pyweb_team7_project.services.cache import token_versions
+from pyweb_team7_project.services.email import queue_email
+from pyweb_team7_project.services.throttling import (
+    check_login_attempt,
+    clear_login_attempts,
+)
 
 router = APIRouter(prefix="/auth", tags=["Authorization"])
 security = HTTPBearer()
@@ -29,14 +35,14 @@ ALGORITHM = "HS256"
 
 @router.post(
     "/signup", response_model=ResponseUser, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     The signup function creates a new user in the database.
         It takes an email and password as input, hashes the password, and stores it in the database.
         If there is already a user with that email address, it returns an error message.
 
     :param body: UserModel: Get the data from the request body
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A dict, but the function expects a usermodel
     """
     exist_user = await repository_users.get_user_by_email(body.email, db)
@@ -44,9 +50,10 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Account already exists"
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.hash_password(body.password)
+    # the confirmation email is committed together with the user, or not at all
+    await queue_email(body.email, body.username, request.base_url, db)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": "User successfully created"}
 
 
@@ -55,15 +62,22 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     response_model=TokenModel,
     description="No more than 10 requests per minute")
 async def login(
-    body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    request: Request,
+    body: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     The login function is used to authenticate a user.
+    Every login gets its own refresh token, so each device can refresh and log out on its own.
 
+    :param request: Request: Get the user agent the refresh token is stored with
     :param body: OAuth2PasswordRequestForm: Get the username and password from the request body
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A dictionary with the access_token, refresh_token and token type
     """
+    await check_login_attempt(
+        body.username, request.client.host if request.client else None
+    )
     user = await repository_users.get_user_by_email(body.username, db)
     if user is None:
         raise HTTPException(
@@ -73,15 +87,26 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed"
         )
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(
+        body.password, user.password
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password"
         )
-    access_token = await auth_service.create_access_token(
-        data={"sub": user.email}, expires_delta=3600
-    )
+    await clear_login_attempts(body.username)
+    if new_hash:
+        # stored with another bcrypt cost, committed together with the refresh token
+        user.password = new_hash
+    access_token = await auth_service.create_user_access_token(user, expires_delta=3600)
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repository_users.update_token(user, refresh_token, db)
+    await repository_refresh_tokens.add_refresh_token(
+        user.id,
+        refresh_token,
+        auth_service.token_expires_at(refresh_token),
+        request.headers.get("user-agent"),
+        db,
+    )
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -96,31 +121,31 @@ async def login(
     dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     The refresh_token function is used to refresh the access token.
     It takes in a refresh token and returns an access_token, a new refresh_token, and the type of token (bearer).
+    The presented refresh token is replaced by the new one, it can not be used again.
 
 
     :param credentials: HTTPAuthorizationCredentials: Get the credentials from the request header
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A new access token and a new refresh token
     """
     token = credentials.credentials
     email = await auth_service.decode_refresh_token(token)
     user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
+    user_id = await repository_refresh_tokens.rotate_refresh_token(
+        token, refresh_token, auth_service.token_expires_at(refresh_token), db
+    )
+    if user is None or user_id != user.id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    user.refresh_token = refresh_token
-    db.commit()
-    await repository_users.update_token(user, refresh_token, db)
+    access_token = await auth_service.create_user_access_token(user)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -128,8 +153,45 @@ async def refresh_token(
     }
 
 
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    The logout function logs out the device that holds the refresh token.
+    The refresh token is revoked, the other devices of the user stay logged in.
+
+    :param credentials: HTTPAuthorizationCredentials: Get the refresh token from the request header
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A dict with a message
+    """
+    token = credentials.credentials
+    await auth_service.decode_refresh_token(token)
+    await repository_refresh_tokens.revoke_refresh_token(token, db)
+    return {"message": "Logged out"}
+
+
+@router.post("/logout_all")
+async def logout_all(
+    current_user: User = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    The logout_all function logs the current user out of every device.
+    All refresh tokens of the user are revoked, and in the stateless mode the access tokens issued so far too.
+
+    :param current_user: User: The user to log out
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A dict with a message
+    """
+    await repository_refresh_tokens.revoke_user_refresh_tokens(current_user.id, db)
+    await token_versions.bump(current_user.id)
+    return {"message": "Logged out of all devices"}
+
+
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_async_db)):
     """
     The confirmed_email function is used to confirm a user's email address.
     It takes the token from the URL and uses it to get the user's email address.
@@ -140,7 +202,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     with that email as its argument
 
     :param token: str: Get the token from the url
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A json object with a message
     """
     email = await auth_service.get_email_from_token(token)
@@ -160,9 +222,8 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     description="No more than 10 requests per minute")
 async def request_email(
     body: EmailSchema,
-    background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     The request_email function is used to send an email to the user with a link that will allow them
@@ -173,9 +234,8 @@ async def request_email(
     If they have already confirmed their account, then
 
     :param body: EmailSchema: Validate the data sent in the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the server,
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :return: A dict with a message
     """
     user = await repository_users.get_user_by_email(body.email, db)
@@ -183,7 +243,6 @@ async def request_email(
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+        await queue_email(user.email, user.username, request.base_url, db)
+        await db.commit()
     return {"message": "Check your email for confirmation."}
@@ -1,9 +1,9 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db, get_read_db
 from pyweb_team7_project.database.models import User, Role
 from pyweb_team7_project.repository import images as images_repo
 from pyweb_team7_project.repository import comments as comments_repo
@@ -13,6 +13,7 @@ from pyweb_team7_project.schemas import (
     CommentUpdateModel,
 )
 from pyweb_team7_project.services.auth import auth_service
+from pyweb_team7_project.services.pagination import MAX_PAGE_SIZE, set_next_cursor
 from pyweb_team7_project.services.roles import admin_moderator, admin, free_access
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
@@ -23,7 +24,7 @@ router = APIRouter(prefix="/comments", tags=["Comments"])
     response_model=CommentResponseModel,
     dependencies=[Depends(free_access)],
 )
-async def get_comment_by_id(comment_id: int, db: Session = Depends(get_db)):
+async def get_comment_by_id(comment_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get a comment by its ID.
 
@@ -47,19 +48,30 @@ async def get_comment_by_id(comment_id: int, db: Session = Depends(get_db)):
     dependencies=[Depends(free_access)],
 )
 async def get_all_image_comments(
-    image_id: int, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)
+    image_id: int,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
-    Get all comments for a specific image.
+    Get all comments for a specific image, oldest first.
+    When the page is full the X-Next-Cursor header holds the cursor of the next page.
 
     :param image_id: The ID of the image.
-    :param skip: The number of comments to skip.
-    :param limit: The maximum number of comments to retrieve.
+    :param response: The response used to return the next cursor.
+    :param skip: The number of comments to skip, ignored when a cursor is given.
+    :param limit: The maximum number of comments to retrieve, from 1 to MAX_PAGE_SIZE.
+    :param cursor: The X-Next-Cursor value of the previous page.
     :param db: The database session used to interact with the database.
     :return: A list of comment objects.
     """
-    comments_result = await images_repo.get_all_image_comments(
-        image_id=image_id, skip=skip, limit=limit, db=db
+    comments_result = await comments_repo.get_all_image_comments(
+        image_id=image_id, skip=skip, limit=limit, db=db, cursor=cursor
+    )
+    set_next_cursor(
+        response, comments_result, limit, key=lambda c: (c.created_at, c.id)
     )
     return comments_result
 
@@ -73,7 +85,7 @@ async def get_all_image_comments(
 async def create_comment(
     body: CommentRequestModel,
     user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new comment.
@@ -84,7 +96,9 @@ async def create_comment(
     :return: The created comment object.
     :raises HTTPException: If the image with the specified ID does not exist.
     """
-    image_db = await images_repo.get_image_by_id(image_id=body.image_id, db=db)
+    image_db = await images_repo.get_image_by_id(
+        user=user, image_id=body.image_id, db=db
+    )
 
     if not image_db:
         raise HTTPException(
@@ -106,7 +120,7 @@ async def create_comment(
 )
 async def remove_comment(
     comment_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -136,7 +150,7 @@ async def remove_comment(
 async def update_comment(
     comment_id: int,
     body: CommentUpdateModel,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
@@ -1,17 +1,30 @@
 from typing import List
 
-import cloudinary
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    UploadFile,
+    File,
+    Form,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.conf.config import settings
-from ..database.db import get_db
+from ..conf.config import settings
+from ..database.db import get_async_db, get_read_db
 from ..database.models import User, Image, Role
 from ..repository import images as repository_images
 from ..schemas import UpdateImageModel, ImageResponse
 from ..services.auth import auth_service
+from ..services.pagination import MAX_PAGE_SIZE, set_next_cursor
+from ..services.storage import UploadStream, storage
 
 from pyweb_team7_project.services.roles import RoleAccess
 from pyweb_team7_project.services.roles import free_access, admin_user
@@ -20,6 +33,91 @@ access_to_images = RoleAccess([Role.admin])
 
 router = APIRouter(prefix="/images", tags=["Images"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def images_as_ndjson(db: AsyncSession, cursor: str = None):
+    """
+    Serialize images one JSON document per line as they are read from the database.
+
+    :param db: The database session.
+    :type db: AsyncSession
+    :param cursor: The cursor of the previous page.
+    :type cursor: str, optional
+    :return: An async iterator of NDJSON lines.
+    :rtype: AsyncIterator[str]
+    """
+    async for image in repository_images.stream_images(db, cursor=cursor):
+        yield ImageResponse.model_validate(image).model_dump_json() + "\n"
+
+
+def parse_tags(tags: str) -> list:
+    """
+    Split the tags of an upload separated by commas.
+
+    :param tags: Tags separated by commas.
+    :type tags: str
+    :raises HTTPException: If the number of tags exceeds 5 or the length of a tag name exceeds 25 characters.
+    :return: The tag names.
+    :rtype: list
+    """
+    tag_list = []
+    if tags:
+        tag_list = tags.split(", ")
+        if len(tag_list) > 5:
+            raise HTTPException(
+                status_code=400, detail="You can't add more than 5 tags to a photo."
+            )
+        for tag in tag_list:
+            if len(tag) > 25:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Tag name should be no more than 25 characters long.",
+                )
+    return tag_list
+
+
+async def transform_image(
+    image_id: int, current_user: User, db: AsyncSession, effect: str
+):
+    """
+    Point the URL of an image of the current user to a transformed version of it.
+
+    :param image_id: The ID of the image.
+    :type image_id: int
+    :param current_user: The owner of the image.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param effect: The effect to apply, e.g. grayscale or blur:300.
+    :type effect: str
+    :raises HTTPException: If the image is not found or the storage can not transform images.
+    :return: The transformed image.
+    :rtype: Image
+    """
+    result = await db.execute(
+        select(Image).where(
+            and_(Image.id == image_id, Image.user_id == current_user.id)
+        )
+    )
+    image = result.scalars().first()
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+        )
+
+    image_url = storage.transform_url(image.public_id, effect)
+    if image_url is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transformations are not supported by the image storage",
+        )
+
+    image.file_url = image_url
+    await db.commit()
+    await db.refresh(image)
+    return image
+
 
 @router.post(
     "/",
@@ -32,7 +130,7 @@ async def create_image(
     tags: str = Form(default=""),
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new image.
@@ -46,24 +144,18 @@ async def create_image(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
-    :raises HTTPException: If the number of tags exceeds 5 or the length of a tag name exceeds 25 characters.
+    :type db: AsyncSession
+    :raises HTTPException: If the number of tags exceeds 5, the length of a tag name exceeds 25 characters
+        or the file is larger than UPLOAD_MAX_SIZE.
     :return: The created image.
     :rtype: ImageResponse
     """
-    tag_list = []
-    if tags:
-        tag_list = tags.split(", ")
-        if len(tag_list) > 5:
-            raise HTTPException(
-                status_code=400, detail="You can't add more than 5 tags to a photo."
-            )
-        for tag in tag_list:
-            if len(tag) > 25:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Tag name should be no more than 25 characters long.",
-                )
+    tag_list = parse_tags(tags)
+    if file.size is not None and file.size > settings.upload_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"The file is larger than {settings.upload_max_size} bytes",
+        )
     image = await repository_images.create_image_and_upload_to_cloudinary(
         db, file, description=description, user_id=current_user.id, tag_names=tag_list
     )
@@ -71,6 +163,60 @@ async def create_image(
     return image
 
 
+@router.post(
+    "/stream",
+    response_model=ImageResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(RateLimiter(times=2, seconds=5)), Depends(free_access)],
+)
+async def create_image_stream(
+    request: Request,
+    description: str,
+    tags: str = "",
+    filename: str = None,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create a new image from the raw request body.
+    Unlike the multipart upload the body is not spooled to a temporary file first,
+    it is hashed, size checked and sent on to the storage as it arrives.
+
+    :param request: The request, its body is the image file.
+    :type request: Request
+    :param description: The description of the image.
+    :type description: str
+    :param tags: Tags associated with the image separated by commas.
+    :type tags: str
+    :param filename: The name of the image file, used for its extension.
+    :type filename: str, optional
+    :param current_user: The current authenticated user.
+    :type current_user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :raises HTTPException: If the tags are invalid, the body is empty
+        or the file is larger than UPLOAD_MAX_SIZE.
+    :return: The created image.
+    :rtype: ImageResponse
+    """
+    tag_list = parse_tags(tags)
+    content_length = request.headers.get("content-length")
+    stream = UploadStream(
+        request.stream(),
+        settings.upload_max_size,
+        expected_size=int(content_length) if content_length else None,
+    )
+    result = await storage.upload_stream(stream, filename=filename)
+    return await repository_images.create_image_from_upload(
+        db,
+        result,
+        description=description,
+        user_id=current_user.id,
+        tag_names=tag_list,
+        content_hash=stream.hexdigest(),
+    )
+
+
 @router.get(
     "/{image_id}",
     response_model=ImageResponse,
@@ -79,7 +225,7 @@ async def create_image(
 async def get_image(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get an image by its ID.
@@ -89,7 +235,7 @@ async def get_image(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the image is not found.
     :return: The retrieved image.
     :rtype: ImageResponse
@@ -107,16 +253,38 @@ async def get_image(
     response_model=List[ImageResponse],
     dependencies=[Depends(RateLimiter(times=2, seconds=5)), Depends(free_access)],
 )
-async def get_all_images(db: Session = Depends(get_db)):
+async def get_all_images(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: AsyncSession = Depends(get_read_db),
+):
     """
-    Get all images.
-
+    Get a page of images ordered by ID.
+    When the page is full the X-Next-Cursor header holds the cursor of the next page.
+    With an "Accept: application/x-ndjson" header all images after the cursor are streamed instead,
+    one JSON document per line.
+
+    :param request: The request, used to pick the response format.
+    :type request: Request
+    :param response: The response used to return the next cursor.
+    :type response: Response
+    :param limit: The maximum number of images to retrieve, from 1 to MAX_PAGE_SIZE. Default is 50.
+    :type limit: int
+    :param cursor: The X-Next-Cursor value of the previous page.
+    :type cursor: str, optional
     :param db: The database session.
-    :type db: Session
-    :return: A list of all images.
+    :type db: AsyncSession
+    :return: A list of images.
     :rtype: List[ImageResponse]
     """
-    images = await repository_images.get_all_images(db)
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            images_as_ndjson(db, cursor=cursor), media_type=NDJSON_MEDIA_TYPE
+        )
+    images = await repository_images.get_all_images(db, limit=limit, cursor=cursor)
+    set_next_cursor(response, images, limit, key=lambda image: (image.id,))
     return images
 
 
@@ -127,7 +295,7 @@ async def update_image(
     body: UpdateImageModel,
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update the description of an image.
@@ -139,7 +307,7 @@ async def update_image(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the image is not found or the user does not have permission to update the image.
     :return: The updated image.
     :rtype: ImageResponse
@@ -166,7 +334,7 @@ async def update_image(
 async def delete_image(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete an image by its ID.
@@ -176,7 +344,7 @@ async def delete_image(
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :raises HTTPException: If the image is not found or the user does not have permission to delete the image.
     """
     image = await repository_images.get_image_by_id(
@@ -199,7 +367,7 @@ async def delete_image(
 async def transformations_grayscale(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Apply grayscale transformation to an image.
@@ -208,44 +376,19 @@ async def transformations_grayscale(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The transformed image.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == current_user.id))
-        .first()
-    )
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    # Застосовуємо трансформації та отримуємо новий URL
-    transformed_url = cloudinary.CloudinaryImage(image.public_id).image(
-        effect="grayscale"
-    )
-    # Отримання тільки посилання з рядка HTML
-    url_start = transformed_url.find('src="') + 5
-    url_end = transformed_url.find('"', url_start)
-    image_url = transformed_url[url_start:url_end]
-
-    image.file_url = image_url
-    db.commit()
-    db.refresh(image)
-    return image
+    return await transform_image(image_id, current_user, db, "grayscale")
 
 
 @router.patch("/transformations_auto_color/{image_id}")
 async def transformations_auto_color(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Apply auto color transformation to an image.
@@ -254,44 +397,19 @@ async def transformations_auto_color(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The transformed image.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == current_user.id))
-        .first()
-    )
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    # Застосовуємо трансформації та отримуємо новий URL
-    transformed_url = cloudinary.CloudinaryImage(image.public_id).image(
-        effect="auto_color"
-    )
-    # Отримання тільки посилання з рядка HTML
-    url_start = transformed_url.find('src="') + 5
-    url_end = transformed_url.find('"', url_start)
-    image_url = transformed_url[url_start:url_end]
-
-    image.file_url = image_url
-    db.commit()
-    db.refresh(image)
-    return image
+    return await transform_image(image_id, current_user, db, "auto_color")
 
 
 @router.patch("/transformations_sepia/{image_id}")
 async def transformations_sepia(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Apply sepia transformation to an image.
@@ -300,42 +418,19 @@ async def transformations_sepia(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The transformed image.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == current_user.id))
-        .first()
-    )
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    # Застосовуємо трансформації та отримуємо новий URL
-    transformed_url = cloudinary.CloudinaryImage(image.public_id).image(effect="sepia")
-    # Отримання тільки посилання з рядка HTML
-    url_start = transformed_url.find('src="') + 5
-    url_end = transformed_url.find('"', url_start)
-    image_url = transformed_url[url_start:url_end]
-
-    image.file_url = image_url
-    db.commit()
-    db.refresh(image)
-    return image
+    return await transform_image(image_id, current_user, db, "sepia")
 
 
 @router.patch("/transformations_blur/{image_id}")
 async def transformations_blur(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Apply blur effect to an image.
@@ -344,44 +439,19 @@ async def transformations_blur(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The transformed image.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == current_user.id))
-        .first()
-    )
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    # Застосовуємо трансформації та отримуємо новий URL
-    transformed_url = cloudinary.CloudinaryImage(image.public_id).image(
-        effect="blur:300"
-    )
-    # Отримання тільки посилання з рядка HTML
-    url_start = transformed_url.find('src="') + 5
-    url_end = transformed_url.find('"', url_start)
-    image_url = transformed_url[url_start:url_end]
-
-    image.fileurl = image_url
-    db.commit()
-    db.refresh(image)
-    return image
+    return await transform_image(image_id, current_user, db, "blur:300")
 
 
 @router.patch("/transformations_brown_outline/{image_id}")
 async def transformations_brown_outline(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Apply brown outline effect to an image.
@@ -390,44 +460,19 @@ async def transformations_brown_outline(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The transformed image.
     :rtype: Image
     """
-    image = (
-        db.query(Image)
-        .filter(and_(Image.id == image_id, Image.user_id == current_user.id))
-        .first()
-    )
-
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    # Застосовуємо трансформації та отримуємо новий URL
-    transformed_url = cloudinary.CloudinaryImage(image.public_id).image(
-        effect="co_brown,e_outline"
-    )
-    # Отримання тільки посилання з рядка HTML
-    url_start = transformed_url.find('src="') + 5
-    url_end = transformed_url.find('"', url_start)
-    image_url = transformed_url[url_start:url_end]
-
-    image.file_url = image_url
-    db.commit()
-    db.refresh(image)
-    return image
+    return await transform_image(image_id, current_user, db, "co_brown,e_outline")
 
 
 @router.post("/qr_code/")
 async def get_qr_code(
     image_id: int,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get the QR code for an image.
@@ -436,8 +481,8 @@ async def get_qr_code(
     :type image_id: int
     :param current_user: The current user. Dependency on auth_service.get_current_user.
     :type current_user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The QR code URL.
     :rtype: str
     """
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database.db import get_db
+from ..database.db import get_async_db
 from ..database.models import User
 from ..repository.images import update_image_qrcode_url, get_image_by_id
 from ..schemas import QRCodeResponse, QRCodeRequestTest, ImageResponse
@@ -40,7 +40,7 @@ async def create_qr_test(
 async def create_image_qrcode(
     image_id: int,
     user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a QR code for an image.
@@ -49,14 +49,14 @@ async def create_image_qrcode(
     :type image_id: int
     :param user: The current user. Dependency on auth_service.get_current_user.
     :type user: User, optional
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The updated ImageResponse with the QR code URL.
     :rtype: ImageResponse
     :raises HTTPException 404: If the image with the specified ID does not exist.
     """
 
-    image_db = await get_image_by_id(image_id=image_id, db=db)
+    image_db = await get_image_by_id(user=user, image_id=image_id, db=db)
 
     if not image_db:
         raise HTTPException(
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import stat
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from pyweb_team7_project.services.storage import LocalStorage, storage
+
+router = APIRouter(prefix="/storage", tags=["Storage"])
+
+
+@router.get("/{public_id:path}", response_class=FileResponse)
+async def read_file(public_id: str):
+    """
+    Serve a file of the local storage backend. The file is streamed in chunks, never read into memory.
+    Names are hashes of the content, so clients may cache a file forever.
+
+    :param public_id: The name the file is stored under.
+    :type public_id: str
+    :raises HTTPException: If the storage is not local or there is no such file.
+    :return: The file.
+    :rtype: FileResponse
+    """
+    path = storage.path(public_id) if isinstance(storage, LocalStorage) else None
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path) if path else None
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return FileResponse(
+        path,
+        stat_result=stat_result,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
@@ -1,42 +1,55 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db, get_read_db
 from pyweb_team7_project.schemas import TagModel, TagResponse
 from pyweb_team7_project.repository import tags as repository_tags
+from pyweb_team7_project.services.pagination import MAX_PAGE_SIZE, set_next_cursor
 
 router = APIRouter(prefix="/tags", tags=["Tags"])
 
 
 @router.get("/", response_model=List[TagResponse])
-async def read_tags(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+async def read_tags(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
+):
     """
-    Get a list of tags.
+    Get a list of tags ordered by ID.
+    When the page is full the X-Next-Cursor header holds the cursor of the next page.
 
-    :param skip: The number of tags to skip (for pagination). Default is 0.
+    :param response: The response used to return the next cursor.
+    :type response: Response
+    :param skip: The number of tags to skip (for pagination). Default is 0. Ignored when a cursor is given.
     :type skip: int
-    :param limit: The maximum number of tags to retrieve. Default is 50.
+    :param limit: The maximum number of tags to retrieve, from 1 to MAX_PAGE_SIZE. Default is 50.
     :type limit: int
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param cursor: The X-Next-Cursor value of the previous page.
+    :type cursor: str, optional
+    :param db: The database session. Dependency on get_read_db.
+    :type db: AsyncSession, optional
     :return: A list of TagResponse objects representing the tags.
     :rtype: List[TagResponse]
     """
-    tags = await repository_tags.get_tags(skip, limit, db)
+    tags = await repository_tags.get_tags(skip, limit, db, cursor=cursor)
+    set_next_cursor(response, tags, limit, key=lambda tag: (tag["id"],))
     return tags
 
 
 @router.get("/{tag_id}", response_model=TagResponse)
-async def read_tag(tag_id: int, db: Session = Depends(get_db)):
+async def read_tag(tag_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get a specific tag by ID.
 
     :param tag_id: The ID of the tag.
     :type tag_id: int
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The TagResponse object representing the tag.
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
@@ -50,14 +63,14 @@ async def read_tag(tag_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=TagResponse)
-async def create_tag(body: TagModel, db: Session = Depends(get_db)):
+async def create_tag(body: TagModel, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new tag.
 
     :param body: The request body containing the tag data.
     :type body: TagModel
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The created TagResponse object representing the new tag.
     :rtype: TagResponse
     """
@@ -65,7 +78,9 @@ async def create_tag(body: TagModel, db: Session = Depends(get_db)):
 
 
 @router.put("/{tag_id}", response_model=TagResponse)
-async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db)):
+async def update_tag(
+    tag_id: int, body: TagModel, db: AsyncSession = Depends(get_async_db)
+):
     """
     Update an existing tag.
 
@@ -73,8 +88,8 @@ async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db))
     :type tag_id: int
     :param body: The request body containing the updated tag data.
     :type body: TagModel
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The updated TagResponse object representing the updated tag.
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
@@ -88,14 +103,14 @@ async def update_tag(tag_id: int, body: TagModel, db: Session = Depends(get_db))
 
 
 @router.delete("/{tag_id}", response_model=TagResponse)
-async def remove_tag(tag_id: int, db: Session = Depends(get_db)):
+async def remove_tag(tag_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Remove a tag.
 
     :param tag_id: The ID of the tag to remove.
     :type tag_id: int
-    :param db: The database session. Dependency on get_db.
-    :type db: Session, optional
+    :param db: The database session. Dependency on get_async_db.
+    :type db: AsyncSession, optional
     :return: The removed TagResponse object representing the removed tag.
     :rtype: TagResponse
     :raises HTTPException 404: If the tag with the specified ID does not exist.
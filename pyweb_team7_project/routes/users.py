@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db, get_read_db
 from pyweb_team7_project.services.auth import auth_service
 from pyweb_team7_project.database.models import User, Role
 from pyweb_team7_project.schemas import UserDb
 from pyweb_team7_project.services.roles import free_access, admin
+from pyweb_team7_project.services.pagination import MAX_PAGE_SIZE, set_next_cursor
 from pyweb_team7_project.repository import users
 from pydantic import EmailStr
 
@@ -14,29 +15,37 @@ router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.get("/get_all", response_model=list[UserDb], dependencies=[Depends(free_access)])
 async def get_all_users(
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
     user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     **Get a list of users.**
     This route allows to get a list of pagination-aware users.
+    When the page is full the X-Next-Cursor header holds the cursor of the next page.
     Level of Access:
     - Current authorized user
-    :param skip: int: Number of users to skip.
-    :param limit: int: Maximum number of users to return.
+    :param response: Response: Used to return the next cursor.
+    :param skip: int: Number of users to skip, ignored when a cursor is given.
+    :param limit: int: Maximum number of users to return, from 1 to MAX_PAGE_SIZE.
+    :param cursor: str: The X-Next-Cursor value of the previous page.
     :param current_user: User: Current authenticated user.
-    :param db: Session: Database session.
+    :param db: AsyncSession: Database session.
     :return: List of users.
     :rtype: List[UserDb]
     """
-    list_users = await users.get_users(skip, limit, db)
+    list_users = await users.get_users(skip, limit, db, cursor=cursor)
+    set_next_cursor(response, list_users, limit, key=lambda u: (u.id,))
     return list_users
 
 
 @router.patch("/asign_role/{role}", dependencies=[Depends(admin)])
-async def assign_role(email: EmailStr, role: Role, db: Session = Depends(get_db)):
+async def assign_role(
+    email: EmailStr, role: Role, db: AsyncSession = Depends(get_async_db)
+):
     """
     **Assign a role to a user by email.**
 
@@ -50,7 +59,7 @@ async def assign_role(email: EmailStr, role: Role, db: Session = Depends(get_db)
 
     :param role: Role: The selected role for the assignment (Administrator, Moderator or User).
 
-    :param db: Session: Database Session.
+    :param db: AsyncSession: Database Session.
 
     :return: Message about successful role change.
 
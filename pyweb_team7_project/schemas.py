@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 from pyweb_team7_project.database.models import Role
 
 
@@ -17,6 +17,7 @@ class UserDb(BaseModel):
     email: str
     avatar: str
     role: Role
+    images_count: int = 0
 
     class Config:
         # orm_mode = True
@@ -82,8 +83,14 @@ class ImageResponse(BaseModel):
     file_url: str
     description: str
     user_id: int
-
-    # tags: List[str]
+    tags: List[str] = []
+    qr_code_url: str | None = None
+    comments_count: int = 0
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, tags):
+        return [getattr(tag, "name", tag) for tag in tags]
 
     class Config:
         # orm_mode = True
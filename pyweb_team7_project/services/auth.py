@@ -1,19 +1,73 @@
+import asyncio
+import hashlib
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from jose import JWTError, jwt
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import timedelta, datetime
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db
+from pyweb_team7_project.database.models import Role, User
 from pyweb_team7_project.repository import users as repository_users
 from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.services.cache import token_cache, token_versions
+from pyweb_team7_project.services.slots import Slots
+
+# bcrypt releases the GIL, so a few threads keep the event loop free during logins
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.bcrypt_max_workers, thread_name_prefix="bcrypt"
+)
+# caps the password checks in flight, so a burst of logins can not take every core
+password_slots = Slots(settings.bcrypt_max_concurrency)
+
+
+async def run_bcrypt(func, *args):
+    """
+    The run_bcrypt function runs a password hashing function in the password thread pool
+    once one of the password slots is free.
+
+    :param func: Callable: The CryptContext method to call
+    :param args: Any: Its arguments
+    :return: The result of the function
+    :raises HTTPException: 503 if no slot got free within BCRYPT_WAIT_TIMEOUT seconds
+    """
+    if not await password_slots.acquire(settings.bcrypt_wait_timeout):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        password_slots.release()
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.bcrypt_rounds,
+        # hashes of any other cost are reported by verify_and_update as needing a rehash
+        bcrypt__min_rounds=settings.bcrypt_rounds,
+        bcrypt__max_rounds=settings.bcrypt_rounds,
+    )
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -42,6 +96,34 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def hash_password(self, password: str) -> str:
+        """
+        The hash_password function hashes a password like get_password_hash,
+            but in the password thread pool so the event loop keeps serving other requests.
+
+        :param self: Represent the instance of the class
+        :param password: str: Pass the password into the function
+        :return: A hash of the password
+        """
+        return await run_bcrypt(self.pwd_context.hash, password)
+
+    async def verify_and_update_password(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        The verify_and_update_password function checks a password in the password thread pool.
+            When the stored hash was made with another bcrypt cost than BCRYPT_ROUNDS,
+            it also returns a new hash of the password to store instead.
+
+        :param self: Represent the instance of the class
+        :param plain_password: str: Pass the password that is entered by the user
+        :param hashed_password: str: The stored hash
+        :return: Whether the password is correct and the new hash or None
+        """
+        return await run_bcrypt(
+            self.pwd_context.verify_and_update, plain_password, hashed_password
+        )
+
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
     ):
@@ -87,8 +169,14 @@ class Auth:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
             expire = datetime.utcnow() + timedelta(days=7)
+        # jti keeps tokens issued within the same second apart, they are stored by their hash
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "refresh_token",
+                "jti": secrets.token_urlsafe(16),
+            }
         )
         encoded_refresh_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
@@ -107,9 +195,7 @@ class Auth:
         :return: The email of the user who requested it
         """
         try:
-            payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
-            )
+            payload = self.decode_token(refresh_token)
             if payload["scope"] == "refresh_token":
                 email = payload["sub"]
                 return email
@@ -123,37 +209,138 @@ class Auth:
                 detail="Could not validate credentials",
             )
 
+    def decode_token(self, token: str) -> dict:
+        """
+        The decode_token function verifies the signature and expiry of a token and returns its claims.
+        Verified claims are cached by the SHA-256 digest of the token until the token expires,
+        so a token reused by a client is verified only once.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded token
+        :return: The claims of the token, callers must not modify them
+        :raises JWTError: If the token is invalid or expired
+        """
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = token_cache.get(digest)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            if "exp" in payload:
+                token_cache.set(digest, payload, ttl=payload["exp"] - time.time())
+        return payload
+
+    def token_expires_at(self, token: str) -> datetime:
+        """
+        The token_expires_at function returns when a token issued by this service expires.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded token
+        :return: The expiry time in UTC
+        """
+        return datetime.utcfromtimestamp(self.decode_token(token)["exp"])
+
+    def decode_access_token(self, token: str) -> dict:
+        """
+        The decode_access_token function verifies an access token and returns its claims.
+
+        :param self: Represent the instance of the class
+        :param token: str: The access token
+        :return: The claims of the token
+        :raises HTTPException: If the token is invalid, expired or not an access token
+        """
+        try:
+            payload = self.decode_token(token)
+        except JWTError:
+            raise credentials_exception()
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            raise credentials_exception()
+        return payload
+
+    async def create_user_access_token(
+        self, user: User, expires_delta: Optional[float] = None
+    ):
+        """
+        The create_user_access_token function creates an access token for the user.
+        In the stateless mode the token also carries the uid, role and ver claims RoleAccess
+        authorizes from, and it lives no longer than AUTH_STATELESS_TOKEN_TTL seconds.
+
+        :param self: Represent the instance of the class
+        :param user: User: The user the token is issued to
+        :param expires_delta: Optional[float]: Set the time limit for the token
+        :return: A string
+        """
+        data = {"sub": user.email}
+        if settings.auth_stateless:
+            data.update(
+                {
+                    "uid": user.id,
+                    "role": user.role.value,
+                    "ver": await token_versions.get(user.id),
+                }
+            )
+            ttl = settings.auth_stateless_token_ttl
+            expires_delta = min(expires_delta, ttl) if expires_delta else ttl
+        return await self.create_access_token(data=data, expires_delta=expires_delta)
+
+    async def get_current_role(
+        self,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db),
+        request: Request = None,
+    ) -> Role:
+        """
+        The get_current_role function is the dependency RoleAccess authorizes with.
+        In the stateless mode the role comes from the verified claims of the token without any query,
+        a token whose ver claim is behind the version held in Redis is rejected.
+        Otherwise, or when the token has no role claim or Redis is unavailable, the role of get_current_user is used.
+
+        :param self: Represent the instance of the class
+        :param token: str: Get the token from the request header
+        :param db: AsyncSession: Get the database session
+        :param request: Request: The current request, used to memoize the user
+        :return: The role of the user
+        """
+        if settings.auth_stateless:
+            payload = self.decode_access_token(token)
+            if "role" in payload:
+                try:
+                    version = await token_versions.get(payload["uid"])
+                except RedisError:
+                    version = None
+                if version is not None:
+                    if payload.get("ver") != version:
+                        raise credentials_exception()
+                    return Role(payload["role"])
+        user = await self.get_current_user(token, db, request)
+        return user.role
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+        self,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db),
+        request: Request = None,
     ):
         """
         The get_current_user function is a dependency that will be used in the protected routes.
         It takes an access token as input and returns the user object if it's valid, otherwise raises an exception.
+        The user is kept on request.state, so RoleAccess and the route handler share one token decode and lookup.
 
         :param self: Represent the instance of the class
         :param token: str: Get the token from the request header
-        :param db: Session: Get the database session
+        :param db: AsyncSession: Get the database session
+        :param request: Request: The current request, used to memoize the user
         :return: An object of type user
         """
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload["scope"] == "access_token":
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError as e:
-            raise credentials_exception
+        if request is not None:
+            user = getattr(request.state, "current_user", None)
+            if user is not None:
+                return user
 
-        user = await repository_users.get_user_by_email(email, db)
+        payload = self.decode_access_token(token)
+        user = await repository_users.get_cached_user_by_email(payload["sub"], db)
         if user is None:
-            raise credentials_exception
+            raise credentials_exception()
+        if request is not None:
+            request.state.current_user = user
         return user
 
     def create_email_token(self, data: dict):
@@ -176,7 +363,7 @@ class Auth:
     async def get_email_from_token(self, token: str):
         """
         The get_email_from_token function takes a token as an argument and returns the email address associated with that token.
-        The function first decodes the token using jwt.decode, which is part of PyJWT, a Python library for encoding and decoding JSON Web Tokens (JWTs).
+        The function first decodes the token using decode_token, which verifies it with python-jose and caches the result.
         If successful, it will return the email address associated with that JWT.
 
         :param self: Represent the instance of the class
@@ -184,7 +371,7 @@ class Auth:
         :return: The email address from the token
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
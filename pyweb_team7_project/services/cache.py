@@ -0,0 +1,286 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from pyweb_team7_project.conf.config import settings
+
+USER_INVALIDATION_CHANNEL = "users:invalidate"
+
+
+class TTLCache:
+    """
+    A bounded in-process LRU cache whose entries expire after a fixed time to live.
+    It is meant for the event loop thread only and does no locking.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        :param maxsize: int: The number of entries kept, the least recently used one is evicted first
+        :param ttl: float: Seconds an entry stays valid after it was stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        The get function returns the value stored under the key and marks it as recently used.
+
+        :param key: Hashable: The key of the entry
+        :param default: Any: Returned when the key is missing or expired
+        :return: The cached value or the default
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        The set function stores a value, evicting the least recently used entry when the cache is full.
+
+        :param key: Hashable: The key of the entry
+        :param value: Any: The value to store
+        :param ttl: float | None: A shorter time to live for this entry, capped by the cache ttl
+        :return: None
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        The invalidate function drops the entry stored under the key, if any.
+
+        :param key: Hashable: The key of the entry
+        :return: None
+        """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        The clear function drops all entries, the hit and miss counters are kept.
+
+        :return: None
+        """
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        The stats function reports the size of the cache and how often it was hit or missed.
+
+        :return: A dict with the cache counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SharedCache:
+    """
+    A cache tier in Redis shared by all workers, holding JSON records under a key prefix.
+    It stays disabled until a Redis connection is given to connect, and Redis errors
+    are treated as misses so the callers fall back to the database.
+    """
+
+    def __init__(self, prefix: str, ttl: int, channel: str):
+        """
+        :param prefix: str: Prepended to every key stored in Redis
+        :param ttl: int: Seconds a record is kept in Redis
+        :param channel: str: The pub/sub channel invalidated keys are announced on
+        """
+        self.prefix = prefix
+        self.ttl = ttl
+        self.channel = channel
+        self.redis: Redis | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def connect(self, redis: Redis | None) -> None:
+        """
+        The connect function enables the cache on the given connection, None disables it.
+
+        :param redis: Redis | None: A connection created with decode_responses=True
+        :return: None
+        """
+        self.redis = redis
+
+    async def get(self, key: str) -> dict | None:
+        """
+        The get function returns the record stored under the key.
+
+        :param key: str: The key of the record
+        :return: The record or None when it is missing or the cache is disabled
+        """
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self.prefix + key)
+        except RedisError:
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, record: dict) -> None:
+        """
+        The set function stores a record for the configured time to live.
+
+        :param key: str: The key of the record
+        :param record: dict: A JSON serializable record
+        :return: None
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                self.prefix + key,
+                json.dumps(record, separators=(",", ":")),
+                ex=self.ttl,
+            )
+        except RedisError:
+            pass
+
+    async def invalidate(self, key: str) -> None:
+        """
+        The invalidate function deletes the record and announces the key on the channel,
+        so every worker drops it from its in-process cache.
+
+        :param key: str: The key of the record
+        :return: None
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self.prefix + key)
+            await self.redis.publish(self.channel, key)
+        except RedisError:
+            pass
+
+    async def listen(self, local: TTLCache) -> None:
+        """
+        The listen function drops the keys announced on the channel from the in-process cache.
+        It runs until it is cancelled, main.startup starts it as a background task.
+
+        :param local: TTLCache: The in-process cache of this worker
+        :return: None
+        """
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local.invalidate(message["data"])
+        finally:
+            await pubsub.unsubscribe(self.channel)
+            await pubsub.close()
+
+    def stats(self) -> dict:
+        """
+        The stats function reports how often the cache was hit or missed.
+
+        :return: A dict with the cache counters
+        """
+        return {
+            "enabled": self.redis is not None,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class TokenVersions:
+    """
+    The access token versions of the users, kept in one Redis hash.
+    Stateless access tokens carry the version of their user in the ver claim,
+    bumping it revokes every token issued before, e.g. after a role change.
+    """
+
+    def __init__(self, key: str):
+        """
+        :param key: str: The Redis key of the hash
+        """
+        self.key = key
+        self.redis: Redis | None = None
+
+    def connect(self, redis: Redis | None) -> None:
+        """
+        The connect function enables revocation on the given connection, None disables it.
+
+        :param redis: Redis | None: A connection created with decode_responses=True
+        :return: None
+        """
+        self.redis = redis
+
+    async def get(self, user_id: int) -> int:
+        """
+        The get function returns the current token version of a user, 0 when it was never bumped
+        or revocation is disabled.
+
+        :param user_id: int: The id of the user
+        :return: The token version
+        :raises RedisError: If Redis can not be reached
+        """
+        if self.redis is None:
+            return 0
+        return int(await self.redis.hget(self.key, str(user_id)) or 0)
+
+    async def bump(self, user_id: int) -> None:
+        """
+        The bump function revokes the access tokens issued to a user so far.
+
+        :param user_id: int: The id of the user
+        :return: None
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.hincrby(self.key, str(user_id), 1)
+        except RedisError:
+            pass
+
+
+# Verified JWT payloads by token digest, see services.auth.Auth.decode_token
+token_cache = TTLCache(settings.token_cache_maxsize, settings.token_cache_ttl)
+# Authenticated users by email, see repository.users.get_cached_user_by_email
+user_cache = TTLCache(settings.user_cache_maxsize, settings.user_cache_ttl)
+shared_user_cache = SharedCache(
+    "user:", settings.user_cache_shared_ttl, USER_INVALIDATION_CHANNEL
+)
+
+token_versions = TokenVersions("auth:token_versions")
+
+
+async def invalidate_user(email: str) -> None:
+    """
+    The invalidate_user function drops a user from the in-process cache of this worker
+    and, when the shared cache is enabled, from Redis and the caches of the other workers.
+
+    :param email: str: The email of the user
+    :return: None
+    """
+    user_cache.invalidate(email)
+    await shared_user_cache.invalidate(email)
@@ -1,20 +1,212 @@
+import asyncio
 import string
+from concurrent.futures import Future, ThreadPoolExecutor
 from random import choice
+from typing import AsyncIterator
 
 import cloudinary
+import cloudinary.exceptions
 import cloudinary.uploader
+import cloudinary.utils
+from cloudinary.api_client import call_api
+from fastapi import HTTPException, status
+from urllib3 import PoolManager
+from urllib3.exceptions import MaxRetryError, TimeoutError as HTTPTimeoutError
 
 from pyweb_team7_project.conf.config import settings as config
+from pyweb_team7_project.services.slots import Slots
 
+# the Cloudinary SDK is blocking, uploads run in their own threads so the event loop keeps serving requests
+upload_executor = ThreadPoolExecutor(
+    max_workers=config.cloudinary_max_uploads, thread_name_prefix="cloudinary"
+)
+# caps the uploads in flight, a slot is held until the upload thread is done, even after a timeout
+upload_slots = Slots(config.cloudinary_max_uploads)
+# keep-alive connections shared by the upload threads, set up by configure_cloudinary
+http_pool: PoolManager | None = None
 
-class UploadService:
-    cloudinary.config(
-        cloud_name=config.cloudinary_name,
-        api_key=config.cloudinary_api_key,
-        api_secret=config.cloudinary_api_secret,
-        secure=True,
+
+def configure_cloudinary() -> PoolManager:
+    """
+    The configure_cloudinary function sets up the Cloudinary SDK once per process:
+    the account from the CLOUDINARY_* settings and one pool of keep-alive connections
+    for the uploads and the admin API. The pool the SDK builds on import keeps a single
+    connection, the other upload threads open a new TLS connection for every call.
+
+    :return: The connection pool
+    """
+    global http_pool
+    if http_pool is None:
+        cloudinary.config(
+            cloud_name=config.cloudinary_name,
+            api_key=config.cloudinary_api_key,
+            api_secret=config.cloudinary_api_secret,
+            secure=True,
+        )
+        http_pool = cloudinary.utils.get_http_connector(
+            cloudinary.config(),
+            dict(cloudinary.CERT_KWARGS, maxsize=config.cloudinary_pool_size),
+        )
+        # the SDK has no setting for its pool, its requests go through these module globals,
+        # the version is pinned in pyproject.toml and test_cloudinary_upload checks they are read
+        cloudinary.uploader._http = http_pool
+        call_api._http = http_pool
+    return http_pool
+
+
+def close_cloudinary() -> None:
+    """
+    The close_cloudinary function closes the pooled connections, the pool reconnects if it is used again.
+
+    :return: None
+    """
+    if http_pool is not None:
+        http_pool.clear()
+
+
+async def acquire_upload_slot() -> None:
+    """
+    The acquire_upload_slot function waits for one of the upload slots.
+
+    :return: None
+    :raises HTTPException: 503 if no slot got free within CLOUDINARY_WAIT_TIMEOUT seconds
+    """
+    if not await upload_slots.acquire(config.cloudinary_wait_timeout):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many uploads in progress, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def release_upload_slot(future: Future | None = None) -> None:
+    """
+    The release_upload_slot function frees an upload slot, once the upload thread is done if one is still running.
+
+    :param future: Future | None: The last call submitted to the upload thread pool
+    :return: None
+    """
+    if future is None or future.done():
+        upload_slots.release()
+        return
+    loop = asyncio.get_running_loop()
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(upload_slots.release))
+
+
+async def wait_upload(future: Future):
+    """
+    The wait_upload function waits up to CLOUDINARY_UPLOAD_TIMEOUT seconds for a call in the upload thread pool.
+
+    :param future: Future: The submitted call
+    :return: Its result
+    :raises HTTPException: 504 if the call took longer
+    """
+    timed_out = HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Image storage did not respond in time",
     )
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future), config.cloudinary_upload_timeout
+        )
+    except asyncio.TimeoutError:
+        raise timed_out
+    except cloudinary.exceptions.Error as e:
+        # the socket timeout of the upload thread is the same, it may run out first
+        cause = e.__context__
+        if isinstance(cause, MaxRetryError):
+            cause = cause.reason
+        if isinstance(cause, HTTPTimeoutError):
+            raise timed_out
+        raise
 
+
+async def upload_async(file, **options) -> dict:
+    """
+    The upload_async function runs cloudinary.uploader.upload in the upload thread pool
+    once one of the upload slots is free, and gives up after CLOUDINARY_UPLOAD_TIMEOUT seconds.
+
+    :param file: The file, path or URL to upload
+    :param options: Any: Options of cloudinary.uploader.upload, e.g. public_id
+    :return: A dictionary with the upload result
+    :raises HTTPException: 503 if no slot got free within CLOUDINARY_WAIT_TIMEOUT seconds,
+        504 if the upload took longer than CLOUDINARY_UPLOAD_TIMEOUT seconds
+    """
+    await acquire_upload_slot()
+    options.setdefault("timeout", config.cloudinary_upload_timeout)
+    future = None
+    try:
+        future = upload_executor.submit(cloudinary.uploader.upload, file, **options)
+        return await wait_upload(future)
+    finally:
+        release_upload_slot(future)
+
+
+async def upload_large_async(
+    parts: AsyncIterator[bytes],
+    total_size: int | None = None,
+    filename: str = "stream",
+    **options,
+) -> dict:
+    """
+    The upload_large_async function sends parts to the chunked upload API of Cloudinary as they are read,
+    like cloudinary.uploader.upload_large does for a file, so only the parts in flight are held in memory.
+    Every part has CLOUDINARY_UPLOAD_TIMEOUT seconds, the whole upload holds one upload slot.
+
+    :param parts: AsyncIterator[bytes]: The parts of the file, Cloudinary needs at least 5 MB per part but the last
+    :param total_size: int | None: The size of the file if it is known up front, otherwise the last part carries it
+    :param filename: str: The name of the file
+    :param options: Any: Options of cloudinary.uploader.upload, e.g. public_id
+    :return: A dictionary with the upload result
+    :raises HTTPException: 503 if no slot got free within CLOUDINARY_WAIT_TIMEOUT seconds,
+        504 if a part took longer than CLOUDINARY_UPLOAD_TIMEOUT seconds
+    """
+    await acquire_upload_slot()
+    options.setdefault("timeout", config.cloudinary_upload_timeout)
+    options.setdefault("resource_type", "image")
+    upload_id = cloudinary.utils.random_public_id()
+    offset = 0
+    future = None
+
+    async def send(part: bytes, total: int) -> dict:
+        nonlocal future, offset
+        headers = {
+            "Content-Range": f"bytes {offset}-{offset + len(part) - 1}/{total}",
+            "X-Unique-Upload-Id": upload_id,
+        }
+        future = upload_executor.submit(
+            cloudinary.uploader.upload_large_part,
+            (filename, part),
+            http_headers=headers,
+            **options,
+        )
+        result = await wait_upload(future)
+        options["public_id"] = result.get("public_id")
+        offset += len(part)
+        return result
+
+    try:
+        result = pending = None
+        async for part in parts:
+            if total_size is not None:
+                result = await send(part, total_size)
+                continue
+            # without the size up front a part is only sent once the next one shows it is not the last
+            if pending is not None:
+                await send(pending, -1)
+            pending = part
+        if pending is not None:
+            result = await send(pending, offset + len(pending))
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload"
+            )
+        return result
+    finally:
+        release_upload_slot(future)
+
+
+class UploadService:
     @staticmethod
     def generate_random_name(length=10):
         """
@@ -27,20 +219,3 @@ class UploadService:
         """
         random_suffix = "".join(choice(string.ascii_letters) for _ in range(length))
         return random_suffix
-
-    @staticmethod
-    def upload(file, public_id=None):
-        """
-        The upload function takes a file and an optional public_id.
-        If the public_id is provided, it will overwrite any existing image with that id.
-        Otherwise, it will upload the image to Cloudinary and return a dictionary containing information about the uploaded file.
-
-        :param file: Specify the file to upload
-        :param public_id: Set the public id of the image
-        :return: A dictionary
-        """
-        if public_id:
-            r = cloudinary.uploader.upload(file, public_id=public_id, overwrite=True)
-        else:
-            r = cloudinary.uploader.upload(file)
-        return r
@@ -1,10 +1,16 @@
+import asyncio
+import logging
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from fastapi_mail import MessageSchema, ConnectionConfig, MessageType
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.repository import email_outbox as repository_outbox
 from pyweb_team7_project.services.auth import auth_service
 
 conf = ConnectionConfig(
@@ -21,34 +27,269 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates",
 )
 
+logger = logging.getLogger(__name__)
 
-async def send_email(email: EmailStr, username: str, host: str):
+
+class MailSender:
+    """
+    Long-lived sender that keeps up to pool_size authenticated SMTP connections open.
+    Messages are queued and each worker sends the messages waiting in the queue,
+    up to batch_size of them, over its own connection instead of opening a TLS session per message.
+    A connection the server dropped is reopened and the message is retried once.
+    """
+
+    def __init__(
+        self,
+        config: ConnectionConfig,
+        pool_size: int = 2,
+        batch_size: int = 20,
+        queue_size: int = 1000,
+    ):
+        """
+        :param config: ConnectionConfig: The SMTP server and credentials
+        :param pool_size: int: Number of connections, one worker sends over each
+        :param batch_size: int: Messages a worker takes from the queue at once
+        :param queue_size: int: Messages waiting to be sent before send_message blocks
+        """
+        self.config = config
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.queue: asyncio.Queue | None = None
+        self.workers: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self) -> None:
+        """
+        The start function starts the workers, connections are opened with the first message.
+
+        :return: None
+        """
+        if self.running:
+            return
+        self.queue = asyncio.Queue(self.queue_size)
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.pool_size)
+        ]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        The stop function waits up to timeout seconds for the queued messages to be sent,
+        then stops the workers and closes their connections.
+
+        :param timeout: float: Seconds to wait for the queue to drain
+        :return: None
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def render(
+        self, message: MessageSchema, template_name: str | None = None
+    ) -> EmailMessage:
+        """
+        The render function builds the MIME message of a MessageSchema, with the same headers FastMail sends.
+        The body is the template rendered with message.template_body, or message.body without a template.
+
+        :param message: MessageSchema: The message to build
+        :param template_name: str | None: The template rendered with message.template_body
+        :return: The MIME message
+        """
+        body = message.body or ""
+        if self.config.TEMPLATE_FOLDER and template_name:
+            template = self.config.template_engine().get_template(template_name)
+            body = template.render(**message.template_body)
+        sender = self.config.MAIL_FROM
+        if self.config.MAIL_FROM_NAME is not None:
+            sender = f"{self.config.MAIL_FROM_NAME} <{self.config.MAIL_FROM}>"
+
+        mime = EmailMessage()
+        mime["Date"] = formatdate(localtime=True)
+        mime["Message-ID"] = make_msgid()
+        mime["From"] = sender
+        mime["To"] = ", ".join(message.recipients)
+        if message.subject:
+            mime["Subject"] = message.subject
+        for header, addresses in (
+            ("Cc", message.cc),
+            ("Bcc", message.bcc),
+            ("Reply-To", message.reply_to),
+        ):
+            if addresses:
+                mime[header] = ", ".join(addresses)
+        for header, value in (message.headers or {}).items():
+            mime[header] = value
+
+        mime.set_content(body, subtype=message.subtype.value, charset=message.charset)
+        if message.alternative_body is not None:
+            other = "plain" if message.subtype == MessageType.html else "html"
+            mime.add_alternative(
+                message.alternative_body, subtype=other, charset=message.charset
+            )
+        for file, file_meta in message.attachments:
+            file_meta = file_meta or {}
+            mime.add_attachment(
+                await file.read(),
+                maintype=file_meta.get("mime_type", "application"),
+                subtype=file_meta.get("mime_subtype", "octet-stream"),
+                filename=file.filename,
+            )
+            await file.close()
+        return mime
+
+    async def send_message(
+        self, message: MessageSchema, template_name: str | None = None
+    ) -> None:
+        """
+        The send_message function renders the message and queues it for the workers.
+        It returns once the message is queued, not once it is delivered.
+
+        :param message: MessageSchema: The message to send
+        :param template_name: str | None: The template rendered with message.template_body
+        :return: None
+        """
+        await self.queue.put((await self.render(message, template_name), None))
+
+    async def deliver(
+        self, message: MessageSchema, template_name: str | None = None
+    ) -> None:
+        """
+        The deliver function queues the message like send_message and waits until the server accepted it.
+
+        :param message: MessageSchema: The message to send
+        :param template_name: str | None: The template rendered with message.template_body
+        :return: None
+        :raises Exception: The error of the last attempt if the message was not sent
+        """
+        delivered = asyncio.get_running_loop().create_future()
+        await self.queue.put((await self.render(message, template_name), delivered))
+        await delivered
+
+    def stats(self) -> dict:
+        """
+        The stats function reports the queue length and the delivery counters.
+
+        :return: A dict with the counters
+        """
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "connections": self.connections,
+        }
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        self.connections += 1
+        return smtp
+
+    async def _send(
+        self,
+        smtp: aiosmtplib.SMTP | None,
+        message: EmailMessage,
+        delivered: asyncio.Future | None,
+    ) -> aiosmtplib.SMTP | None:
+        error = None
+        for _ in range(2):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                if not self.config.SUPPRESS_SEND:
+                    await smtp.send_message(message)
+                self.sent += 1
+                if delivered is not None and not delivered.done():
+                    delivered.set_result(None)
+                return smtp
+            except (aiosmtplib.SMTPException, OSError) as err:
+                error = err
+                if smtp is not None:
+                    smtp.close()
+                smtp = None
+            except Exception as err:
+                # not a connection problem, sending it again would fail the same way
+                error = err
+                if smtp is not None:
+                    smtp.close()
+                smtp = None
+                break
+        self.failed += 1
+        if delivered is None:
+            logger.error(
+                "Email to %s not sent: %s",
+                message["To"],
+                error,
+                exc_info=not isinstance(error, (aiosmtplib.SMTPException, OSError)),
+            )
+        elif not delivered.done():
+            delivered.set_exception(error)
+        return smtp
+
+    async def _worker(self) -> None:
+        smtp = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                try:
+                    for message, delivered in batch:
+                        smtp = await self._send(smtp, message, delivered)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            if smtp is not None and smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except Exception:
+                    smtp.close()
+
+
+mail_sender = MailSender(
+    conf, pool_size=settings.mail_pool_size, batch_size=settings.mail_batch_size
+)
+
+
+async def queue_email(email: EmailStr, username: str, host: str, db: AsyncSession):
     """
-    The send_email function sends an email to the user with a link to confirm their email address.
-        Args:
-            email (str): The user's email address.
-            username (str): The username of the user who is registering for an account.  This will be used in the message body of the confirmation message sent to them via FastMail.
-            host (str): The hostname that will be used in constructing a URL for confirming their account registration.
+    The queue_email function adds the confirmation email of a user to the email outbox.
+    It is committed with the next commit of the session, the email worker process then sends it and retries failures,
+    so the route returns without waiting for SMTP.
 
-    :param email: EmailStr: Validate the email address
+    :param email: EmailStr: The user's email address
     :param username: str: Pass the username to the template
     :param host: str: Pass the hostname of the server to the template
-    :return: A coroutine object
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_templates.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = auth_service.create_email_token({"sub": email})
+    await repository_outbox.enqueue_email(
+        email,
+        "Confirm your email ",
+        "email_templates.html",
+        {"host": str(host), "username": username, "token": token_verification},
+        db,
+    )
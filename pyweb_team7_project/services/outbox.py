@@ -0,0 +1,126 @@
+import asyncio
+import logging
+
+from fastapi_mail import MessageSchema, MessageType
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.database.models import EmailOutbox
+from pyweb_team7_project.repository import email_outbox as repository_outbox
+from pyweb_team7_project.services.email import MailSender
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    Drains the email outbox in its own process, so SMTP latency and failures never reach a request.
+    Every round claims up to batch_size due emails and sends them through the pooled MailSender,
+    which caps the concurrent SMTP connections at its pool size.
+    A failed email is retried with exponential backoff and dead-lettered after max_attempts.
+    """
+
+    def __init__(
+        self,
+        sender: MailSender,
+        session_factory: async_sessionmaker,
+        batch_size: int = 50,
+        poll_interval: float = 2,
+        max_attempts: int = 6,
+        retry_delay: float = 30,
+        lease: float = 300,
+    ):
+        """
+        :param sender: MailSender: Sends the emails
+        :param session_factory: async_sessionmaker: Opens the database sessions of the worker
+        :param batch_size: int: Emails claimed in one round
+        :param poll_interval: float: Seconds to sleep when the outbox has nothing due
+        :param max_attempts: int: Attempts before an email is dead-lettered
+        :param retry_delay: float: Seconds before the first retry, doubled with every attempt
+        :param lease: float: Seconds a claimed email is hidden from other workers
+        """
+        self.sender = sender
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+
+    async def run_once(self) -> int:
+        """
+        The run_once function sends one batch of due emails and records the outcome of each.
+
+        :return: The number of emails claimed
+        """
+        async with self.session_factory() as db:
+            emails = await repository_outbox.claim_emails(
+                self.batch_size, self.lease, self.max_attempts, db
+            )
+        results = await asyncio.gather(
+            *(self._deliver(email) for email in emails), return_exceptions=True
+        )
+        async with self.session_factory() as db:
+            for email, result in zip(emails, results):
+                if isinstance(result, Exception):
+                    await repository_outbox.mark_failed(
+                        email,
+                        f"{type(result).__name__}: {result}",
+                        self.max_attempts,
+                        self.retry_delay,
+                        db,
+                    )
+                else:
+                    await repository_outbox.mark_sent(email, db)
+        return len(emails)
+
+    async def run(self) -> None:
+        """
+        The run function drains the outbox until it is cancelled, a full batch is followed by the next one
+        right away, otherwise the worker sleeps poll_interval seconds.
+
+        :return: None
+        """
+        await self.sender.start()
+        try:
+            while True:
+                try:
+                    claimed = await self.run_once()
+                except SQLAlchemyError:
+                    logger.exception("Email outbox round failed")
+                    claimed = 0
+                if claimed < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            await self.sender.stop()
+
+    async def _deliver(self, email: EmailOutbox) -> None:
+        message = MessageSchema(
+            subject=email.subject,
+            recipients=[email.recipient],
+            template_body=email.template_body,
+            subtype=MessageType.html,
+        )
+        await self.sender.deliver(message, template_name=email.template_name)
+
+
+async def main():
+    from pyweb_team7_project.database.db import AsyncSessionLocal
+    from pyweb_team7_project.services.email import mail_sender
+
+    worker = OutboxWorker(
+        mail_sender,
+        AsyncSessionLocal,
+        batch_size=settings.email_outbox_batch_size,
+        poll_interval=settings.email_outbox_poll_interval,
+        max_attempts=settings.email_outbox_max_attempts,
+        retry_delay=settings.email_outbox_retry_delay,
+        lease=settings.email_outbox_lease,
+    )
+    await worker.run()
+
+
+if __name__ == "__main__":
+    # python -m pyweb_team7_project.services.outbox
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# the largest page a client can ask for, bigger lists are streamed as NDJSON
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    """
+    The encode_cursor function packs the sort key of the last row of a page into an opaque string.
+    Datetimes always keep all six digits of their microseconds, decode_cursor restores them exactly.
+
+    :param values: The sort key values, e.g. (created_at, id) or (id,)
+    :return: A url-safe cursor string
+    """
+    values = [
+        (
+            value.isoformat(timespec="microseconds")
+            if isinstance(value, datetime)
+            else value
+        )
+        for value in values
+    ]
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *converters: Callable[[Any], Any]) -> list:
+    """
+    The decode_cursor function unpacks a cursor created by encode_cursor.
+    Every value is passed through the matching converter, e.g. datetime.fromisoformat or int.
+
+    :param cursor: str: The cursor received from the client
+    :param converters: Callable: One converter per sort key value
+    :return: The list of converted sort key values
+    :raises HTTPException: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(converters):
+            raise ValueError(cursor)
+        return [convert(value) for convert, value in zip(converters, values)]
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def set_next_cursor(
+    response: Response,
+    items: Sequence,
+    limit: int,
+    key: Callable[[Any], tuple],
+) -> None:
+    """
+    The set_next_cursor function adds the X-Next-Cursor header when a page is full,
+    so the client can ask for the rows that follow the last one it received.
+
+    :param response: Response: The response to add the header to
+    :param items: Sequence: The rows of the current page
+    :param limit: int: The page size that was requested
+    :param key: Callable: Returns the sort key of a row
+    :return: None
+    """
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(items[-1]))
@@ -4,6 +4,7 @@ import tempfile
 import qrcode
 
 from ..services.cloudinary import UploadService
+from ..services.storage import storage
 
 
 async def get_qrcode_image_url(qr_data, folder_name):
@@ -28,7 +29,7 @@ async def get_qrcode_image_url(qr_data, folder_name):
 
         public_id = f"{folder_name}/{UploadService.generate_random_name(16)}"
 
-        result = UploadService.upload(file=temp_file_path, public_id=public_id)
+        result = await storage.upload(temp_file_path, public_id=public_id)
 
         if result:
             cloud_url = result.get("secure_url")
@@ -2,7 +2,7 @@ from typing import List
 
 from fastapi import Request, Depends, HTTPException, status
 
-from pyweb_team7_project.database.models import Role, User
+from pyweb_team7_project.database.models import Role
 from pyweb_team7_project.services.auth import auth_service
 
 
@@ -11,9 +11,9 @@ class RoleAccess:
         self.allowed_roles = allowed_roles
 
     async def __call__(
-        self, request: Request, user: User = Depends(auth_service.get_current_user)
+        self, request: Request, role: Role = Depends(auth_service.get_current_role)
     ):
-        if user.role not in self.allowed_roles:
+        if role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden operation"
             )
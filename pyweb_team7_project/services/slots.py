@@ -0,0 +1,71 @@
+import asyncio
+
+
+class Slots:
+    """
+    Caps how many calls of a kind run at once, e.g. password checks or uploads.
+    The semaphore is created by start when the application starts, or on first use,
+    so it belongs to the event loop that serves the requests and not to the one running at import.
+    """
+
+    def __init__(self, size: int):
+        """
+        :param size: int: Number of calls allowed at once
+        """
+        self.size = size
+        self.semaphore: asyncio.Semaphore | None = None
+
+    def start(self) -> None:
+        """
+        The start function creates the semaphore with all slots free.
+
+        :return: None
+        """
+        self.semaphore = asyncio.Semaphore(self.size)
+
+    async def acquire(self, timeout: float) -> bool:
+        """
+        The acquire function waits up to timeout seconds for a free slot.
+        A slot taken just as the wait times out or is cancelled is given back,
+        so only a call that returned True has to release one.
+
+        :param timeout: float: Seconds to wait for a slot
+        :return: True if a slot was taken, False if none got free in time
+        """
+        if self.semaphore is None:
+            self.start()
+        semaphore = self.semaphore
+        acquired = False
+
+        async def take() -> None:
+            nonlocal acquired
+            await semaphore.acquire()
+            acquired = True
+
+        try:
+            await asyncio.wait_for(take(), timeout)
+        except asyncio.TimeoutError:
+            if acquired:
+                semaphore.release()
+            return False
+        except BaseException:
+            if acquired:
+                semaphore.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        """
+        The release function frees a slot taken by acquire.
+
+        :return: None
+        """
+        self.semaphore.release()
+
+    def locked(self) -> bool:
+        """
+        The locked function tells whether every slot is taken.
+
+        :return: True if acquire would have to wait
+        """
+        return self.semaphore is not None and self.semaphore.locked()
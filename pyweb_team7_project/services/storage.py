@@ -0,0 +1,482 @@
+import abc
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import uuid
+from functools import partial
+from typing import AsyncIterator
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import HTTPException, status
+
+from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.services.cloudinary import (
+    configure_cloudinary,
+    upload_async,
+    upload_executor,
+    upload_large_async,
+)
+
+CHUNK_SIZE = 64 * 1024
+LOCAL_PART_SIZE = 1024 * 1024
+
+
+def _open_source(file):
+    """
+    Opens what the routes pass as an upload: a path, bytes or a binary file object.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        return open(file, "rb")
+    if isinstance(file, bytes):
+        return io.BytesIO(file)
+    file.seek(0)
+    return file
+
+
+def _extension(filename: str | None) -> str:
+    return os.path.splitext(filename)[1].lower() if filename else ""
+
+
+def file_sha256(file) -> str:
+    """
+    The file_sha256 function hashes a file the way UploadStream hashes a streamed one, it blocks on the reads.
+
+    :param file: A path, bytes or a binary file object
+    :return: The hex digest of the SHA-256 of the content
+    """
+    digest = hashlib.sha256()
+    source = _open_source(file)
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        if source is not file:
+            source.close()
+        else:
+            file.seek(0)
+    return digest.hexdigest()
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"The file is larger than {max_size} bytes",
+    )
+
+
+class UploadStream:
+    """
+    Wraps the chunks of a request body, counting and hashing them as they pass,
+    so a backend can send them on without the whole file ever being on disk or in memory.
+    Iterating it raises 413 as soon as more than max_size bytes came in, and 400 for an empty body.
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncIterator[bytes],
+        max_size: int,
+        expected_size: int | None = None,
+    ):
+        """
+        :param chunks: AsyncIterator[bytes]: The body, e.g. Request.stream()
+        :param max_size: int: The largest file accepted
+        :param expected_size: int | None: The Content-Length of the body if the client sent one
+        :raises HTTPException: 413 if expected_size is already larger than max_size
+        """
+        if expected_size is not None and expected_size > max_size:
+            raise _too_large(max_size)
+        self.chunks = chunks
+        self.max_size = max_size
+        self.expected_size = expected_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.chunks:
+            if not chunk:
+                continue
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                raise _too_large(self.max_size)
+            self.sha256.update(chunk)
+            yield chunk
+        if self.size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload"
+            )
+
+    def hexdigest(self) -> str:
+        """
+        The hexdigest function returns the SHA-256 of the chunks read so far.
+
+        :return: The hex digest
+        """
+        return self.sha256.hexdigest()
+
+
+async def iter_parts(
+    chunks: AsyncIterator[bytes], part_size: int
+) -> AsyncIterator[bytes]:
+    """
+    The iter_parts function regroups chunks of any size into parts of part_size bytes, the last one may be shorter.
+
+    :param chunks: AsyncIterator[bytes]: The chunks
+    :param part_size: int: The size of the parts
+    :return: An async iterator over the parts
+    """
+    buffer, size = [], 0
+    async for chunk in chunks:
+        while chunk:
+            piece, chunk = chunk[: part_size - size], chunk[part_size - size :]
+            buffer.append(piece)
+            size += len(piece)
+            if size == part_size:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+class StorageBackend(abc.ABC):
+    """
+    Where the image files and QR codes live. Uploads return a dictionary with the
+    public_id the file is stored under and its secure_url, like the Cloudinary API does.
+    A backend implements upload, delete and url, it can not be created without them.
+    """
+
+    @abc.abstractmethod
+    async def upload(
+        self, file, public_id: str | None = None, filename: str | None = None
+    ) -> dict:
+        """
+        The upload function stores a file, replacing the file stored under public_id if there is one.
+
+        :param file: A path, bytes or a binary file object
+        :param public_id: str | None: The name to store the file under, generated when missing
+        :param filename: str | None: The original file name, used for the extension and content type
+        :return: A dictionary with the public_id and the secure_url of the file
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, public_id: str) -> None:
+        """
+        The delete function removes a stored file, a missing file is not an error.
+
+        :param public_id: str: The name the file is stored under
+        :return: None
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def url(self, public_id: str) -> str:
+        """
+        The url function returns the public URL of a stored file.
+
+        :param public_id: str: The name the file is stored under
+        :return: The URL
+        """
+        raise NotImplementedError
+
+    def transform_url(self, public_id: str, effect: str) -> str | None:
+        """
+        The transform_url function returns the URL of the file with a Cloudinary style effect applied,
+        e.g. grayscale or blur:300.
+
+        :param public_id: str: The name the file is stored under
+        :param effect: str: The effect to apply
+        :return: The URL, None if the backend can not transform images
+        """
+        return None
+
+    async def upload_stream(
+        self, stream: UploadStream, filename: str | None = None
+    ) -> dict:
+        """
+        The upload_stream function stores a file while it is still being received.
+        This default spools the stream to a temporary file and calls upload,
+        the backends override it to send the parts on as they come.
+
+        :param stream: UploadStream: The body of the request
+        :param filename: str | None: The original file name, used for the extension and content type
+        :return: A dictionary with the public_id and the secure_url of the file
+        """
+        with tempfile.TemporaryFile() as spool:
+            async for part in iter_parts(stream, LOCAL_PART_SIZE):
+                await asyncio.to_thread(spool.write, part)
+            return await self.upload(spool, filename=filename)
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Stores files in the Cloudinary account from the CLOUDINARY_* settings.
+    """
+
+    def __init__(self):
+        configure_cloudinary()
+
+    async def upload(
+        self, file, public_id: str | None = None, filename: str | None = None
+    ) -> dict:
+        options = {"filename": filename} if filename else {}
+        if public_id:
+            options.update(public_id=public_id, overwrite=True, invalidate=True)
+        return await upload_async(file, **options)
+
+    async def upload_stream(
+        self, stream: UploadStream, filename: str | None = None
+    ) -> dict:
+        return await upload_large_async(
+            iter_parts(stream, settings.upload_part_size),
+            total_size=stream.expected_size,
+            filename=filename or "stream",
+        )
+
+    async def delete(self, public_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            upload_executor,
+            partial(cloudinary.uploader.destroy, public_id, invalidate=True),
+        )
+
+    def url(self, public_id: str) -> str:
+        return cloudinary.CloudinaryImage(public_id).build_url(secure=True)
+
+    def transform_url(self, public_id: str, effect: str) -> str | None:
+        return cloudinary.CloudinaryImage(public_id).build_url(
+            secure=True, effect=effect
+        )
+
+
+class LocalStorage(StorageBackend):
+    """
+    Stores files on the local filesystem under root, named by the SHA-256 of their content,
+    so the same bytes are stored once. routes/storage.py serves them under base_url.
+    A public_id passed to upload is ignored, the content decides the name.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        """
+        :param root: str: The directory the files are written to
+        :param base_url: str: The URL the directory is served under
+        """
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, public_id: str) -> str | None:
+        """
+        The path function returns where a file is stored, None for names outside of the storage root.
+
+        :param public_id: str: The name the file is stored under
+        :return: The absolute path of the file
+        """
+        path = os.path.abspath(os.path.join(self.root, public_id))
+        if os.path.commonpath([self.root, path]) != self.root or path == self.root:
+            return None
+        return path
+
+    def _tmp_path(self) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f".upload-{uuid.uuid4().hex}")
+
+    def _store(self, tmp_path: str, hex_digest: str, filename: str | None) -> str:
+        public_id = f"{hex_digest[:2]}/{hex_digest[2:4]}/{hex_digest}" + _extension(
+            filename
+        )
+        path = self.path(public_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return public_id
+
+    def _write(self, file, filename: str | None) -> str:
+        tmp_path = self._tmp_path()
+        digest = hashlib.sha256()
+        source = _open_source(file)
+        try:
+            with open(tmp_path, "wb") as target:
+                while chunk := source.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    target.write(chunk)
+        finally:
+            if source is not file:
+                source.close()
+        return self._store(
+            tmp_path,
+            digest.hexdigest(),
+            filename or (file if isinstance(file, str) else None),
+        )
+
+    async def upload(
+        self, file, public_id: str | None = None, filename: str | None = None
+    ) -> dict:
+        public_id = await asyncio.to_thread(self._write, file, filename)
+        return {"public_id": public_id, "secure_url": self.url(public_id)}
+
+    async def upload_stream(
+        self, stream: UploadStream, filename: str | None = None
+    ) -> dict:
+        tmp_path = await asyncio.to_thread(self._tmp_path)
+        target = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            try:
+                async for part in iter_parts(stream, LOCAL_PART_SIZE):
+                    await asyncio.to_thread(target.write, part)
+            finally:
+                await asyncio.to_thread(target.close)
+            public_id = await asyncio.to_thread(
+                self._store, tmp_path, stream.hexdigest(), filename
+            )
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {"public_id": public_id, "secure_url": self.url(public_id)}
+
+    async def delete(self, public_id: str) -> None:
+        path = self.path(public_id)
+        if path is not None and os.path.isfile(path):
+            await asyncio.to_thread(os.remove, path)
+
+    def url(self, public_id: str) -> str:
+        return f"{self.base_url}/{public_id}"
+
+
+class S3Storage(StorageBackend):
+    """
+    Stores files in a bucket of an S3 compatible service, e.g. AWS S3 or MinIO.
+    Needs boto3, installed with the s3 extra. Its blocking calls run in the upload thread pool.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        public_url: str | None = None,
+    ):
+        """
+        :param bucket: str: The bucket the files are stored in
+        :param endpoint_url: str | None: The endpoint of the service, None for AWS
+        :param region: str | None: The region of the bucket
+        :param access_key: str | None: The access key, None to use the default credentials chain
+        :param secret_key: str | None: The secret key
+        :param public_url: str | None: The URL the bucket is served under, e.g. a CDN
+        """
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3, install the s3 extra")
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.amazonaws.com"
+
+    def _put(self, file, key: str, content_type: str | None) -> None:
+        extra_args = {"ContentType": content_type} if content_type else None
+        source = _open_source(file)
+        try:
+            self.client.upload_fileobj(source, self.bucket, key, ExtraArgs=extra_args)
+        finally:
+            if source is not file:
+                source.close()
+
+    async def upload(
+        self, file, public_id: str | None = None, filename: str | None = None
+    ) -> dict:
+        filename = filename or (file if isinstance(file, str) else None)
+        key = public_id or uuid.uuid4().hex + _extension(filename)
+        content_type = mimetypes.guess_type(filename)[0] if filename else None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(upload_executor, self._put, file, key, content_type)
+        return {"public_id": key, "secure_url": self.url(key)}
+
+    async def upload_stream(
+        self, stream: UploadStream, filename: str | None = None
+    ) -> dict:
+        key = uuid.uuid4().hex + _extension(filename)
+        content_type = mimetypes.guess_type(filename)[0] if filename else None
+        extra_args = {"ContentType": content_type} if content_type else {}
+        loop = asyncio.get_running_loop()
+
+        def call(method, **kwargs):
+            return loop.run_in_executor(
+                upload_executor,
+                partial(method, Bucket=self.bucket, Key=key, **kwargs),
+            )
+
+        multipart = await call(self.client.create_multipart_upload, **extra_args)
+        upload_id = multipart["UploadId"]
+        parts = []
+        try:
+            async for part in iter_parts(stream, settings.upload_part_size):
+                number = len(parts) + 1
+                response = await call(
+                    self.client.upload_part,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=part,
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": number})
+            await call(
+                self.client.complete_multipart_upload,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await call(self.client.abort_multipart_upload, UploadId=upload_id)
+            raise
+        return {"public_id": key, "secure_url": self.url(key)}
+
+    async def delete(self, public_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            upload_executor,
+            partial(self.client.delete_object, Bucket=self.bucket, Key=public_id),
+        )
+
+    def url(self, public_id: str) -> str:
+        return f"{self.public_url}/{public_id}"
+
+
+def create_storage() -> StorageBackend:
+    """
+    The create_storage function builds the storage backend named by STORAGE_BACKEND.
+
+    :return: The storage backend
+    """
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.storage_local_root, settings.storage_local_url)
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key=settings.s3_access_key,
+            secret_key=settings.s3_secret_key,
+            public_url=settings.s3_public_url,
+        )
+    if settings.storage_backend == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r}")
+
+
+storage = create_storage()
@@ -0,0 +1,127 @@
+import time
+import uuid
+
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from pyweb_team7_project.conf.config import settings
+
+
+class SlidingWindowLimiter:
+    """
+    Counts attempts per key in a Redis sorted set scored by time and rejects a key
+    once it made more than limit attempts within the last window seconds.
+    Only allowed attempts are recorded, so a client hammering a key can not keep it
+    blocked beyond the window, the owner gets limit attempts per window regardless.
+    Without a Redis connection, or when Redis fails, every attempt is allowed.
+    """
+
+    def __init__(self, prefix: str, limit: int, window: int):
+        """
+        :param prefix: str: Prepended to every key stored in Redis
+        :param limit: int: Attempts allowed per key within the window
+        :param window: int: Length of the sliding window in seconds
+        """
+        self.prefix = prefix
+        self.limit = limit
+        self.window = window
+        self.redis: Redis | None = None
+
+    def connect(self, redis: Redis | None) -> None:
+        """
+        The connect function enables the limiter on the given connection, None disables it.
+
+        :param redis: Redis | None: The Redis connection
+        :return: None
+        """
+        self.redis = redis
+
+    async def hit(self, key: str) -> bool:
+        """
+        The hit function records an attempt for the key if it is within the limit.
+        The key is counted under WATCH and the attempt added in MULTI/EXEC,
+        a concurrent attempt on the same key makes it count again.
+
+        :param key: str: The account or client the attempt is counted for
+        :return: True if the attempt is within the limit
+        """
+        if self.redis is None:
+            return True
+        redis_key = self.prefix + key
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                while True:
+                    now = time.time()
+                    try:
+                        await pipe.watch(redis_key)
+                        attempts = await pipe.zcount(
+                            redis_key, f"({now - self.window}", "+inf"
+                        )
+                        if attempts >= self.limit:
+                            await pipe.unwatch()
+                            return False
+                        pipe.multi()
+                        pipe.zremrangebyscore(redis_key, 0, now - self.window)
+                        pipe.zadd(redis_key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+                        pipe.expire(redis_key, self.window)
+                        await pipe.execute()
+                        return True
+                    except WatchError:
+                        continue
+        except RedisError:
+            return True
+
+    async def reset(self, key: str) -> None:
+        """
+        The reset function forgets the attempts recorded for the key.
+
+        :param key: str: The account or client to reset
+        :return: None
+        """
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self.prefix + key)
+        except RedisError:
+            pass
+
+
+login_account_limiter = SlidingWindowLimiter(
+    "login:account:", settings.login_limit_per_account, settings.login_limit_window
+)
+login_ip_limiter = SlidingWindowLimiter(
+    "login:ip:", settings.login_limit_per_ip, settings.login_limit_window
+)
+
+
+async def check_login_attempt(email: str, client_ip: str | None) -> None:
+    """
+    The check_login_attempt function counts a login attempt for the account and the client address,
+    it runs before the password is checked so throttled attempts cost no bcrypt work.
+
+    :param email: str: The email the client tries to log in with
+    :param client_ip: str | None: The address of the client
+    :return: None
+    :raises HTTPException: 429 if the account or the address made too many attempts
+    """
+    allowed = await login_account_limiter.hit(email.lower())
+    if client_ip is not None:
+        allowed = await login_ip_limiter.hit(client_ip) and allowed
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(settings.login_limit_window)},
+        )
+
+
+async def clear_login_attempts(email: str) -> None:
+    """
+    The clear_login_attempts function resets the account limit after a successful login,
+    the failed attempts before it no longer count against the owner.
+
+    :param email: str: The email the user logged in with
+    :return: None
+    """
+    await login_account_limiter.reset(email.lower())
@@ -1,27 +1,103 @@
+import atexit
 import os
+import shutil
 import sys
-from unittest.mock import MagicMock
+import tempfile
+import unittest
+from typing import Callable
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy import select
 from sqlalchemy.exc import DatabaseError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+# uploads go to a throwaway directory instead of the Cloudinary account
+if "STORAGE_BACKEND" not in os.environ:
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["STORAGE_LOCAL_ROOT"] = tempfile.mkdtemp(prefix="storage-")
+    os.environ["STORAGE_LOCAL_URL"] = "https://testserver/api/storage"
+    atexit.register(shutil.rmtree, os.environ["STORAGE_LOCAL_ROOT"], True)
 
 from main import app
 from pyweb_team7_project.database.models import Base, User, Image
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database.db import get_async_db, get_read_db
+from pyweb_team7_project.services.cache import user_cache
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient may run each request in its own event loop, so connections are not pooled
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def create_seeded_engine(
+    path, seed: Callable[[Session], None] | None = None
+) -> AsyncEngine:
+    """
+    Creates the tables in the SQLite file at path, adds the rows of seed with a sync session
+    and returns an aiosqlite engine on the file. Its connections are not pooled,
+    so none of them outlives the event loop of the test.
+    """
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    if seed is not None:
+        with Session(sync_engine) as session:
+            seed(session)
+            session.commit()
+    sync_engine.dispose()
+    return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+
+class AsyncDatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs every test against a SQLite file of its own, seeded by the seed method.
+    self.session_local opens AsyncSessions on it, self.path is the file for sync checks.
+    """
+
+    db_name = "async.db"
+
+    def seed(self, session: Session) -> None:
+        """
+        Adds the rows the tests start with, the session is committed afterwards.
+        """
+
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, self.db_name)
+        self.async_engine = create_seeded_engine(self.path, self.seed)
+        self.session_local = async_sessionmaker(
+            bind=self.async_engine, expire_on_commit=False
+        )
+
+    async def asyncTearDown(self):
+        await self.async_engine.dispose()
+
+    def capture_statements(self) -> list[str]:
+        """
+        Returns the list the SQL statements sent over self.async_engine are added to.
+        """
+        statements = []
+        event.listen(
+            self.async_engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        return statements
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -29,6 +105,8 @@ def session():
 
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # cached users belong to the database that was just dropped
+    user_cache.clear()
 
     db = TestingSessionLocal()
     try:
@@ -43,13 +121,12 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
 
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_read_db] = override_get_async_db
 
     yield TestClient(app)
 
@@ -90,8 +167,6 @@ def image():
 
 @pytest.fixture()
 def token(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("pyweb_team7_project.routes.auth.send_email", mock_send_email)
     client.post("/api/auth/signup", json=user)
 
     # current_user = select(User).where(User.email == user.get("email"))
@@ -8,7 +8,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
     @patch("tempfile.NamedTemporaryFile")
     @patch("qrcode.make")
     @patch("pyweb_team7_project.services.cloudinary.UploadService.generate_random_name")
-    @patch("pyweb_team7_project.services.cloudinary.UploadService.upload")
+    @patch("pyweb_team7_project.services.qrcode_generation.storage.upload")
     @patch("os.remove")
     async def test_get_qrcode_image_url_with_data(
         self,
@@ -40,7 +40,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
         mock_make.return_value.save.assert_called_once_with(temp_file_path)
         mock_generate_random_name.assert_called_once_with(16)
         mock_upload.assert_called_once_with(
-            file=temp_file_path, public_id=f"{folder_name}/test_name"
+            temp_file_path, public_id=f"{folder_name}/test_name"
         )
         mock_remove.assert_called_once_with(temp_file_path)
 
@@ -58,7 +58,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
     @patch("tempfile.NamedTemporaryFile")
     @patch("qrcode.make")
     @patch("pyweb_team7_project.services.cloudinary.UploadService.generate_random_name")
-    @patch("pyweb_team7_project.services.cloudinary.UploadService.upload")
+    @patch("pyweb_team7_project.services.qrcode_generation.storage.upload")
     @patch("os.remove")
     async def test_get_qrcode_image_url_with_exception(
         self,
@@ -89,7 +89,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
     @patch("tempfile.NamedTemporaryFile")
     @patch("qrcode.make")
     @patch("pyweb_team7_project.services.cloudinary.UploadService.generate_random_name")
-    @patch("pyweb_team7_project.services.cloudinary.UploadService.upload")
+    @patch("pyweb_team7_project.services.qrcode_generation.storage.upload")
     @patch("os.remove")
     async def test_get_qrcode_image_url_with_no_temp_file(
         self,
@@ -123,7 +123,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
     @patch("tempfile.NamedTemporaryFile")
     @patch("qrcode.make")
     @patch("pyweb_team7_project.services.cloudinary.UploadService.generate_random_name")
-    @patch("pyweb_team7_project.services.cloudinary.UploadService.upload")
+    @patch("pyweb_team7_project.services.qrcode_generation.storage.upload")
     @patch("os.remove")
     def test_get_qrcode_image_url_with_data(
         self,
@@ -155,7 +155,7 @@ class TestGetQRCodeImageUrl(unittest.TestCase):
         mock_make.return_value.save.assert_called_once_with(temp_file_path)
         mock_generate_random_name.assert_called_once_with(16)
         mock_upload.assert_called_once_with(
-            file=temp_file_path, public_id=f"{folder_name}/test_name"
+            temp_file_path, public_id=f"{folder_name}/test_name"
         )
         mock_remove.assert_called_once_with(temp_file_path)
 
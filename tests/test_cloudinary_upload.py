@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import cloudinary
+import cloudinary.uploader
+import httpx
+from cloudinary.api_client import call_api
+from fastapi import HTTPException
+from urllib3 import PoolManager
+
+from main import app
+from pyweb_team7_project.services import cloudinary as cloudinary_service
+from pyweb_team7_project.services.cloudinary import upload_async
+from pyweb_team7_project.services.slots import Slots
+
+
+class SlowStorage(BaseHTTPRequestHandler):
+    """
+    Stands in for the Cloudinary upload API, answering every upload after delay seconds.
+    """
+
+    delay = 1.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.delay)
+        body = json.dumps(
+            {"public_id": "slow", "secure_url": "https://example.com/slow.jpg"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUploadAsync(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStorage)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.options = {
+            "upload_prefix": f"http://127.0.0.1:{cls.server.server_port}",
+            "cloud_name": "demo",
+            "api_key": "key",
+            "api_secret": "secret",
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        SlowStorage.delay = 1.0
+
+    async def upload(self):
+        return await upload_async(b"x" * 2_000_000, **self.options)
+
+    async def test_requests_served_during_slow_upload(self):
+        upload = asyncio.create_task(self.upload())
+        latencies = []
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            await asyncio.sleep(0.1)
+            while not upload.done() and len(latencies) < 20:
+                start = time.perf_counter()
+                response = await client.get("/")
+                latencies.append(time.perf_counter() - start)
+                self.assertEqual(response.status_code, 200)
+                await asyncio.sleep(0.02)
+
+        self.assertEqual((await upload)["secure_url"], "https://example.com/slow.jpg")
+        self.assertGreaterEqual(len(latencies), 10)
+        self.assertLess(max(latencies), 0.5)
+
+    async def test_upload_timeout(self):
+        with patch.object(cloudinary_service.config, "cloudinary_upload_timeout", 0.2):
+            with self.assertRaises(HTTPException) as context:
+                await self.upload()
+        self.assertEqual(context.exception.status_code, 504)
+
+    async def test_socket_timeout_first(self):
+        with self.assertRaises(HTTPException) as context:
+            await upload_async(b"x" * 2_000_000, timeout=0.1, **self.options)
+        self.assertEqual(context.exception.status_code, 504)
+
+    async def test_concurrency_cap(self):
+        SlowStorage.delay = 0.5
+        slots = Slots(1)
+        with patch.object(cloudinary_service, "upload_slots", slots), patch.object(
+            cloudinary_service.config, "cloudinary_wait_timeout", 0.1
+        ):
+            results = await asyncio.gather(
+                self.upload(), self.upload(), return_exceptions=True
+            )
+            rejected = [r for r in results if isinstance(r, HTTPException)]
+            self.assertEqual([r.status_code for r in rejected], [503])
+            # the slot is free again once the upload thread is done
+            self.assertEqual((await self.upload())["public_id"], "slow")
+        self.assertFalse(slots.locked())
+
+
+class TestConfigureCloudinary(unittest.TestCase):
+    def test_one_shared_pool(self):
+        pool = cloudinary_service.configure_cloudinary()
+
+        self.assertIs(cloudinary_service.configure_cloudinary(), pool)
+        self.assertIs(cloudinary.uploader._http, pool)
+        self.assertEqual(
+            pool.connection_pool_kw["maxsize"],
+            cloudinary_service.config.cloudinary_pool_size,
+        )
+        self.assertEqual(
+            cloudinary.config().cloud_name, cloudinary_service.config.cloudinary_name
+        )
+        cloudinary_service.close_cloudinary()
+
+    def test_sdk_still_reads_private_pools(self):
+        # configure_cloudinary replaces these, a Cloudinary release without them needs another hook
+        for module, function in (
+            (cloudinary.uploader, cloudinary.uploader.call_api),
+            (call_api, call_api._call_api),
+        ):
+            self.assertIsInstance(getattr(module, "_http", None), PoolManager)
+            self.assertIn("_http", function.__code__.co_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
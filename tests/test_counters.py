@@ -0,0 +1,77 @@
+import io
+import unittest
+from unittest.mock import patch
+
+from fastapi import UploadFile
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import User, Image
+from pyweb_team7_project.repository import comments as repository_comments
+from pyweb_team7_project.repository import images as repository_images
+from pyweb_team7_project.repository.counters import reconcile_counters
+from pyweb_team7_project.schemas import CommentRequestModel
+
+
+class TestCounters(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        user = User(username="owner", email="owner@example.com", password="x")
+        session.add(Image(file_url="url", description="image", user=user))
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db = self.session_local()
+        # the fixture rows were inserted without going through the repositories
+        await reconcile_counters(self.db)
+        self.user = await self.db.get(User, 1)
+        self.image = await self.db.get(Image, 1)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await super().asyncTearDown()
+
+    async def counters(self):
+        async with self.session_local() as db:
+            user = await db.get(User, 1)
+            image = await db.get(Image, 1)
+            return user.images_count, image.comments_count
+
+    async def test_comments_count(self):
+        body = CommentRequestModel(content="nice", image_id=1)
+        first = await repository_comments.create_comment(
+            body, self.user, self.image, self.db
+        )
+        await repository_comments.create_comment(body, self.user, self.image, self.db)
+        self.assertEqual(await self.counters(), (1, 2))
+        self.assertEqual(self.image.comments_count, 2)
+
+        await repository_comments.remove_comment(first, self.db)
+        self.assertEqual(await self.counters(), (1, 1))
+
+    async def test_images_count(self):
+        upload = {"public_id": "public_id", "secure_url": "https://example.com/1.jpg"}
+        file = UploadFile(filename="1.jpg", file=io.BytesIO(b"image"))
+        with patch.object(repository_images.storage, "upload", return_value=upload):
+            image = await repository_images.create_image_and_upload_to_cloudinary(
+                self.db, file, "second", self.user.id
+            )
+        self.assertEqual(await self.counters(), (2, 0))
+
+        await repository_images.delete_image(self.user, self.db, image.id)
+        self.assertEqual(await self.counters(), (1, 0))
+
+    async def test_reconcile_repairs_drift(self):
+        await self.db.execute(update(User).values(images_count=7))
+        await self.db.execute(update(Image).values(comments_count=3))
+        await self.db.commit()
+
+        repaired = await reconcile_counters(self.db)
+
+        self.assertEqual(repaired, {"users": 1, "images": 1})
+        self.assertEqual(await self.counters(), (1, 0))
+        self.assertEqual(await reconcile_counters(self.db), {"users": 0, "images": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi import Request
+from sqlalchemy import event
+from starlette import status
+
+from pyweb_team7_project.services import auth
+from pyweb_team7_project.services.cache import token_cache, user_cache
+from conftest import async_engine, AsyncTestingSessionLocal
+
+
+def count_requests(client, token, url):
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    user_cache.clear()
+    token_cache.clear()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+            response = client.get(url, headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    assert response.status_code == status.HTTP_200_OK
+    user_lookups = [s for s in statements if "WHERE users.email" in s]
+    return decode.call_count, len(user_lookups)
+
+
+def test_user_resolved_once_per_request(client, token):
+    # free_access and the handler both depend on get_current_user
+    decodes, lookups = count_requests(client, token, "/api/users/get_all")
+
+    assert decodes == 1
+    assert lookups == 1
+
+
+def test_user_memoized_on_request_state(client, token):
+    request = Request({"type": "http", "headers": []})
+    token_cache.clear()
+
+    async def resolve_twice():
+        async with AsyncTestingSessionLocal() as db:
+            first = await auth.auth_service.get_current_user(token, db, request)
+            second = await auth.auth_service.get_current_user(token, db, request)
+        return first, second
+
+    with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+        first, second = asyncio.run(resolve_twice())
+
+    assert decode.call_count == 1
+    assert first is second
+    assert request.state.current_user is first
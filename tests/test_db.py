@@ -1,12 +1,25 @@
 import unittest
 import sys
 import os
+import tempfile
+import time
 from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pyweb_team7_project.database.db import get_db
+from pyweb_team7_project.database import db as database
+from pyweb_team7_project.database.db import (
+    get_db,
+    get_read_db,
+    pool_status,
+    MeteredQueuePool,
+    READ_PRIMARY_COOKIE,
+)
+from pyweb_team7_project.database.models import Base, Tag
 
 
 class TestRstToHtml(unittest.TestCase):
@@ -31,5 +44,110 @@ class TestRstToHtml(unittest.TestCase):
         mock_session_instance.close.assert_called_once()
 
 
+class TestPoolStatus(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite:///./test.db",
+            poolclass=MeteredQueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=1,
+        )
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_pool_status_counts_connections(self):
+        with self.engine.connect() as first, self.engine.connect() as second:
+            first.execute(text("SELECT 1"))
+            second.execute(text("SELECT 1"))
+            status = pool_status(self.engine)
+            self.assertEqual(status["checked_out"], 2)
+            self.assertEqual(status["overflow"], 1)
+
+        status = pool_status(self.engine)
+        self.assertEqual(status["checked_out"], 0)
+        self.assertEqual(status["idle"], 1)
+        self.assertEqual(status["waits"], 2)
+        self.assertGreaterEqual(status["wait_time_max"], 0.0)
+
+    def test_wait_excludes_opening_connections(self):
+        slow_engine = create_engine(
+            "sqlite://",
+            poolclass=MeteredQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=1,
+        )
+
+        @event.listens_for(slow_engine, "do_connect")
+        def slow_connect(*args):
+            time.sleep(0.2)
+
+        try:
+            with slow_engine.connect():
+                pass
+            with slow_engine.connect():
+                pass
+            status = pool_status(slow_engine)
+        finally:
+            slow_engine.dispose()
+
+        self.assertEqual(status["waits"], 2)
+        self.assertLess(status["wait_time_max"], 0.1)
+
+
+class TestReadReplicaRouting(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engines = {}
+        for name in ("primary", "replica"):
+            path = os.path.join(self.tmp_dir.name, f"{name}.db")
+            sync_engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(bind=sync_engine)
+            with Session(sync_engine) as session:
+                session.add(Tag(name=f"{name}_tag"))
+                session.commit()
+            sync_engine.dispose()
+            self.engines[name] = create_async_engine(
+                f"sqlite+aiosqlite:///{path}", poolclass=NullPool
+            )
+
+        self.patchers = [
+            patch.object(
+                database,
+                "AsyncSessionLocal",
+                async_sessionmaker(bind=self.engines["primary"]),
+            ),
+            patch.object(
+                database,
+                "AsyncReadSessionLocal",
+                async_sessionmaker(bind=self.engines["replica"]),
+            ),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        for engine in self.engines.values():
+            await engine.dispose()
+        self.tmp_dir.cleanup()
+
+    async def read_tag_name(self, cookies):
+        request = MagicMock()
+        request.cookies = cookies
+        async for session in get_read_db(request):
+            return await session.scalar(select(Tag.name))
+
+    async def test_reads_go_to_replica(self):
+        self.assertEqual(await self.read_tag_name({}), "replica_tag")
+
+    async def test_pinned_reads_go_to_primary(self):
+        name = await self.read_tag_name({READ_PRIMARY_COOKIE: "1"})
+        self.assertEqual(name, "primary_tag")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,16 +1,20 @@
-from unittest.mock import MagicMock
+from pyweb_team7_project.database.db import READ_PRIMARY_COOKIE
+from pyweb_team7_project.database.models import (
+    User,
+    RefreshToken,
+    EmailOutbox,
+    EmailStatus,
+)
+from pyweb_team7_project.repository.refresh_tokens import hash_token
 
-from pyweb_team7_project.database.models import User
 
-
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("pyweb_team7_project.routes.auth.send_email", mock_send_email)
+def test_create_user(client, session, user):
     response = client.post(
         "/api/auth/signup",
         json=user,
     )
     assert response.status_code == 201, response.text
+    assert response.cookies.get(READ_PRIMARY_COOKIE) == "1"
     data = response.json()
 
     print(data)
@@ -25,6 +29,10 @@ def test_create_user(client, user, monkeypatch):
     assert 'email' in db_user 
     assert 'avatar' in db_user 
     assert 'role' in db_user 
+    # the confirmation email waits in the outbox for the email worker
+    queued = session.query(EmailOutbox).filter_by(recipient=user.get("email")).one()
+    assert queued.status == EmailStatus.pending
+    assert queued.template_body["username"] == user.get("username")
 
 
 def test_repeat_create_user(client, user):
@@ -61,6 +69,11 @@ def test_login_user(client, session, user):
     assert response.status_code == 200, response.text
     data = response.json()
     assert data["token_type"] == "bearer"
+    stored = session.query(RefreshToken).filter_by(user_id=current_user.id).all()
+    assert [token.token_hash for token in stored] == [
+        hash_token(data["refresh_token"])
+    ]
+    assert stored[0].device == "testclient"
 
 
 def test_login_user_wrong_password(client, user):
@@ -81,3 +94,64 @@ def test_login_user_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def test_metrics_only_for_admin(client, session, user):
+    for path in ("/api/healthchecker/pool", "/api/healthchecker/cache"):
+        assert client.get(path).status_code == 401
+
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    # the first registered user is the admin
+    response = client.get("/api/healthchecker/pool", headers=headers)
+    assert response.status_code == 200, response.text
+    assert "primary" in response.json()
+    response = client.get("/api/healthchecker/cache", headers=headers)
+    assert response.status_code == 200, response.text
+    assert "users" in response.json()
+
+
+def login_device(client, user, device):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+        headers={"User-Agent": device},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_logout_one_device(client, session, user):
+    phone = login_device(client, user, "phone")
+    login_device(client, user, "laptop")
+
+    response = client.post(
+        "/api/auth/logout",
+        headers={"Authorization": f"Bearer {phone['refresh_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    devices = [token.device for token in session.query(RefreshToken).all()]
+    assert "phone" not in devices
+    assert "laptop" in devices
+
+    # an access token is not a refresh token
+    response = client.post(
+        "/api/auth/logout",
+        headers={"Authorization": f"Bearer {phone['access_token']}"},
+    )
+    assert response.status_code == 401, response.text
+
+
+def test_logout_all_devices(client, session, user):
+    tokens = login_device(client, user, "tablet")
+
+    response = client.post(
+        "/api/auth/logout_all",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert response.status_code == 200, response.text
+    session.expire_all()
+    assert session.query(RefreshToken).count() == 0
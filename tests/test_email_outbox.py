@@ -0,0 +1,164 @@
+import asyncio
+import socket
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import EmailOutbox, EmailStatus
+from pyweb_team7_project.repository import email_outbox as repository_outbox
+from pyweb_team7_project.services.email import MailSender, conf
+from pyweb_team7_project.services.outbox import OutboxWorker
+
+
+class Inbox:
+    def __init__(self):
+        self.recipients = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestOutboxWorker(AsyncDatabaseTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.inbox = Inbox()
+        port = free_port()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.config = ConnectionConfig(
+            MAIL_USERNAME="",
+            MAIL_PASSWORD="",
+            MAIL_FROM="sender@example.com",
+            MAIL_PORT=port,
+            MAIL_SERVER="127.0.0.1",
+            MAIL_STARTTLS=False,
+            MAIL_SSL_TLS=False,
+            USE_CREDENTIALS=False,
+            VALIDATE_CERTS=False,
+            TEMPLATE_FOLDER=conf.TEMPLATE_FOLDER,
+        )
+        self.sender = MailSender(self.config, pool_size=2, batch_size=5)
+        await self.sender.start()
+        self.worker = OutboxWorker(
+            self.sender, self.session_local, batch_size=10, max_attempts=2
+        )
+
+    async def asyncTearDown(self):
+        await self.sender.stop()
+        self.controller.stop()
+        await super().asyncTearDown()
+
+    async def enqueue(self, count):
+        async with self.session_local() as db:
+            for i in range(count):
+                await repository_outbox.enqueue_email(
+                    f"user{i}@example.com",
+                    "Confirm your email ",
+                    "email_templates.html",
+                    {"host": "http://test/", "username": f"user{i}", "token": "t"},
+                    db,
+                )
+            await db.commit()
+
+    async def stored(self):
+        async with self.session_local() as db:
+            result = await db.execute(select(EmailOutbox).order_by(EmailOutbox.id))
+            return result.scalars().all()
+
+    async def test_sends_pending_emails_once(self):
+        await self.enqueue(3)
+
+        self.assertEqual(await self.worker.run_once(), 3)
+        self.assertEqual(await self.worker.run_once(), 0)
+
+        self.assertEqual(
+            sorted(self.inbox.recipients), [f"user{i}@example.com" for i in range(3)]
+        )
+        emails = await self.stored()
+        self.assertEqual({email.status for email in emails}, {EmailStatus.sent})
+        self.assertTrue(all(email.sent_at for email in emails))
+
+    async def test_failures_back_off_then_dead_letter(self):
+        await self.enqueue(1)
+        self.controller.stop()
+
+        self.assertEqual(await self.worker.run_once(), 1)
+        (email,) = await self.stored()
+        self.assertEqual(email.status, EmailStatus.pending)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("Error connecting", email.last_error)
+        delay = (email.next_attempt_at - datetime.utcnow()).total_seconds()
+        self.assertAlmostEqual(delay, self.worker.retry_delay, delta=5)
+        # not due yet
+        self.assertEqual(await self.worker.run_once(), 0)
+
+        self.worker.retry_delay = 0
+        async with self.session_local() as db:
+            await repository_outbox.mark_failed(email, "retry now", 2, 0, db)
+        self.assertEqual(await self.worker.run_once(), 1)
+        (email,) = await self.stored()
+        self.assertEqual(email.status, EmailStatus.dead)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(await self.worker.run_once(), 0)
+        self.controller = Controller(
+            self.inbox, hostname="127.0.0.1", port=self.config.MAIL_PORT
+        )
+        self.controller.start()
+
+    async def test_claimed_emails_are_leased(self):
+        await self.enqueue(2)
+
+        async with self.session_local() as db:
+            claimed = await repository_outbox.claim_emails(10, 0, 3, db)
+            self.assertEqual(len(claimed), 2)
+            # a worker that died leaves them pending, they are claimed again once the lease ran out
+            reclaimed = await repository_outbox.claim_emails(10, 300, 3, db)
+            self.assertEqual([email.attempts for email in reclaimed], [2, 2])
+            self.assertEqual(await repository_outbox.claim_emails(10, 300, 3, db), [])
+
+    async def test_expired_lease_after_last_attempt_is_dead_lettered(self):
+        await self.enqueue(1)
+
+        async with self.session_local() as db:
+            # every worker that claims it crashes before reporting back
+            for _ in range(2):
+                self.assertEqual(
+                    len(await repository_outbox.claim_emails(10, 0, 2, db)), 1
+                )
+            self.assertEqual(await repository_outbox.claim_emails(10, 0, 2, db), [])
+
+        (email,) = await self.stored()
+        self.assertEqual(email.status, EmailStatus.dead)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(email.last_error, repository_outbox.LEASE_EXPIRED)
+
+    async def test_database_errors_are_logged(self):
+        self.worker.poll_interval = 0.01
+        with patch.object(
+            self.worker, "run_once", side_effect=OperationalError("SELECT", {}, None)
+        ), self.assertLogs("pyweb_team7_project.services.outbox", "ERROR") as logs:
+            task = asyncio.create_task(self.worker.run())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertIn("Email outbox round failed", logs.output[0])
+        self.assertIn("OperationalError", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,109 +1,53 @@
 import unittest
 from unittest.mock import patch
-from fastapi_mail import MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 
-from pathlib import Path
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
-from pyweb_team7_project.services.email import send_email
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import EmailOutbox, User
+from pyweb_team7_project.repository import users as repository_users
+from pyweb_team7_project.schemas import UserModel
+from pyweb_team7_project.services.email import queue_email
 
 
-class TestSendEmail(unittest.TestCase):
-    @patch("pyweb_team7_project.services.auth.auth_service.create_email_token")
-    @patch("fastapi_mail.FastMail")
-    async def test_send_email_success(self, mock_fm, mock_create_email_token):
-        # Mock the necessary objects and methods
-        email = "test@example.com"
-        username = "test_user"
-        host = "example.com"
-        token_verification = "test_token"
+class TestQueueEmail(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        session.add(User(username="taken", email="taken@example.com", password="x"))
 
-        # Configure the mock objects
-        mock_create_email_token.return_value = token_verification
+    async def signup(self, username, email):
+        body = UserModel(username=username, email=email, password="password")
+        async with self.session_local() as db:
+            await queue_email(body.email, body.username, "http://test/", db)
+            return await repository_users.create_user(body, db)
 
-        # Call the function being tested
-        await send_email(email, username, host)
+    async def outbox(self):
+        async with self.session_local() as db:
+            result = await db.execute(select(EmailOutbox))
+            return result.scalars().all()
 
-        # Assertions
-        mock_create_email_token.assert_called_once_with({"sub": email})
-        mock_fm.assert_called_once_with(
-            ConnectionConfig(
-                MAIL_USERNAME="test_mail_username",
-                MAIL_PASSWORD="test_mail_password",
-                MAIL_FROM="test_mail_from",
-                MAIL_PORT="test_mail_port",
-                MAIL_SERVER="test_mail_server",
-                MAIL_FROM_NAME="John Snow",
-                MAIL_STARTTLS=False,
-                MAIL_SSL_TLS=True,
-                USE_CREDENTIALS=True,
-                VALIDATE_CERTS=True,
-                TEMPLATE_FOLDER=Path(__file__).parent.parent / "templates",
-            )
-        )
-        mock_fm.return_value.send_message.assert_called_once_with(
-            MessageSchema(
-                subject="Confirm your email",
-                recipients=[email],
-                template_body={
-                    "host": host,
-                    "username": username,
-                    "token": token_verification,
-                },
-                subtype=MessageType.html,
-            ),
-            template_name="email_templates.html",
-        )
+    @patch("pyweb_team7_project.repository.users.Gravatar")
+    async def test_committed_with_user(self, mock_gravatar):
+        mock_gravatar.return_value.get_image.return_value = "avatar"
 
-    @patch("pyweb_team7_project.services.auth.auth_service.create_email_token")
-    @patch("fastapi_mail.FastMail")
-    async def test_send_email_connection_error(self, mock_fm, mock_create_email_token):
-        # Mock the necessary objects and methods
-        email = "test@example.com"
-        username = "test_user"
-        host = "example.com"
+        user = await self.signup("newcomer", "new@example.com")
 
-        # Configure the mock objects
-        mock_create_email_token.side_effect = ConnectionErrors(
-            "Mocked connection error"
-        )
+        emails = await self.outbox()
+        self.assertEqual([email.recipient for email in emails], [user.email])
+        self.assertEqual(emails[0].template_body["username"], "newcomer")
+        self.assertEqual(emails[0].template_body["host"], "http://test/")
 
-        # Call the function being tested
-        await send_email(email, username, host)
+    @patch("pyweb_team7_project.repository.users.Gravatar")
+    async def test_rolled_back_with_user(self, mock_gravatar):
+        mock_gravatar.return_value.get_image.return_value = "avatar"
 
-        # Assertions
-        mock_create_email_token.assert_called_once_with({"sub": email})
-        mock_fm.assert_not_called()
+        with self.assertRaises(IntegrityError):
+            await self.signup("taken", "other@example.com")
 
-    @patch("pyweb_team7_project.services.auth.auth_service.create_email_token")
-    @patch("fastapi_mail.FastMail")
-    async def test_send_email_empty_email(self, mock_fm, mock_create_email_token):
-        # Mock the necessary objects and methods
-        email = ""
-        username = "test_user"
-        host = "example.com"
-
-        # Call the function being tested
-        await send_email(email, username, host)
-
-        # Assertions
-        mock_create_email_token.assert_not_called()
-        mock_fm.assert_not_called()
-
-    @patch("pyweb_team7_project.services.auth.auth_service.create_email_token")
-    @patch("fastapi_mail.FastMail")
-    async def test_send_email_invalid_email(self, mock_fm, mock_create_email_token):
-        # Mock the necessary objects and methods
-        email = "invalid_email"
-        username = "test_user"
-        host = "example.com"
-
-        # Call the function being tested
-        await send_email(email, username, host)
-
-        # Assertions
-        mock_create_email_token.assert_not_called()
-        mock_fm.assert_not_called()
+        self.assertEqual(await self.outbox(), [])
+        async with self.session_local() as db:
+            self.assertEqual(await db.scalar(select(func.count(User.id))), 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import unittest
+from itertools import count
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import User, Image
+from pyweb_team7_project.repository import images as repository_images
+
+
+class TestImageDedup(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        session.add(User(username="first", email="first@example.com", password="x"))
+        session.add(User(username="second", email="second@example.com", password="x"))
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        # stands in for Cloudinary, every upload gets a new public_id
+        ids = count(1)
+        self.storage = MagicMock()
+        self.storage.upload = AsyncMock(
+            side_effect=lambda *args, **kwargs: {
+                "public_id": f"asset{(n := next(ids))}",
+                "secure_url": f"https://cdn.example.com/asset{n}",
+            }
+        )
+        self.storage.delete = AsyncMock()
+        self.storage.url = lambda public_id: f"https://cdn.example.com/{public_id}"
+        patcher = patch.object(repository_images, "storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def create(self, user_id, data: bytes):
+        file = UploadFile(filename="photo.jpg", file=io.BytesIO(data))
+        async with self.session_local() as db:
+            return await repository_images.create_image_and_upload_to_cloudinary(
+                db, file, "photo", user_id
+            )
+
+    async def delete(self, user_id, image_id):
+        async with self.session_local() as db:
+            user = await db.get(User, user_id)
+            await repository_images.delete_image(user, db, image_id)
+
+    async def test_duplicate_reuses_file(self):
+        first = await self.create(1, b"photo")
+        again = await self.create(2, b"photo")
+        other = await self.create(1, b"other photo")
+
+        self.assertEqual(self.storage.upload.await_count, 2)
+        self.assertEqual(first.public_id, again.public_id)
+        self.assertNotEqual(first.id, again.id)
+        self.assertEqual(again.file_url, "https://cdn.example.com/asset1")
+        self.assertEqual(first.content_hash, hashlib.sha256(b"photo").hexdigest())
+        self.assertNotEqual(other.public_id, first.public_id)
+
+    async def test_streamed_duplicate_drops_new_copy(self):
+        first = await self.create(1, b"photo")
+
+        async with self.session_local() as db:
+            streamed = await repository_images.create_image_from_upload(
+                db,
+                {"public_id": "streamed", "secure_url": "https://cdn/streamed"},
+                description="streamed",
+                user_id=2,
+                content_hash=first.content_hash,
+            )
+
+        self.assertEqual(streamed.public_id, first.public_id)
+        self.storage.delete.assert_awaited_once_with("streamed")
+
+    async def test_failed_delete_is_logged(self):
+        first = await self.create(1, b"photo")
+        self.storage.delete.side_effect = OSError("storage is down")
+
+        with self.assertLogs(repository_images.logger, "WARNING") as logs:
+            async with self.session_local() as db:
+                await repository_images.create_image_from_upload(
+                    db,
+                    {"public_id": "streamed", "secure_url": "https://cdn/streamed"},
+                    description="streamed",
+                    user_id=2,
+                    content_hash=first.content_hash,
+                )
+            await self.delete(1, first.id)
+            await self.delete(2, first.id + 1)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("streamed", logs.output[0])
+        self.assertIn(first.public_id, logs.output[1])
+
+    async def test_delete_keeps_shared_file(self):
+        first = await self.create(1, b"photo")
+        again = await self.create(2, b"photo")
+
+        await self.delete(1, first.id)
+        self.storage.delete.assert_not_awaited()
+
+        await self.delete(2, again.id)
+        self.storage.delete.assert_awaited_once_with(first.public_id)
+        async with self.session_local() as db:
+            self.assertEqual((await db.execute(select(Image))).all(), [])
+
+        # the content is uploaded again once no image has it
+        await self.create(1, b"photo")
+        self.assertEqual(self.storage.upload.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
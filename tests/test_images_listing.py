@@ -0,0 +1,132 @@
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi import Response
+from fastapi.dependencies.utils import request_params_to_args
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import Image, Tag, QR_code
+from pyweb_team7_project.repository import images as repository_images
+from pyweb_team7_project.routes.images import (
+    get_all_images,
+    router,
+    NDJSON_MEDIA_TYPE,
+)
+from pyweb_team7_project.schemas import ImageResponse
+from pyweb_team7_project.services.pagination import NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+
+
+class TestImagesListing(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        tags = [Tag(name="sea"), Tag(name="sky")]
+        images = [
+            Image(file_url=f"url_{i}", description=f"image {i}", user_id=1, tags=tags)
+            for i in range(5)
+        ]
+        session.add_all(images)
+        session.flush()
+        session.add_all(
+            [QR_code(url=f"qr_{image.id}", photo_id=image.id) for image in images]
+        )
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.db = self.session_local()
+        self.statements = self.capture_statements()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await super().asyncTearDown()
+
+    def make_request(self, accept="application/json"):
+        request = MagicMock()
+        request.headers = {"accept": accept}
+        return request
+
+    async def test_pages_follow_cursor(self):
+        response = Response()
+        first_page = await get_all_images(
+            self.make_request(), response, limit=3, cursor=None, db=self.db
+        )
+        self.assertEqual([image.id for image in first_page], [1, 2, 3])
+
+        cursor = response.headers[NEXT_CURSOR_HEADER]
+        response = Response()
+        next_page = await get_all_images(
+            self.make_request(), response, limit=3, cursor=cursor, db=self.db
+        )
+        self.assertEqual([image.id for image in next_page], [4, 5])
+        self.assertNotIn(NEXT_CURSOR_HEADER, response.headers)
+
+    def test_limit_is_bounded(self):
+        route = next(r for r in router.routes if r.endpoint is get_all_images)
+        cases = [
+            (1, True),
+            (MAX_PAGE_SIZE, True),
+            (0, False),
+            (MAX_PAGE_SIZE + 1, False),
+        ]
+        for limit, valid in cases:
+            _, errors = request_params_to_args(
+                route.dependant.query_params, {"limit": str(limit)}
+            )
+            self.assertEqual(not errors, valid, limit)
+
+    async def test_ndjson_stream(self):
+        response = await get_all_images(
+            self.make_request(NDJSON_MEDIA_TYPE),
+            Response(),
+            limit=3,
+            cursor=None,
+            db=self.db,
+        )
+        self.assertIsInstance(response, StreamingResponse)
+        self.assertEqual(response.media_type, NDJSON_MEDIA_TYPE)
+
+        lines = [line async for line in response.body_iterator]
+        images = [json.loads(line) for line in lines]
+        self.assertEqual([image["id"] for image in images], [1, 2, 3, 4, 5])
+        self.assertEqual(images[0]["file_url"], "url_0")
+        self.assertEqual(images[0]["tags"], ["sea", "sky"])
+        self.assertEqual(images[0]["qr_code_url"], "qr_1")
+
+    async def test_stream_images_in_small_batches(self):
+        ids = [
+            image.id
+            async for image in repository_images.stream_images(self.db, yield_per=2)
+        ]
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    async def count_list_statements(self, limit):
+        self.statements.clear()
+        images = await repository_images.get_all_images(self.db, limit=limit)
+        serialized = [ImageResponse.model_validate(image) for image in images]
+        self.db.expunge_all()
+        return len(self.statements), serialized
+
+    async def test_list_statements_do_not_grow_with_images(self):
+        few_count, few = await self.count_list_statements(limit=1)
+        many_count, many = await self.count_list_statements(limit=5)
+
+        self.assertEqual(len(few), 1)
+        self.assertEqual(len(many), 5)
+        # images, their tags and their QR codes
+        self.assertEqual(few_count, 3)
+        self.assertEqual(many_count, few_count)
+        self.assertTrue(all(image.tags == ["sea", "sky"] for image in many))
+        self.assertEqual(many[4].qr_code_url, "qr_5")
+
+    async def test_single_image_statements(self):
+        image = await repository_images.get_image_by_id(None, self.db, 2)
+        response = ImageResponse.model_validate(image)
+
+        self.assertEqual(len(self.statements), 3)
+        self.assertEqual(response.tags, ["sea", "sky"])
+        self.assertEqual(response.qr_code_url, "qr_2")
+
+
+if __name__ == "__main__":
+    unittest.main()
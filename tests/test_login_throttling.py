@@ -0,0 +1,169 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+import redis.asyncio as redis
+from fastapi import HTTPException
+
+from pyweb_team7_project.services import auth
+from pyweb_team7_project.services.slots import Slots
+from pyweb_team7_project.services.throttling import (
+    SlidingWindowLimiter,
+    check_login_attempt,
+    clear_login_attempts,
+    login_account_limiter,
+    login_ip_limiter,
+)
+
+
+def make_redis():
+    """
+    Uses the Redis server from TEST_REDIS_URL, e.g. redis://localhost:6379/15, or fakeredis.
+    """
+    url = os.environ.get("TEST_REDIS_URL")
+    if url:
+        return redis.from_url(url, decode_responses=True)
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+class TestSlidingWindowLimiter(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = make_redis()
+        await self.redis.delete("test:login:a", "test:login:b")
+        self.limiter = SlidingWindowLimiter("test:login:", limit=3, window=60)
+        self.limiter.connect(self.redis)
+
+    async def asyncTearDown(self):
+        await self.redis.delete("test:login:a", "test:login:b")
+        await self.redis.close()
+
+    async def test_limit_per_key(self):
+        results = [await self.limiter.hit("a") for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+        self.assertTrue(await self.limiter.hit("b"))
+        self.assertGreater(await self.redis.ttl("test:login:a"), 0)
+
+    async def test_window_slides(self):
+        with patch("pyweb_team7_project.services.throttling.time.time") as clock:
+            for second in (0, 20, 40):
+                clock.return_value = 1000 + second
+                self.assertTrue(await self.limiter.hit("a"))
+            clock.return_value = 1050
+            self.assertFalse(await self.limiter.hit("a"))
+            # the attempt at 1000 left the window, the rejected one at 1050 was not recorded
+            clock.return_value = 1061
+            self.assertTrue(await self.limiter.hit("a"))
+            self.assertFalse(await self.limiter.hit("a"))
+
+    async def test_window_recovers_under_attack(self):
+        allowed = []
+        with patch("pyweb_team7_project.services.throttling.time.time") as clock:
+            # an attacker hits the key every second for three minutes
+            for second in range(180):
+                clock.return_value = 1000 + second
+                if await self.limiter.hit("a"):
+                    allowed.append(second)
+            # the rejected hits were not recorded
+            self.assertEqual(await self.redis.zcard("test:login:a"), 3)
+
+        self.assertEqual(allowed, [0, 1, 2, 60, 61, 62, 120, 121, 122])
+
+    async def test_concurrent_hits_keep_the_limit(self):
+        results = await asyncio.gather(*[self.limiter.hit("a") for _ in range(10)])
+
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(await self.redis.zcard("test:login:a"), 3)
+
+    async def test_reset(self):
+        for _ in range(4):
+            await self.limiter.hit("a")
+
+        await self.limiter.reset("a")
+        self.assertTrue(await self.limiter.hit("a"))
+
+    async def test_disabled_without_redis(self):
+        self.limiter.connect(None)
+        self.assertTrue(all([await self.limiter.hit("a") for _ in range(10)]))
+
+
+class TestCheckLoginAttempt(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        login_account_limiter.connect(self.redis)
+        login_ip_limiter.connect(self.redis)
+
+    async def asyncTearDown(self):
+        login_account_limiter.connect(None)
+        login_ip_limiter.connect(None)
+        await self.redis.close()
+
+    async def test_account_limit_across_addresses(self):
+        for i in range(login_account_limiter.limit):
+            await check_login_attempt("Victim@example.com", f"10.0.0.{i}")
+
+        with self.assertRaises(HTTPException) as context:
+            await check_login_attempt("victim@example.com", "10.0.1.1")
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertIn("Retry-After", context.exception.headers)
+
+    async def test_address_limit_across_accounts(self):
+        for i in range(login_ip_limiter.limit):
+            await check_login_attempt(f"user{i}@example.com", "10.0.0.1")
+
+        with self.assertRaises(HTTPException):
+            await check_login_attempt("other@example.com", "10.0.0.1")
+        await check_login_attempt("other@example.com", "10.0.0.2")
+
+    async def test_login_clears_account_attempts(self):
+        for i in range(login_account_limiter.limit):
+            await check_login_attempt("owner@example.com", f"10.0.0.{i}")
+
+        await clear_login_attempts("Owner@example.com")
+        await check_login_attempt("owner@example.com", "10.0.1.1")
+
+
+class TestPasswordSlots(unittest.IsolatedAsyncioTestCase):
+    async def test_busy_slots_reject_with_503(self):
+        slots = Slots(1)
+        with patch.object(auth, "password_slots", slots), patch.object(
+            auth.settings, "bcrypt_wait_timeout", 0.01
+        ):
+            self.assertTrue(await slots.acquire(1))
+            with self.assertRaises(HTTPException) as context:
+                await auth.run_bcrypt(len, "password")
+            self.assertEqual(context.exception.status_code, 503)
+
+            slots.release()
+            self.assertEqual(await auth.run_bcrypt(len, "password"), 8)
+        self.assertFalse(slots.locked())
+
+
+def test_throttled_login_skips_bcrypt(client, user):
+    server = fakeredis.FakeServer()
+
+    def attempt_login():
+        # TestClient may run every request in a new event loop, a Redis client is bound to one
+        login_account_limiter.connect(
+            fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        )
+        return client.post(
+            "/api/auth/login",
+            data={"username": user.get("email"), "password": "wrong"},
+        ).status_code
+
+    try:
+        with patch.object(
+            auth.auth_service,
+            "verify_and_update_password",
+            wraps=auth.auth_service.verify_and_update_password,
+        ) as verify:
+            codes = [attempt_login() for _ in range(login_account_limiter.limit + 2)]
+    finally:
+        login_account_limiter.connect(None)
+
+    assert codes[-2:] == [429, 429]
+    assert 429 not in codes[: login_account_limiter.limit]
+    assert verify.call_count <= login_account_limiter.limit
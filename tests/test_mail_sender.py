@@ -0,0 +1,177 @@
+import asyncio
+import socket
+import unittest
+from email import message_from_bytes, policy
+from unittest.mock import patch
+
+import aiosmtplib
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig, MessageSchema, MessageType
+
+from pyweb_team7_project.services.email import MailSender, conf
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.peers.add(session.peer)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_message(i):
+    return MessageSchema(
+        subject=f"Message {i}",
+        recipients=[f"user{i}@example.com"],
+        template_body={"host": "http://test/", "username": f"user{i}", "token": "t"},
+        subtype=MessageType.html,
+    )
+
+
+class TestMailSender(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.port = free_port()
+        self.inbox = Inbox()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        config = ConnectionConfig(
+            MAIL_USERNAME="",
+            MAIL_PASSWORD="",
+            MAIL_FROM="sender@example.com",
+            MAIL_PORT=self.port,
+            MAIL_SERVER="127.0.0.1",
+            MAIL_STARTTLS=False,
+            MAIL_SSL_TLS=False,
+            USE_CREDENTIALS=False,
+            VALIDATE_CERTS=False,
+            TEMPLATE_FOLDER=conf.TEMPLATE_FOLDER,
+        )
+        self.sender = MailSender(config, pool_size=2, batch_size=5)
+        await self.sender.start()
+
+    async def asyncTearDown(self):
+        await self.sender.stop()
+        self.controller.stop()
+
+    async def send(self, count, offset=0):
+        for i in range(offset, offset + count):
+            await self.sender.send_message(
+                make_message(i), template_name="email_templates.html"
+            )
+        await self.sender.queue.join()
+
+    async def test_messages_share_pooled_connections(self):
+        await self.send(20)
+
+        self.assertEqual(len(self.inbox.messages), 20)
+        self.assertLessEqual(len(self.inbox.peers), 2)
+        self.assertEqual(self.sender.stats()["connections"], len(self.inbox.peers))
+        envelope = next(
+            envelope
+            for envelope in self.inbox.messages
+            if envelope.rcpt_tos == ["user7@example.com"]
+        )
+        sent = message_from_bytes(envelope.content, policy=policy.default)
+        self.assertEqual(sent["Subject"], "Message 7")
+        self.assertEqual(sent["To"], "user7@example.com")
+        self.assertIsNotNone(sent["Message-ID"])
+        self.assertIn("Hi user7", sent.get_body(("html",)).get_content())
+
+    async def test_render_headers_and_alternative(self):
+        mime = await self.sender.render(
+            MessageSchema(
+                subject="Both",
+                recipients=["to@example.com"],
+                cc=["cc@example.com"],
+                reply_to=["reply@example.com"],
+                body="<b>Hello</b>",
+                alternative_body="Hello",
+                subtype=MessageType.html,
+                multipart_subtype="alternative",
+                headers={"X-Campaign": "welcome"},
+            )
+        )
+
+        self.assertEqual(mime["From"], "sender@example.com")
+        self.assertEqual(mime["Cc"], "cc@example.com")
+        self.assertEqual(mime["Reply-To"], "reply@example.com")
+        self.assertEqual(mime["X-Campaign"], "welcome")
+        self.assertEqual(mime.get_content_type(), "multipart/alternative")
+        self.assertEqual(mime.get_body(("html",)).get_content(), "<b>Hello</b>\n")
+        self.assertEqual(mime.get_body(("plain",)).get_content(), "Hello\n")
+
+    async def test_reconnects_after_server_restart(self):
+        await self.send(4)
+        self.controller.stop()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+        await self.send(4, offset=4)
+
+        self.assertEqual(len(self.inbox.messages), 8)
+        self.assertEqual(self.sender.stats()["failed"], 0)
+        self.assertGreater(self.sender.stats()["connections"], 1)
+
+    async def test_unreachable_server_counts_failures(self):
+        self.controller.stop()
+
+        with self.assertLogs("pyweb_team7_project.services.email", "ERROR") as logs:
+            await self.send(3)
+
+        self.assertEqual(self.sender.stats()["failed"], 3)
+        self.assertEqual(len(logs.records), 3)
+        self.assertIn("user0@example.com", logs.output[0])
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    async def test_unexpected_error_keeps_worker_alive(self):
+        broken = await self.sender.render(make_message(0))
+        del broken["To"]
+        delivered = asyncio.get_running_loop().create_future()
+        await self.sender.queue.put((broken, delivered))
+
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(delivered, 5)
+        await self.send(4, offset=1)
+
+        self.assertEqual(len(self.inbox.messages), 4)
+        self.assertEqual(self.sender.stats()["failed"], 1)
+        self.assertTrue(all(not worker.done() for worker in self.sender.workers))
+
+    async def test_unexpected_error_is_logged(self):
+        with patch.object(
+            aiosmtplib.SMTP, "send_message", side_effect=RuntimeError("bad message")
+        ), self.assertLogs("pyweb_team7_project.services.email", "ERROR") as logs:
+            await self.send(1)
+
+        self.assertEqual(self.sender.stats()["failed"], 1)
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+    async def test_stop_sends_queued_messages(self):
+        for i in range(6):
+            await self.sender.send_message(
+                MessageSchema(
+                    subject="Plain",
+                    recipients=[f"user{i}@example.com"],
+                    body="Hello",
+                    subtype=MessageType.plain,
+                )
+            )
+        await self.sender.stop()
+
+        self.assertFalse(self.sender.running)
+        self.assertEqual(len(self.inbox.messages), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
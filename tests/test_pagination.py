@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.dependencies.utils import request_params_to_args
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette import status
+
+from conftest import create_seeded_engine
+from pyweb_team7_project.database.models import Comment
+from pyweb_team7_project.repository.comments import get_all_image_comments
+from pyweb_team7_project.routes import comments, tags, users
+from pyweb_team7_project.services.pagination import (
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2023, 11, 17, 22, 22, 53, 247000)
+    cursor = encode_cursor(created_at, 42)
+
+    assert decode_cursor(cursor, datetime.fromisoformat, int) == [created_at, 42]
+
+
+def test_cursor_keeps_zero_microseconds():
+    created_at = datetime(2023, 11, 17, 22, 22, 53)
+    cursor = encode_cursor(created_at, 42)
+
+    assert decode_cursor(cursor, str, int) == ["2023-11-17T22:22:53.000000", 42]
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        comments.get_all_image_comments,
+        tags.read_tags,
+        users.get_all_users,
+    ],
+)
+def test_page_params_are_bounded(endpoint):
+    route = next(
+        r
+        for router in (comments.router, tags.router, users.router)
+        for r in router.routes
+        if r.endpoint is endpoint
+    )
+    cases = [
+        ({"limit": "1"}, True),
+        ({"limit": str(MAX_PAGE_SIZE)}, True),
+        ({"limit": "0"}, False),
+        ({"limit": str(MAX_PAGE_SIZE + 1)}, False),
+        ({"skip": "-1"}, False),
+    ]
+    for params, valid in cases:
+        _, errors = request_params_to_args(route.dependant.query_params, params)
+        assert not errors == valid, params
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not-a-cursor", encode_cursor(1, 2), encode_cursor("x")]
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor, int)
+    assert e.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_read_tags_with_cursor(client):
+    for name in ("cursor_a", "cursor_b", "cursor_c"):
+        client.post("/api/tags/", json={"name": name})
+
+    first_page = client.get("/api/tags/", params={"limit": 2})
+    assert first_page.status_code == status.HTTP_200_OK
+    assert len(first_page.json()) == 2
+    cursor = first_page.headers[NEXT_CURSOR_HEADER]
+
+    next_page = client.get("/api/tags/", params={"limit": 2, "cursor": cursor})
+    assert next_page.status_code == status.HTTP_200_OK
+    assert [tag["name"] for tag in next_page.json()] == ["cursor_c"]
+    assert NEXT_CURSOR_HEADER not in next_page.headers
+
+
+def test_read_tags_with_invalid_cursor(client):
+    response = client.get("/api/tags/", params={"cursor": "broken"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    # the default timestamps, and all comments in one second as CURRENT_TIMESTAMP stored them
+    [None, datetime(2023, 11, 17, 22, 22, 53)],
+)
+def test_image_comments_keyset_pages(tmp_path, created_at):
+    def seed(session):
+        session.add_all(
+            [
+                Comment(content=str(i), image_id=1, created_at=created_at)
+                for i in range(5)
+            ]
+        )
+        session.add(Comment(content="other image", image_id=2))
+
+    async def read_all_pages():
+        async_engine = create_seeded_engine(tmp_path / "comments.db", seed)
+        pages = []
+        async with async_sessionmaker(bind=async_engine)() as db:
+            cursor = None
+            while True:
+                page = await get_all_image_comments(1, 0, 2, db, cursor=cursor)
+                if not page:
+                    break
+                pages.append([comment.content for comment in page])
+                cursor = encode_cursor(page[-1].created_at, page[-1].id)
+        await async_engine.dispose()
+        return pages
+
+    assert asyncio.run(read_all_pages()) == [["0", "1"], ["2", "3"], ["4"]]
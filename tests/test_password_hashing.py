@@ -0,0 +1,67 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from passlib.context import CryptContext
+
+from pyweb_team7_project.services.auth import auth_service
+
+
+def bcrypt_context(rounds):
+    return CryptContext(
+        schemes=["bcrypt"],
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+class TestPasswordHashing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.context = patch.object(auth_service, "pwd_context", bcrypt_context(5))
+        self.context.start()
+
+    async def asyncTearDown(self):
+        self.context.stop()
+
+    async def test_hash_runs_in_pool(self):
+        threads = []
+        original = auth_service.pwd_context.hash
+
+        def hash_(password):
+            threads.append(threading.current_thread().name)
+            return original(password)
+
+        with patch.object(auth_service.pwd_context, "hash", hash_):
+            hashed = await auth_service.hash_password("secret")
+
+        self.assertTrue(threads[0].startswith("bcrypt"))
+        self.assertTrue(hashed.startswith("$2b$05$"))
+
+    async def test_verify_without_update(self):
+        hashed = await auth_service.hash_password("secret")
+
+        self.assertEqual(
+            await auth_service.verify_and_update_password("secret", hashed),
+            (True, None),
+        )
+        self.assertEqual(
+            await auth_service.verify_and_update_password("wrong", hashed),
+            (False, None),
+        )
+
+    async def test_rehash_when_cost_differs(self):
+        for rounds in (4, 6):
+            hashed = bcrypt_context(rounds).hash("secret")
+
+            verified, new_hash = await auth_service.verify_and_update_password(
+                "secret", hashed
+            )
+
+            self.assertTrue(verified)
+            self.assertTrue(new_hash.startswith("$2b$05$"))
+            self.assertTrue(auth_service.verify_password("secret", new_hash))
+
+
+if __name__ == "__main__":
+    unittest.main()
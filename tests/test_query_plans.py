@@ -0,0 +1,91 @@
+import unittest
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import (
+    User,
+    Image,
+    Tag,
+    QR_code,
+    Comment,
+)
+from pyweb_team7_project.repository import comments as repository_comments
+from pyweb_team7_project.repository import images as repository_images
+from pyweb_team7_project.repository import tags as repository_tags
+from pyweb_team7_project.repository import users as repository_users
+
+
+class TestQueryPlans(AsyncDatabaseTestCase):
+    """
+    Runs the repository functions against SQLite, then EXPLAINs every statement they issued
+    and fails if any of them falls back to a full table scan.
+    """
+
+    def seed(self, session: Session) -> None:
+        user = User(username="planner", email="plan@example.com", password="x")
+        image = Image(file_url="url", description="plan", user=user)
+        image.tags.append(Tag(name="plan"))
+        session.add_all([user, image])
+        session.flush()
+        session.add(QR_code(url="qr_url", photo_id=image.id))
+        session.add(Comment(content="plan", user_id=user.id, image_id=image.id))
+        self.image_id = image.id
+        self.user_id = user.id
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.sync_engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(self.sync_engine.dispose)
+        self.statements = []
+        event.listen(
+            self.async_engine.sync_engine,
+            "before_cursor_execute",
+            self.capture_statement,
+        )
+
+    def capture_statement(self, conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            self.statements.append((statement, parameters))
+
+    def assert_no_full_scans(self):
+        self.assertTrue(self.statements)
+        with self.sync_engine.connect() as conn:
+            for statement, parameters in self.statements:
+                plan = conn.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                ).fetchall()
+                for row in plan:
+                    detail = row[-1]
+                    if detail.startswith("SCAN") and "INDEX" not in detail:
+                        self.fail(f"Full scan ({detail}) in: {statement}")
+
+    async def test_get_all_image_comments(self):
+        async with self.session_local() as db:
+            await repository_comments.get_all_image_comments(self.image_id, 0, 10, db)
+        self.assert_no_full_scans()
+
+    async def test_get_QR(self):
+        async with self.session_local() as db:
+            result = await repository_images.get_QR(self.image_id, db)
+        self.assertEqual(result, {"qr_code_url": "qr_url"})
+        self.assert_no_full_scans()
+
+    async def test_delete_image(self):
+        async with self.session_local() as db:
+            user = await db.get(User, self.user_id)
+            await repository_images.delete_image(user, db, self.image_id)
+        self.assert_no_full_scans()
+
+    async def test_lookups_by_key(self):
+        async with self.session_local() as db:
+            await repository_users.get_user_by_email("plan@example.com", db)
+            await repository_images.get_image_by_id(None, db, self.image_id)
+            await repository_comments.get_comment_by_id(1, db)
+            await repository_tags.get_tag(1, db)
+        self.assert_no_full_scans()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import User, RefreshToken
+from pyweb_team7_project.repository import refresh_tokens as repository_tokens
+
+
+class TestRefreshTokens(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        session.add(User(username="device", email="d@example.com", password="x"))
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.expires_at = datetime.utcnow() + timedelta(days=7)
+
+    async def add(self, token, device, expires_at=None):
+        async with self.session_local() as db:
+            await repository_tokens.add_refresh_token(
+                1, token, expires_at or self.expires_at, device, db
+            )
+
+    async def rotate(self, old, new):
+        async with self.session_local() as db:
+            return await repository_tokens.rotate_refresh_token(
+                old, new, self.expires_at, db
+            )
+
+    async def stored(self):
+        async with self.session_local() as db:
+            result = await db.execute(select(RefreshToken).order_by(RefreshToken.id))
+            return result.scalars().all()
+
+    async def test_tokens_stored_hashed_per_device(self):
+        await self.add("phone-token", "phone")
+        await self.add("laptop-token", "laptop")
+
+        tokens = await self.stored()
+        self.assertEqual([token.device for token in tokens], ["phone", "laptop"])
+        self.assertEqual(
+            tokens[0].token_hash, repository_tokens.hash_token("phone-token")
+        )
+        self.assertNotIn("phone-token", [token.token_hash for token in tokens])
+
+    async def test_rotation_is_single_use(self):
+        await self.add("first", "phone")
+        await self.add("other-device", "laptop")
+
+        self.assertEqual(await self.rotate("first", "second"), 1)
+        self.assertEqual(await self.rotate("second", "third"), 1)
+        # the other device is untouched
+        self.assertEqual(await self.rotate("other-device", "laptop-2"), 1)
+
+        tokens = await self.stored()
+        current = [token.device for token in tokens if token.rotated_at is None]
+        self.assertEqual(sorted(current), ["laptop", "phone"])
+
+    async def test_replayed_token_revokes_all_devices(self):
+        await self.add("first", "phone")
+        await self.add("other-device", "laptop")
+        self.assertEqual(await self.rotate("first", "second"), 1)
+
+        # the rotated token comes back, e.g. from whoever stole it
+        self.assertIsNone(await self.rotate("first", "stolen"))
+
+        self.assertEqual(await self.stored(), [])
+        self.assertIsNone(await self.rotate("second", "third"))
+        self.assertIsNone(await self.rotate("other-device", "laptop-2"))
+
+    async def test_concurrent_rotation_has_one_winner(self):
+        await self.add("shared", "phone")
+
+        results = await asyncio.gather(
+            self.rotate("shared", "winner-a"), self.rotate("shared", "winner-b")
+        )
+
+        self.assertEqual(sorted(results, key=str), [1, None])
+
+    async def test_expired_tokens(self):
+        await self.add("old", "phone", expires_at=datetime.utcnow() - timedelta(1))
+
+        self.assertIsNone(await self.rotate("old", "new"))
+        # the next login of the user drops it
+        await self.add("fresh", "phone")
+        self.assertEqual(len(await self.stored()), 1)
+
+    async def test_revoke(self):
+        await self.add("phone-token", "phone")
+        await self.add("laptop-token", "laptop")
+
+        async with self.session_local() as db:
+            await repository_tokens.revoke_refresh_token("phone-token", db)
+        self.assertIsNone(await self.rotate("phone-token", "new"))
+        self.assertEqual(len(await self.stored()), 1)
+
+        async with self.session_local() as db:
+            await repository_tokens.revoke_user_refresh_tokens(1, db)
+        self.assertEqual(await self.stored(), [])
+
+    async def test_purge_expired(self):
+        await self.add("fresh", "laptop")
+        await self.add("old", "phone", expires_at=datetime.utcnow() - timedelta(1))
+        async with self.session_local() as db:
+            db.add(User(username="gone", email="g@example.com", password="x"))
+            await db.commit()
+            await repository_tokens.add_refresh_token(
+                2, "forgotten", datetime.utcnow() - timedelta(1), "phone", db
+            )
+
+        async with self.session_local() as db:
+            self.assertEqual(
+                await repository_tokens.purge_expired_refresh_tokens(db), 2
+            )
+        self.assertEqual([token.device for token in await self.stored()], ["laptop"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,11 @@
 import unittest
 from unittest.mock import MagicMock, patch
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pyweb_team7_project.database.models import User, Role
 from pyweb_team7_project.schemas import UserModel
 from pyweb_team7_project.repository.users import (
     get_user_by_email,
     create_user,
-    update_token,
     confirmed_email,
     get_users,
     make_user_role)
@@ -15,18 +14,20 @@ from pyweb_team7_project.repository.users import (
 class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
 
     async def test_get_user_by_email_found(self):
         email = "test@example.com"
         user_mock = MagicMock(spec=User)
-        self.session.query(User).filter(User.email == email).first.return_value = user_mock
+        self.result.scalars.return_value.first.return_value = user_mock
         result = await get_user_by_email(email=email, db=self.session)
         self.assertEqual(result, user_mock)
 
     async def test_get_user_by_email_not_found(self):
         user_email = "nonexistent@example.com"
-        self.session.query(User).filter(User.email == user_email).first.return_value = None
+        self.result.scalars.return_value.first.return_value = None
         result = await get_user_by_email(email=user_email, db=self.session)
         self.assertIsNone(result)
 
@@ -34,6 +35,7 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
     async def test_create_user(self, mock_gravatar_get_image):
         user_model = UserModel(username="username", email="test@example.com", password="1234565")
         mock_gravatar_get_image.return_value = "mocked_avatar_url"
+        self.session.scalar.return_value = 1
 
         result = await create_user(body=user_model, db=self.session)
 
@@ -42,26 +44,19 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.avatar, "mocked_avatar_url")
         self.assertEqual(result.role, Role.user)
 
-    async def test_update_token(self):
-        user_mock = MagicMock(spec=User)
-        token = "new_token"
-        await update_token(user=user_mock, token=token, db=self.session)
-        self.assertEqual(user_mock.refresh_token, token)
-        self.session.commit.assert_called_once()
-
     async def test_confirmed_email(self):
         user_mock = MagicMock(spec=User)
         email = "test@example.com"
-        self.session.query().filter().first.return_value = user_mock
+        self.result.scalars.return_value.first.return_value = user_mock
         await confirmed_email(email=email, db=self.session)
         self.assertTrue(user_mock.confirmed)
-        self.session.commit.assert_called_once()
+        self.session.commit.assert_awaited_once()
 
     async def test_get_users(self):
         skip = 0
         limit = 10
         users_mock = [MagicMock(spec=User), MagicMock(spec=User)]
-        self.session.query(User).offset(skip).limit(limit).all.return_value = users_mock
+        self.result.scalars.return_value.all.return_value = users_mock
         result = await get_users(skip=skip, limit=limit, db=self.session)
         self.assertEqual(result, users_mock)
 
@@ -69,12 +64,12 @@ class TestUserFunctions(unittest.IsolatedAsyncioTestCase):
         email = "test@example.com"
         role = Role.admin
         user_mock = MagicMock(spec=User)
-        self.session.query().filter().first.return_value = user_mock
+        self.result.scalars.return_value.first.return_value = user_mock
 
         await make_user_role(email=email, role=role, db=self.session)
 
         self.assertEqual(user_mock.role, role)
-        self.session.commit.assert_called_once()
+        self.session.commit.assert_awaited_once()
 
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ from unittest import mock
 import io
 import os
 from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, UploadFile
 from pyweb_team7_project.routes import images
@@ -28,11 +29,12 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     async def test_create_image(
         self, mock_get_db, mock_auth_service, mock_repository_images
     ):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         mock_file = MagicMock(spec=UploadFile)
         mock_response = MagicMock(spec=Image)
 
+        mock_db.execute.return_value = MagicMock()
         mock_get_db.return_value = mock_db
         mock_auth_service.get_current_user.return_value = mock_current_user
         mock_repository_images.create_image_and_upload_to_cloudinary.return_value = mock_response
@@ -71,7 +73,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
         self, mock_get_db, mock_auth_service, mock_repository_images
     ):
         # Test case with edge cases
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         mock_file = MagicMock(spec=UploadFile)
         mock_response = MagicMock(spec=Image)
@@ -101,7 +103,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     @patch("pyweb_team7_project.repository.images.get_image_by_id")
     @patch("pyweb_team7_project.database.db.get_db")
     async def test_get_image_with_valid_id(self, mock_get_db, mock_get_image_by_id):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         description = "Test description"
         user_id = 1
@@ -127,7 +129,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     @patch("pyweb_team7_project.repository.images.get_image_by_id")
     @patch("pyweb_team7_project.database.db.get_db")
     async def test_get_image_with_invalid_id(self, mock_get_db, mock_get_image_by_id):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         description = "Test description"
         user_id = 1
@@ -156,7 +158,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     @patch("pyweb_team7_project.repository.images.delete_image")
     @patch("pyweb_team7_project.database.db.get_db")
     async def test_delete_image(self, mock_delete_image, mock_get_db, mock_get_image_by_id):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         description = "Test description"
         user_id = 2
@@ -201,7 +203,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     @patch("pyweb_team7_project.repository.images.update_image_description")
     @patch("pyweb_team7_project.database.db.get_db")
     async def test_update_image(self, mock_get_db, mock_update_image_description, mock_get_image_by_id):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock(spec=User)
         description = "Test description"
         new_description = "Test description created with new description"
@@ -256,7 +258,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
 #     @patch("pyweb_team7_project.database.db.get_db")
 #     async def test_get_all_images(self, mock_get_db):
 #         mock_response = [{"image_id": 1, "url": "example.com/image1.jpg"}, {"image_id": 2, "url": "example.com/image2.jpg"}]
-#         mock_db = MagicMock(spec=Session)
+#         mock_db = MagicMock(spec=AsyncSession)
 #         with mock.patch("pyweb_team7_project.routes.images.get_all_images", return_value=mock_response):
 #             response = await get_all_images(db=mock_db)
 #             self.assertIsNotNone(response)
@@ -265,20 +267,20 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
    
 class TestTransformationsAutoColor(unittest.IsolatedAsyncioTestCase):
 
-    @patch('pyweb_team7_project.routes.images.cloudinary.config')
-    @patch('pyweb_team7_project.routes.images.cloudinary.CloudinaryImage.image')
-    async def test_transformations_grayscale(self, mock_image, mock_config):
+    @patch('pyweb_team7_project.routes.images.storage.transform_url')
+    async def test_transformations_grayscale(self, mock_image):
         # Створюємо тестовий об'єкт Image
         test_image = Image(id=1, public_id='test_public_id', user_id=1)
         test_image.fileurl = 'test_url'
         
         # Створюємо mock-об'єкти для db і current_user
-        mock_db = MagicMock()
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock()
 
         # Встановлюємо поведінку mock-об'єктів
-        mock_db.return_value = test_image
-        mock_image.return_value = 'Transformed HTML string'
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = test_image
+        mock_image.return_value = 'https://example.com/transformed.jpg'
 
         # Викликаємо функцію
         result_image = await transformations_auto_color(1, mock_current_user, mock_db)
@@ -286,20 +288,20 @@ class TestTransformationsAutoColor(unittest.IsolatedAsyncioTestCase):
 
 class TestTransformationsGrayscale(unittest.IsolatedAsyncioTestCase):
 
-    @patch('pyweb_team7_project.routes.images.cloudinary.config')
-    @patch('pyweb_team7_project.routes.images.cloudinary.CloudinaryImage.image')
-    async def test_transformations_grayscale(self, mock_image, mock_config):
+    @patch('pyweb_team7_project.routes.images.storage.transform_url')
+    async def test_transformations_grayscale(self, mock_image):
         # Створюємо тестовий об'єкт Image
         test_image = Image(id=1, public_id='test_public_id', user_id=1)
         test_image.fileurl = 'test_url'
         
         # Створюємо mock-об'єкти для db і current_user
-        mock_db = MagicMock()
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock()
 
         # Встановлюємо поведінку mock-об'єктів
-        mock_db.return_value = test_image
-        mock_image.return_value = 'Transformed HTML string'
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = test_image
+        mock_image.return_value = 'https://example.com/transformed.jpg'
 
         # Викликаємо функцію
         result_image = await transformations_grayscale(1, mock_current_user, mock_db)
@@ -309,20 +311,20 @@ class TestTransformationsGrayscale(unittest.IsolatedAsyncioTestCase):
 
 class TestTransformationsSepia(unittest.IsolatedAsyncioTestCase):
 
-    @patch('pyweb_team7_project.routes.images.cloudinary.config')
-    @patch('pyweb_team7_project.routes.images.cloudinary.CloudinaryImage.image')
-    async def transformations_sepia(self, mock_image, mock_config):
+    @patch('pyweb_team7_project.routes.images.storage.transform_url')
+    async def transformations_sepia(self, mock_image):
         # Створюємо тестовий об'єкт Image
         test_image = Image(id=1, public_id='test_public_id', user_id=1)
         test_image.fileurl = 'test_url'
         
         # Створюємо mock-об'єкти для db і current_user
-        mock_db = MagicMock()
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock()
 
         # Встановлюємо поведінку mock-об'єктів
-        mock_db.return_value = test_image
-        mock_image.return_value = 'Transformed HTML string'
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = test_image
+        mock_image.return_value = 'https://example.com/transformed.jpg'
 
         # Викликаємо функцію
         result_image = await transformations_sepia(1, mock_current_user, mock_db)
@@ -330,20 +332,20 @@ class TestTransformationsSepia(unittest.IsolatedAsyncioTestCase):
 
 class TestTransformationsBlur(unittest.IsolatedAsyncioTestCase):
 
-    @patch('pyweb_team7_project.routes.images.cloudinary.config')
-    @patch('pyweb_team7_project.routes.images.cloudinary.CloudinaryImage.image')
-    async def transformations_blur(self, mock_image, mock_config):
+    @patch('pyweb_team7_project.routes.images.storage.transform_url')
+    async def transformations_blur(self, mock_image):
         # Створюємо тестовий об'єкт Image
         test_image = Image(id=1, public_id='test_public_id', user_id=1)
         test_image.fileurl = 'test_url'
         
         # Створюємо mock-об'єкти для db і current_user
-        mock_db = MagicMock()
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock()
 
         # Встановлюємо поведінку mock-об'єктів
-        mock_db.return_value = test_image
-        mock_image.return_value = 'Transformed HTML string'
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = test_image
+        mock_image.return_value = 'https://example.com/transformed.jpg'
 
         # Викликаємо функцію
         result_image = await transformations_blur(1, mock_current_user, mock_db)
@@ -352,20 +354,20 @@ class TestTransformationsBlur(unittest.IsolatedAsyncioTestCase):
 
 class TestTransformationsBrownOutline(unittest.IsolatedAsyncioTestCase):
 
-    @patch('pyweb_team7_project.routes.images.cloudinary.config')
-    @patch('pyweb_team7_project.routes.images.cloudinary.CloudinaryImage.image')
-    async def transformations_brown_outline(self, mock_image, mock_config):
+    @patch('pyweb_team7_project.routes.images.storage.transform_url')
+    async def transformations_brown_outline(self, mock_image):
         # Створюємо тестовий об'єкт Image
         test_image = Image(id=1, public_id='test_public_id', user_id=1)
         test_image.fileurl = 'test_url'
         
         # Створюємо mock-об'єкти для db і current_user
-        mock_db = MagicMock()
+        mock_db = MagicMock(spec=AsyncSession)
         mock_current_user = MagicMock()
 
         # Встановлюємо поведінку mock-об'єктів
-        mock_db.return_value = test_image
-        mock_image.return_value = 'Transformed HTML string'
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = test_image
+        mock_image.return_value = 'https://example.com/transformed.jpg'
 
         # Викликаємо функцію
         result_image = await transformations_brown_outline(1, mock_current_user, mock_db)
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from pyweb_team7_project.services.slots import Slots
+
+
+class TestSlots(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.slots = Slots(1)
+
+    async def test_created_on_first_use(self):
+        self.assertIsNone(self.slots.semaphore)
+        self.assertFalse(self.slots.locked())
+
+        self.assertTrue(await self.slots.acquire(1))
+        self.assertTrue(self.slots.locked())
+        self.slots.release()
+        self.assertFalse(self.slots.locked())
+
+    async def test_timeout(self):
+        await self.slots.acquire(1)
+
+        self.assertFalse(await self.slots.acquire(0.01))
+        self.slots.release()
+        self.assertFalse(self.slots.locked())
+
+    async def test_cancelled_while_waiting(self):
+        await self.slots.acquire(1)
+        waiter = asyncio.create_task(self.slots.acquire(5))
+        await asyncio.sleep(0.01)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.slots.release()
+        self.assertFalse(self.slots.locked())
+
+    async def test_cancelled_as_slot_is_handed_over(self):
+        await self.slots.acquire(1)
+        waiter = asyncio.create_task(self.slots.acquire(5))
+        await asyncio.sleep(0.01)
+
+        # the slot goes to the waiter, which is cancelled before it runs again
+        self.slots.release()
+        waiter.cancel()
+        try:
+            acquired = await waiter
+        except asyncio.CancelledError:
+            acquired = False
+        if acquired:
+            self.slots.release()
+        self.assertFalse(self.slots.locked())
+
+    async def test_taken_slot_given_back_when_wait_ends_anyway(self):
+        # asyncio.wait_for may raise after the acquire went through, e.g. on Python 3.10
+        for error in (asyncio.CancelledError, asyncio.TimeoutError):
+
+            async def acquire_then_raise(awaitable, timeout):
+                await awaitable
+                raise error
+
+            with patch(
+                "pyweb_team7_project.services.slots.asyncio.wait_for",
+                acquire_then_raise,
+            ):
+                if error is asyncio.CancelledError:
+                    with self.assertRaises(asyncio.CancelledError):
+                        await self.slots.acquire(1)
+                else:
+                    self.assertFalse(await self.slots.acquire(1))
+            self.assertFalse(self.slots.locked(), error)
+
+    async def test_start_frees_every_slot(self):
+        await self.slots.acquire(1)
+
+        self.slots.start()
+        self.assertFalse(self.slots.locked())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.conf.config import settings
+from pyweb_team7_project.database.models import Role, User
+from pyweb_team7_project.services.auth import auth_service
+from pyweb_team7_project.services.cache import token_versions
+from pyweb_team7_project.services.roles import admin, free_access
+
+
+class TestStatelessAuth(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        token_versions.connect(self.redis)
+        self.stateless = patch.object(settings, "auth_stateless", True)
+        self.stateless.start()
+        self.user = User(id=7, email="claims@example.com", role=Role.user)
+        self.db = MagicMock(spec=AsyncSession)
+
+    async def asyncTearDown(self):
+        self.stateless.stop()
+        token_versions.connect(None)
+        await self.redis.close()
+
+    def claims(self, token):
+        return jwt.decode(
+            token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM]
+        )
+
+    async def test_token_carries_claims_and_short_ttl(self):
+        token = await auth_service.create_user_access_token(
+            self.user, expires_delta=3600
+        )
+
+        claims = self.claims(token)
+        self.assertEqual((claims["uid"], claims["role"], claims["ver"]), (7, "user", 0))
+        self.assertLessEqual(
+            claims["exp"] - claims["iat"], settings.auth_stateless_token_ttl
+        )
+
+    async def test_role_from_claims_without_queries(self):
+        token = await auth_service.create_user_access_token(self.user)
+
+        role = await auth_service.get_current_role(token, self.db)
+        await free_access(None, role)
+
+        self.assertEqual(role, Role.user)
+        self.db.execute.assert_not_called()
+        with self.assertRaises(HTTPException) as context:
+            await admin(None, role)
+        self.assertEqual(context.exception.status_code, 403)
+
+    async def test_bumped_version_revokes_token(self):
+        token = await auth_service.create_user_access_token(self.user)
+        await token_versions.bump(self.user.id)
+
+        with self.assertRaises(HTTPException) as context:
+            await auth_service.get_current_role(token, self.db)
+        self.assertEqual(context.exception.status_code, 401)
+
+        token = await auth_service.create_user_access_token(self.user)
+        self.assertEqual(self.claims(token)["ver"], 1)
+        self.assertEqual(await auth_service.get_current_role(token, self.db), Role.user)
+
+    async def test_token_without_claims_falls_back_to_user(self):
+        token = await auth_service.create_access_token(data={"sub": self.user.email})
+        self.user.role = Role.admin
+        with patch.object(
+            auth_service, "get_current_user", AsyncMock(return_value=self.user)
+        ) as get_current_user:
+            role = await auth_service.get_current_role(token, self.db)
+
+        self.assertEqual(role, Role.admin)
+        get_current_user.assert_awaited_once()
+
+    async def test_disabled_mode_uses_user(self):
+        self.stateless.stop()
+        self.stateless = patch.object(settings, "auth_stateless", False)
+        self.stateless.start()
+        token = await auth_service.create_user_access_token(self.user)
+        self.assertNotIn("role", self.claims(token))
+
+        with patch.object(
+            auth_service, "get_current_user", AsyncMock(return_value=self.user)
+        ):
+            role = await auth_service.get_current_role(token, self.db)
+        self.assertEqual(role, Role.user)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import User, Image, Tag, Comment
+from pyweb_team7_project.repository import comments as repository_comments
+from pyweb_team7_project.repository import images as repository_images
+from pyweb_team7_project.repository import tags as repository_tags
+from pyweb_team7_project.repository import users as repository_users
+
+
+class TestStatementCache(AsyncDatabaseTestCase):
+    """
+    The per-request lookups must reuse their compiled SQL when called with other keys.
+    """
+
+    def seed(self, session: Session) -> None:
+        for i in (1, 2):
+            user = User(username=f"user{i}", email=f"user{i}@example.com", password="x")
+            image = Image(file_url=f"url{i}", description=f"image{i}", user=user)
+            image.tags.append(Tag(name=f"tag{i}"))
+            session.add(image)
+            session.flush()
+            session.add(
+                Comment(content=f"comment{i}", user_id=user.id, image_id=image.id)
+            )
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.cache_stats = []
+        event.listen(
+            self.async_engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, params, context, many: (
+                self.cache_stats.append(context.cache_hit)
+            ),
+        )
+
+    async def lookup(self, i):
+        async with self.session_local() as db:
+            user = await repository_users.get_user_by_email(f"user{i}@example.com", db)
+            image = await repository_images.get_image_by_id(None, db, i)
+            comment = await repository_comments.get_comment_by_id(i, db)
+            tag = await repository_tags.get_tag(i, db)
+        return user.username, image.description, comment.content, tag.name
+
+    async def test_lookups_reuse_compiled_statements(self):
+        first = await self.lookup(1)
+        self.cache_stats.clear()
+        second = await self.lookup(2)
+
+        self.assertEqual(first, ("user1", "image1", "comment1", "tag1"))
+        self.assertEqual(second, ("user2", "image2", "comment2", "tag2"))
+        self.assertTrue(self.cache_stats)
+        self.assertTrue(all(stat is CacheStats.CACHE_HIT for stat in self.cache_stats))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.database.models import Image, User
+
+from pyweb_team7_project.routes.images import transform_image
+from pyweb_team7_project.services import storage as storage_module
+from pyweb_team7_project.services.storage import CloudinaryStorage, LocalStorage
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.tmp_dir.name, "http://test/api/storage/")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def files(self):
+        return [
+            name
+            for _, _, names in os.walk(self.tmp_dir.name)
+            for name in names
+            if not name.startswith(".")
+        ]
+
+    async def test_content_addressed(self):
+        first = await self.storage.upload(io.BytesIO(b"image"), filename="a.JPG")
+        again = await self.storage.upload(b"image", filename="b.jpg")
+        other = await self.storage.upload(b"other image")
+
+        self.assertEqual(first["public_id"], again["public_id"])
+        self.assertTrue(first["public_id"].endswith(".jpg"))
+        self.assertNotEqual(first["public_id"], other["public_id"])
+        self.assertEqual(len(self.files()), 2)
+        self.assertEqual(
+            first["secure_url"], f"http://test/api/storage/{first['public_id']}"
+        )
+        with open(self.storage.path(first["public_id"]), "rb") as f:
+            self.assertEqual(f.read(), b"image")
+
+    async def test_upload_from_path_and_delete(self):
+        path = os.path.join(self.tmp_dir.name, "qr.png")
+        with open(path, "wb") as f:
+            f.write(b"qr code")
+
+        result = await self.storage.upload(path, public_id="Qr_Code/Photo_1")
+        os.remove(path)
+        self.assertTrue(result["public_id"].endswith(".png"))
+
+        await self.storage.delete(result["public_id"])
+        await self.storage.delete(result["public_id"])
+        self.assertEqual(self.files(), [])
+
+    async def test_paths_stay_inside_root(self):
+        self.assertIsNone(self.storage.path("../outside"))
+        self.assertIsNone(self.storage.path("/etc/passwd"))
+        self.assertIsNone(self.storage.path(""))
+        self.assertIsNone(self.storage.transform_url("ab/cd/abcd", "grayscale"))
+
+
+class TestCloudinaryStorage(unittest.TestCase):
+    def test_transform_url(self):
+        url = CloudinaryStorage().transform_url("sample", "grayscale")
+        self.assertTrue(url.startswith("https://"))
+        self.assertIn("/e_grayscale/sample", url)
+
+
+def test_read_file(client):
+    result = asyncio.run(
+        storage_module.storage.upload(b"x" * 200_000, filename="a.png")
+    )
+
+    response = client.get(f"/api/storage/{result['public_id']}")
+
+    assert response.status_code == 200
+    assert response.content == b"x" * 200_000
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_read_file_not_found(client):
+    assert client.get("/api/storage/ab/cd/missing.png").status_code == 404
+    assert client.get("/api/storage/..%2F..%2Fmain.py").status_code == 404
+
+
+def test_transform_not_supported_by_local_storage():
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = Image(
+        id=1, public_id="ab/cd/abcd", user_id=1
+    )
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(transform_image(1, User(id=1), db, "grayscale"))
+    assert e.value.status_code == 400
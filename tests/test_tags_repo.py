@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pyweb_team7_project.database.models import Tag
 from pyweb_team7_project.schemas import TagModel, TagResponse
 from pyweb_team7_project.repository import tags as repository_tags
@@ -14,8 +14,9 @@ async def test_get_tags():
     skip = 0
     limit = 10
     tags = [Tag(name="Tag 1", id=1), Tag(name="Tag 2", id=2), Tag(name="Tag 3", id=3)]
-    db = MagicMock(spec=Session)
-    db.query.return_value.offset.return_value.limit.return_value.all.return_value = tags
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = tags
 
     # Act
     result = await repository_tags.get_tags(skip, limit, db)
@@ -28,17 +29,15 @@ async def test_get_tags():
     assert result[1]["id"] == 2
     assert result[2]["name"] == "Tag 3"
     assert result[2]["id"] == 3
-    db.query.assert_called_once_with(Tag)
-    db.query.return_value.offset.assert_called_once_with(skip)
-    db.query.return_value.offset.return_value.limit.assert_called_once_with(limit)
-    db.query.return_value.offset.return_value.limit.return_value.all.assert_called_once()
+    db.execute.assert_awaited_once()
+    db.execute.return_value.scalars.return_value.all.assert_called_once()
 
 
 @pytest.mark.asyncio
 async def test_create_tag():
     # Arrange
     body = TagModel(name="New Tag")
-    db = MagicMock(spec=Session)
+    db = MagicMock(spec=AsyncSession)
     db.commit.return_value = None
     db.refresh.return_value = None
 
@@ -64,8 +63,9 @@ async def test_update_tag():
     tag_id = 1
     body = TagModel(name="Updated Tag")
     updated_tag = Tag(name=body.name, id=tag_id)
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = updated_tag
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = updated_tag
     db.commit.return_value = None
 
     # Act
@@ -73,12 +73,9 @@ async def test_update_tag():
 
     # Assert
     assert result == updated_tag
-    db.query.assert_called_once()
-    db.query.return_value.filter.assert_called_once_with(
-        mock.ANY
-    )  # Использование mock.ANY
-    db.query.return_value.filter.return_value.first.assert_called_once()
-    db.commit.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)  # Использование mock.ANY
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
+    db.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -86,8 +83,9 @@ async def test_remove_tag():
     # Arrange
     tag_id = 1
     tag = Tag(name="Tag 1", id=tag_id)
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = tag
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = tag
     db.commit.return_value = None
 
     # Act
@@ -95,10 +93,9 @@ async def test_remove_tag():
 
     # Assert
     assert result == tag
-    db.query.assert_called_once()
-    db.query.return_value.filter.assert_called_once_with(mock.ANY)
-    db.query.return_value.filter.return_value.first.assert_called_once()
-    db.commit.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
+    db.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -106,8 +103,9 @@ async def test_get_tag():
     # Arrange
     tag_id = 1
     tag = Tag(name="Tag 1", id=tag_id)
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = tag
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = tag
 
     # Act
     result = await repository_tags.get_tag(tag_id, db)
@@ -115,26 +113,25 @@ async def test_get_tag():
     # Assert
     assert result.id == tag_id
     assert result.name == "Tag 1"
-    db.query.assert_called_once_with(Tag)
-    db.query.return_value.filter.assert_called_once_with(mock.ANY)
-    db.query.return_value.filter.return_value.first.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
 
 
 @pytest.mark.asyncio
 async def test_get_tag_not_found():
     # Arrange
     tag_id = 1
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = None
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = None
 
     # Act
     result = await repository_tags.get_tag(tag_id, db)
 
     # Assert
     assert result is None
-    db.query.assert_called_once_with(Tag)
-    db.query.return_value.filter.assert_called_once_with(mock.ANY)
-    db.query.return_value.filter.return_value.first.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
 
 
 @pytest.mark.asyncio
@@ -142,17 +139,17 @@ async def test_update_tag_not_found():
     # Arrange
     tag_id = 1
     body = TagModel(name="Updated Tag")
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = None
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = None
 
     # Act
     result = await repository_tags.update_tag(tag_id, body, db)
 
     # Assert
     assert result is None
-    db.query.assert_called_once()
-    db.query.return_value.filter.assert_called_once_with(mock.ANY)
-    db.query.return_value.filter.return_value.first.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
     db.commit.assert_not_called()
 
 
@@ -160,17 +157,17 @@ async def test_update_tag_not_found():
 async def test_remove_tag_not_found():
     # Arrange
     tag_id = 1
-    db = MagicMock(spec=Session)
-    db.query.return_value.filter.return_value.first.return_value = None
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    db.execute.return_value.scalars.return_value.first.return_value = None
 
     # Act
     result = await repository_tags.remove_tag(tag_id, db)
 
     # Assert
     assert result is None
-    db.query.assert_called_once()
-    db.query.return_value.filter.assert_called_once_with(mock.ANY)
-    db.query.return_value.filter.return_value.first.assert_called_once()
+    db.execute.assert_awaited_once_with(mock.ANY)
+    db.execute.return_value.scalars.return_value.first.assert_called_once()
     db.commit.assert_not_called()
 
 
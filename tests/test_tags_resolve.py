@@ -0,0 +1,69 @@
+import unittest
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import Tag
+from pyweb_team7_project.repository.tags import resolve_tags
+
+
+class TestResolveTags(AsyncDatabaseTestCase):
+    def seed(self, session: Session) -> None:
+        session.add(Tag(name="old"))
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.sync_engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(self.sync_engine.dispose)
+        self.statements = self.capture_statements()
+        self.db = self.session_local()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await super().asyncTearDown()
+
+    def tag_names(self):
+        with Session(self.sync_engine) as session:
+            return session.scalars(select(Tag.name).order_by(Tag.id)).all()
+
+    async def test_two_round_trips(self):
+        tags = await resolve_tags(["new", "old", "new", "other"], self.db)
+        await self.db.commit()
+
+        self.assertEqual([tag.name for tag in tags], ["new", "old", "other"])
+        self.assertTrue(all(tag.id for tag in tags))
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(self.tag_names(), ["old", "new", "other"])
+
+    async def test_existing_tags_only(self):
+        tags = await resolve_tags(["old"], self.db)
+
+        self.assertEqual([tag.name for tag in tags], ["old"])
+        self.assertEqual(len(self.statements), 1)
+
+    async def test_empty(self):
+        self.assertEqual(await resolve_tags([], self.db), [])
+        self.assertEqual(self.statements, [])
+
+    async def test_tag_created_concurrently(self):
+        def create_concurrently(conn, cursor, statement, *args):
+            if statement.startswith("INSERT"):
+                with self.sync_engine.begin() as other:
+                    other.execute(insert(Tag).values(name="raced"))
+
+        event.listen(
+            self.async_engine.sync_engine, "before_cursor_execute", create_concurrently
+        )
+
+        tags = await resolve_tags(["raced", "fresh"], self.db)
+        await self.db.commit()
+
+        self.assertEqual([tag.name for tag in tags], ["raced", "fresh"])
+        # the raced name is skipped by the insert and fetched again
+        self.assertEqual(len(self.statements), 3)
+        self.assertEqual(self.tag_names(), ["old", "raced", "fresh"])
+
+
+if __name__ == "__main__":
+    unittest.main()
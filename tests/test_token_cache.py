@@ -0,0 +1,70 @@
+import hashlib
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+from pyweb_team7_project.services import auth
+from pyweb_team7_project.services.auth import auth_service
+from pyweb_team7_project.services.cache import token_cache
+
+
+class TestTokenCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        token_cache.clear()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    async def test_token_verified_once(self):
+        token = await auth_service.create_access_token(data={"sub": "a@example.com"})
+
+        with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+            first = auth_service.decode_access_token(token)
+            second = auth_service.decode_access_token(token)
+
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(first["sub"], second["sub"])
+
+    async def test_refresh_and_email_tokens_cached(self):
+        refresh_token = await auth_service.create_refresh_token(
+            data={"sub": "a@example.com"}
+        )
+        email_token = auth_service.create_email_token(data={"sub": "b@example.com"})
+
+        with patch.object(auth.jwt, "decode", wraps=auth.jwt.decode) as decode:
+            for _ in range(2):
+                self.assertEqual(
+                    await auth_service.decode_refresh_token(refresh_token),
+                    "a@example.com",
+                )
+                self.assertEqual(
+                    await auth_service.get_email_from_token(email_token),
+                    "b@example.com",
+                )
+
+        self.assertEqual(decode.call_count, 2)
+
+    async def test_entry_expires_with_token(self):
+        token = await auth_service.create_access_token(
+            data={"sub": "a@example.com"}, expires_delta=30
+        )
+        digest = hashlib.sha256(token.encode()).digest()
+        with patch("pyweb_team7_project.services.cache.time.monotonic") as clock:
+            clock.return_value = 1000
+            auth_service.decode_access_token(token)
+            clock.return_value = 1028
+            self.assertIsNotNone(token_cache.get(digest))
+            clock.return_value = 1031
+            self.assertIsNone(token_cache.get(digest))
+
+    async def test_invalid_token_not_cached(self):
+        token = await auth_service.create_access_token(data={"sub": "a@example.com"})
+
+        with self.assertRaises(HTTPException):
+            auth_service.decode_access_token(token + "x")
+        self.assertEqual(token_cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import asyncio
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from pyweb_team7_project.conf.config import settings
 from pyweb_team7_project.repository.images import (
@@ -36,7 +36,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     async def test_create_image_and_upload_to_cloudinary(
         self, mock_get_db, mock_auth_service, mock_repository_images
     ):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_file = MagicMock(spec=UploadFile)
         mock_image = MagicMock(spec=Image)
 
@@ -56,14 +56,15 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
             file_data = f.read()
         file = UploadFile(filename="test1.jpg", file=io.BytesIO(file_data))
 
-        mock_db.query.return_value.filter_by.return_value.first.return_value = MagicMock()
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = MagicMock()
 
-        mock_upload = MagicMock()
+        mock_upload = AsyncMock()
         mock_upload.return_value = {
             "public_id": "public_id",
             "secure_url": "https://example.com/image1.jpg",
         }
-        with patch("pyweb_team7_project.repository.images.upload", mock_upload):
+        with patch("pyweb_team7_project.repository.images.storage.upload", mock_upload):
             result = await create_image_and_upload_to_cloudinary(
                 mock_db, file, description, user_id, tag_names
             )
@@ -94,7 +95,7 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
     async def test_create_image_and_upload_to_cloudinary_no_user(
         self, mock_get_db, mock_auth_service, mock_repository_images
     ):
-        mock_db = MagicMock(spec=Session)
+        mock_db = MagicMock(spec=AsyncSession)
         mock_file = MagicMock(spec=UploadFile)
         mock_image = MagicMock(spec=Image)
 
@@ -114,14 +115,15 @@ class ImagesTest(unittest.IsolatedAsyncioTestCase):
             file_data = f.read()
         file = UploadFile(filename="test1.jpg", file=io.BytesIO(file_data))
 
-        mock_db.query.return_value.filter_by.return_value.first.return_value = None  # Установка результата поиска пользователя в None
+        mock_db.execute.return_value = MagicMock()
+        mock_db.execute.return_value.scalars.return_value.first.return_value = None  # Установка результата поиска пользователя в None
 
-        mock_upload = MagicMock()
+        mock_upload = AsyncMock()
         mock_upload.return_value = {
             "public_id": "public_id",
             "secure_url": "https://example.com/image1.jpg",
         }
-        with patch("pyweb_team7_project.repository.images.upload", mock_upload):
+        with patch("pyweb_team7_project.repository.images.storage.upload", mock_upload):
             with self.assertRaises(Exception) as context:  # Проверяем, что исключение возникает
                 result = await create_image_and_upload_to_cloudinary(
                     mock_db, file, description, user_id, tag_names
@@ -138,7 +140,9 @@ class TemporaryFileWrapper:
         
 class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
         self.file = MagicMock()
         self.file.return_value = b"dummy_file_data"
@@ -157,7 +161,7 @@ class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
     async def test_get_image_by_id(self):
         image_id = 1
         image = Image(id=image_id, user_id=self.user.id)
-        self.session.query().filter().first.return_value = image
+        self.result.scalars.return_value.first.return_value = image
 
         result = await get_image_by_id(
             user=self.user, db=self.session, image_id=image_id
@@ -171,7 +175,7 @@ class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_all_images(self):
         images = [Image(id=1, user_id=self.user.id), Image(id=2, user_id=self.user.id)]
-        self.session.query().all.return_value = images
+        self.result.scalars.return_value.all.return_value = images
 
         result = await get_all_images(self.session)
         self.assertIsInstance(result, list)
@@ -183,7 +187,7 @@ class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
         existing_image = Image(
             id=image_id, user_id=self.user.id, description="Old Description"
         )
-        self.session.query().filter().first.return_value = existing_image
+        self.result.scalars.return_value.first.return_value = existing_image
 
         result = await update_image_description(
             user=self.user,
@@ -215,7 +219,7 @@ class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
     async def test_delete_image(self):
         image_id = 1
         existing_image = Image(id=image_id, user_id=self.user.id)
-        self.session.query().filter().first.return_value = existing_image
+        self.result.scalars.return_value.first.return_value = existing_image
         result = await delete_image(user=self.user, db=self.session, image_id=image_id)
         self.assertEqual(result, existing_image)
         assert isinstance(result, Image)
@@ -227,7 +231,7 @@ class TestImageFunctions(unittest.IsolatedAsyncioTestCase):
     async def test_delete_image_not_found(self):
         image_id = None
         existing_image = Image(id=image_id, user_id=self.user.id)
-        self.session.query().filter().first.return_value = existing_image
+        self.result.scalars.return_value.first.return_value = existing_image
         result = await delete_image(user=self.user, db=self.session, image_id=image_id) 
         self.assertEqual(result, existing_image)
 
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pyweb_team7_project.database.models import User
+from pyweb_team7_project.routes import images
+from pyweb_team7_project.services.cloudinary import upload_large_async
+from pyweb_team7_project.services.storage import (
+    LocalStorage,
+    StorageBackend,
+    UploadStream,
+    iter_parts,
+)
+
+
+async def chunks_of(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def read_all(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class ChunkedStorage(BaseHTTPRequestHandler):
+    """
+    Stands in for the chunked upload API of Cloudinary, recording the headers of every part.
+    """
+
+    parts = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.parts.append(
+            (
+                self.headers["Content-Range"],
+                self.headers["X-Unique-Upload-Id"],
+                len(body),
+            )
+        )
+        result = json.dumps(
+            {"public_id": "chunked", "secure_url": "https://example.com/chunked.jpg"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUploadStream(unittest.IsolatedAsyncioTestCase):
+    async def test_size_and_hash(self):
+        data = os.urandom(100_000)
+        stream = UploadStream(chunks_of(data, 3000), max_size=len(data))
+
+        self.assertEqual(b"".join(await read_all(stream)), data)
+        self.assertEqual(stream.size, len(data))
+        self.assertEqual(stream.hexdigest(), hashlib.sha256(data).hexdigest())
+
+    async def test_too_large_while_reading(self):
+        read = []
+
+        async def body():
+            for _ in range(100):
+                read.append(1000)
+                yield b"x" * 1000
+
+        with self.assertRaises(HTTPException) as context:
+            await read_all(UploadStream(body(), max_size=10_000))
+        self.assertEqual(context.exception.status_code, 413)
+        # the rest of the body is not read
+        self.assertEqual(sum(read), 11_000)
+
+    def test_too_large_content_length(self):
+        with self.assertRaises(HTTPException) as context:
+            UploadStream(chunks_of(b"", 1), max_size=10, expected_size=11)
+        self.assertEqual(context.exception.status_code, 413)
+
+    async def test_empty(self):
+        with self.assertRaises(HTTPException) as context:
+            await read_all(UploadStream(chunks_of(b"", 1), max_size=10))
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_iter_parts(self):
+        parts = await read_all(iter_parts(chunks_of(b"x" * 25, 3), 10))
+
+        self.assertEqual([len(part) for part in parts], [10, 10, 5])
+
+
+class TestStreamingBackends(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.tmp_dir.name, "http://test/api/storage")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_local_same_name_as_upload(self):
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        stream = UploadStream(chunks_of(data, 65536), max_size=len(data))
+
+        streamed = await self.storage.upload_stream(stream, filename="a.jpg")
+        uploaded = await self.storage.upload(data, filename="a.jpg")
+
+        self.assertEqual(streamed, uploaded)
+        with open(self.storage.path(streamed["public_id"]), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    async def test_local_too_large_leaves_nothing(self):
+        stream = UploadStream(chunks_of(b"x" * 5000, 1000), max_size=4000)
+
+        with self.assertRaises(HTTPException):
+            await self.storage.upload_stream(stream)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    async def test_default_spools_to_upload(self):
+        spooled = []
+
+        class SpoolingStorage(StorageBackend):
+            async def upload(self, file, public_id=None, filename=None):
+                file.seek(0)
+                spooled.append(file.read())
+                return {"public_id": "spooled"}
+
+            async def delete(self, public_id):
+                pass
+
+            def url(self, public_id):
+                return public_id
+
+        backend = SpoolingStorage()
+        stream = UploadStream(chunks_of(b"image", 2), max_size=10)
+
+        self.assertEqual(await backend.upload_stream(stream), {"public_id": "spooled"})
+        self.assertEqual(spooled, [b"image"])
+
+    def test_backend_must_implement_upload_delete_url(self):
+        class Incomplete(StorageBackend):
+            async def upload(self, file, public_id=None, filename=None):
+                return {}
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    async def test_cloudinary_chunked_upload(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ChunkedStorage)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        ChunkedStorage.parts = []
+        try:
+            result = await upload_large_async(
+                chunks_of(b"x" * 25, 10),
+                upload_prefix=f"http://127.0.0.1:{server.server_port}",
+                cloud_name="demo",
+                api_key="key",
+                api_secret="secret",
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(result["public_id"], "chunked")
+        ranges = [part[0] for part in ChunkedStorage.parts]
+        self.assertEqual(ranges, ["bytes 0-9/-1", "bytes 10-19/-1", "bytes 20-24/25"])
+        self.assertEqual(len({part[1] for part in ChunkedStorage.parts}), 1)
+
+
+class TestCreateImageStream(unittest.IsolatedAsyncioTestCase):
+    def request(self, data: bytes, content_length: bool = True):
+        request = MagicMock()
+        request.headers = {"content-length": str(len(data))} if content_length else {}
+        request.stream = lambda: chunks_of(data, 1000)
+        return request
+
+    async def create(self, request, storage):
+        with patch.object(images, "storage", storage), patch.object(
+            images.repository_images, "create_image_from_upload", AsyncMock()
+        ) as create:
+            await images.create_image_stream(
+                request,
+                description="streamed",
+                tags="a, b",
+                filename="a.png",
+                current_user=User(id=1),
+                db=MagicMock(spec=AsyncSession),
+            )
+        return create
+
+    async def test_streams_to_storage(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalStorage(root, "http://test/api/storage")
+            create = await self.create(self.request(b"image" * 1000), storage)
+
+        result = create.call_args.args[1]
+        self.assertEqual(
+            result["public_id"].split("/")[-1],
+            hashlib.sha256(b"image" * 1000).hexdigest() + ".png",
+        )
+        self.assertEqual(create.call_args.kwargs["tag_names"], ["a", "b"])
+
+    async def test_rejected_before_reading(self):
+        storage = MagicMock()
+        with patch.object(images.settings, "upload_max_size", 100):
+            with self.assertRaises(HTTPException) as context:
+                await self.create(self.request(b"x" * 101), storage)
+            self.assertEqual(context.exception.status_code, 413)
+            storage.upload_stream.assert_not_called()
+
+            # without a Content-Length the cutoff comes while reading
+            with tempfile.TemporaryDirectory() as root:
+                storage = LocalStorage(root, "http://test/api/storage")
+                with self.assertRaises(HTTPException) as context:
+                    await self.create(self.request(b"x" * 101, False), storage)
+            self.assertEqual(context.exception.status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
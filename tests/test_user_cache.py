@@ -0,0 +1,208 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+import fakeredis
+from sqlalchemy.orm import Session
+
+from conftest import AsyncDatabaseTestCase
+from pyweb_team7_project.database.models import User, Role
+from pyweb_team7_project.repository import images as repository_images
+from pyweb_team7_project.repository import users as repository_users
+from pyweb_team7_project.services.auth import auth_service
+from pyweb_team7_project.services.cache import (
+    TTLCache,
+    USER_INVALIDATION_CHANNEL,
+    shared_user_cache,
+    user_cache,
+)
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["size"], 2)
+
+    def test_ttl_expiry(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        with patch("pyweb_team7_project.services.cache.time.monotonic") as clock:
+            clock.return_value = 100
+            cache.set("a", 1)
+            clock.return_value = 109
+            self.assertEqual(cache.get("a"), 1)
+            clock.return_value = 110
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_stats_and_invalidate(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.invalidate("a")
+        cache.get("a")
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_disabled(self):
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class TestCurrentUserCache(AsyncDatabaseTestCase):
+    email = "cached@example.com"
+
+    def seed(self, session: Session) -> None:
+        session.add(
+            User(username="cached", email=self.email, password="x", role=Role.user)
+        )
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.statements = self.capture_statements()
+        self.token = await auth_service.create_access_token(data={"sub": self.email})
+        user_cache.clear()
+
+    async def asyncTearDown(self):
+        user_cache.clear()
+        await super().asyncTearDown()
+
+    async def current_user(self):
+        async with self.session_local() as db:
+            return await auth_service.get_current_user(self.token, db)
+
+    async def test_repeated_requests_hit_cache(self):
+        hits = user_cache.hits
+        first = await self.current_user()
+        second = await self.current_user()
+
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(user_cache.hits, hits + 1)
+        self.assertIsNot(first, second)
+        self.assertEqual((second.id, second.role), (first.id, Role.user))
+
+    async def test_role_change_invalidates(self):
+        await self.current_user()
+        async with self.session_local() as db:
+            await repository_users.make_user_role(self.email, Role.moderator, db)
+
+        user = await self.current_user()
+        self.assertEqual(user.role, Role.moderator)
+
+    async def test_image_counter_invalidates(self):
+        user = await self.current_user()
+        self.assertEqual(user.images_count, 0)
+
+        async with self.session_local() as db:
+            image = await repository_images.create_image_from_upload(
+                db,
+                {"public_id": "photo", "secure_url": "https://cdn/photo"},
+                description="photo",
+                user_id=user.id,
+            )
+        self.assertEqual((await self.current_user()).images_count, 1)
+
+        async with self.session_local() as db:
+            await repository_images.delete_image(user, db, image.id)
+        self.assertEqual((await self.current_user()).images_count, 0)
+
+    async def test_cached_user_can_be_updated(self):
+        await self.current_user()
+        async with self.session_local() as db:
+            user = await auth_service.get_current_user(self.token, db)
+            user.avatar = "https://example.com/avatar.png"
+            await db.commit()
+
+        async with self.session_local() as db:
+            user = await repository_users.get_user_by_email(self.email, db)
+        self.assertEqual(user.avatar, "https://example.com/avatar.png")
+        self.assertEqual(user.password, "x")
+
+
+class TestSharedUserCache(TestCurrentUserCache):
+    """
+    Runs the in-process cache tests again with the Redis tier enabled.
+    """
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.aioredis.FakeRedis(
+            server=self.server, decode_responses=True
+        )
+        shared_user_cache.connect(self.redis)
+
+    async def asyncTearDown(self):
+        shared_user_cache.connect(None)
+        await self.redis.close()
+        await super().asyncTearDown()
+
+    async def test_other_worker_reads_shared_record(self):
+        await self.current_user()
+        # a worker with an empty in-process cache
+        user_cache.clear()
+        self.statements.clear()
+
+        user = await self.current_user()
+
+        self.assertEqual(self.statements, [])
+        self.assertEqual((user.email, user.role), (self.email, Role.user))
+        self.assertIsNotNone(user_cache.get(self.email))
+
+    async def test_shared_record_has_no_secrets(self):
+        async with self.session_local() as db:
+            user = await repository_users.get_user_by_email(self.email, db)
+            user.access_token = "token"
+            await db.commit()
+        await self.current_user()
+
+        record = json.loads(await self.redis.get(f"user:{self.email}"))
+        self.assertEqual(set(record), set(repository_users.USER_RECORD_FIELDS))
+        self.assertEqual(record["role"], Role.user.value)
+
+    async def test_role_change_deletes_shared_record(self):
+        await self.current_user()
+        self.assertTrue(await self.redis.exists(f"user:{self.email}"))
+
+        async with self.session_local() as db:
+            await repository_users.make_user_role(self.email, Role.admin, db)
+
+        self.assertFalse(await self.redis.exists(f"user:{self.email}"))
+        user_cache.clear()
+        user = await self.current_user()
+        self.assertEqual(user.role, Role.admin)
+
+    async def test_invalidation_reaches_other_workers(self):
+        listener = asyncio.create_task(shared_user_cache.listen(user_cache))
+        await asyncio.sleep(0.05)
+        await self.current_user()
+        other_worker = fakeredis.aioredis.FakeRedis(
+            server=self.server, decode_responses=True
+        )
+
+        await other_worker.publish(USER_INVALIDATION_CHANNEL, self.email)
+        for _ in range(50):
+            if user_cache.get(self.email) is None:
+                break
+            await asyncio.sleep(0.01)
+
+        listener.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await listener
+        await other_worker.close()
+        self.assertIsNone(user_cache.get(self.email))
+
+
+if __name__ == "__main__":
+    unittest.main()